@@ -21,6 +21,7 @@
 
 package org.nest.codegeneration.sympy;
 
+import com.fasterxml.jackson.annotation.JsonIgnoreProperties;
 import com.fasterxml.jackson.databind.ObjectMapper;
 import com.google.common.base.Joiner;
 import com.google.common.collect.Lists;
@@ -35,8 +36,10 @@ import java.util.Map;
 
 /**
  * Encapsulates solver response. Contains the following fields: status (failed, success), initial_values,
- * ode_var_update_instructions, solver, ode_var_factor, const_input, propagator_elements,shape_state_variables
+ * ode_var_update_instructions, solver, ode_var_factor, const_input, propagator_elements,shape_state_variables.
+ * Additional fields, e.g. the cache statistics, are ignored.
  */
+@JsonIgnoreProperties(ignoreUnknown = true)
 public class SolverOutput {
   // all fields must be public since they are set by the JSON framework
   final static String RESULT_FILE_NAME = "result.tmp";
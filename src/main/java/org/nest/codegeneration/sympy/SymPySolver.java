@@ -16,6 +16,8 @@ import java.io.BufferedReader;
 import java.io.IOException;
 import java.io.InputStream;
 import java.io.InputStreamReader;
+import java.io.OutputStreamWriter;
+import java.io.Writer;
 import java.net.URL;
 import java.nio.file.Files;
 import java.nio.file.Path;
@@ -37,14 +39,31 @@ class SymPySolver {
   private final static Reporter reporter = Reporter.get();
 
   private final static String PYTHON_INTERPRETER = "python";
-  private static final String SHAPES_SCRIPT = "shapes.py";
-  private static final String SHAPES_SOURCE = "org/nest/sympy/shapes.py";
-
-  private static final String PROP_MATRIX_SCRIPT = "prop_matrix.py";
-  private static final String PROP_MATRIX_SOURCE = "org/nest/sympy/prop_matrix.py";
-
+  private static final String SOLVER_SOURCE_FOLDER = "org/nest/sympy/";
   private static final String ODE_ANALYZER_SCRIPT = "OdeAnalyzer.py";
-  private static final String ODE_ANALYZER_SOURCE = "org/nest/sympy/OdeAnalyzer.py";
+  // all scripts which must be copied into the output folder to run the solver
+  private static final List<String> SOLVER_SCRIPTS = Lists.newArrayList(
+      ODE_ANALYZER_SCRIPT,
+      "shapes.py",
+      "prop_matrix.py",
+      // entry point for external callers, this class starts one process per equations block
+      "solver_server.py",
+      "solver_batch.py",
+      "solver_cache.py",
+      "shape_order.py",
+      "shape_memo.py",
+      "propagator_engine.py",
+      "solver_model.py",
+      "zero_testing.py",
+      "solver_cse.py",
+      "shape_merging.py",
+      "numeric_propagator.py",
+      "solver_budget.py",
+      "solver_diagnostics.py",
+      "numpy_kernels.py",
+      "delta_shapes.py",
+      "solver_parallel.py",
+      "solver_dependencies.py");
 
   SolverOutput solveOdeWithShapes(final ASTOdeDeclaration astOdeDeclaration, final Path output) {
     return executeSolver(new SolverInput(astOdeDeclaration), output);
@@ -64,14 +83,16 @@ class SymPySolver {
 
       commands.add(PYTHON_INTERPRETER);
       commands.add(ODE_ANALYZER_SCRIPT);
-      commands.add(solverInput.toJSON());
+      // the input is passed through stdin, since large models exceed the length limit of the arguments
+      commands.add("--input-file");
+      commands.add("-");
 
-      final ProcessBuilder processBuilder = new ProcessBuilder(
-          PYTHON_INTERPRETER,
-          ODE_ANALYZER_SCRIPT,
-          solverInput.toJSON()).directory(output.toFile()).command(commands);
+      final ProcessBuilder processBuilder = new ProcessBuilder().directory(output.toFile()).command(commands);
 
       final Process res = processBuilder.start();
+      try (final Writer stdin = new OutputStreamWriter(res.getOutputStream(), Charsets.UTF_8)) {
+        stdin.write(solverInput.toJSON());
+      }
       res.waitFor();
       long end = System.nanoTime();
 
@@ -107,20 +128,12 @@ class SymPySolver {
       if (!Files.exists(output)) {
         Files.createDirectories(output);
       }
-      final URL shapesPyUrl = getClass().getClassLoader().getResource(SHAPES_SOURCE);
-      checkNotNull(shapesPyUrl, "Cannot read the solver script: " + SHAPES_SCRIPT);
-      final String shapesPy = Resources.toString(shapesPyUrl, Charsets.UTF_8);
-      Files.write(Paths.get(output.toString(), SHAPES_SCRIPT), shapesPy.getBytes(), CREATE);
-
-      final URL propMatrixUrl = getClass().getClassLoader().getResource(PROP_MATRIX_SOURCE);
-      checkNotNull(propMatrixUrl, "Cannot read the solver script: " + PROP_MATRIX_SCRIPT);
-      final String propMatrixPy = Resources.toString(propMatrixUrl, Charsets.UTF_8);
-      Files.write(Paths.get(output.toString(), PROP_MATRIX_SCRIPT), propMatrixPy.getBytes(), CREATE);
-
-      final URL odeAnalyzerUrl = getClass().getClassLoader().getResource(ODE_ANALYZER_SOURCE);
-      checkNotNull(odeAnalyzerUrl, "Cannot read the solver script: " + ODE_ANALYZER_SCRIPT);
-      final String odeAnalyzerPy = Resources.toString(odeAnalyzerUrl, Charsets.UTF_8);
-      Files.write(Paths.get(output.toString(), ODE_ANALYZER_SCRIPT), odeAnalyzerPy.getBytes(), CREATE);
+      for (final String script : SOLVER_SCRIPTS) {
+        final URL scriptUrl = getClass().getClassLoader().getResource(SOLVER_SOURCE_FOLDER + script);
+        checkNotNull(scriptUrl, "Cannot read the solver script: " + script);
+        final String scriptSource = Resources.toString(scriptUrl, Charsets.UTF_8);
+        Files.write(Paths.get(output.toString(), script), scriptSource.getBytes(), CREATE);
+      }
 
     }
     catch (IOException e) {
@@ -1,10 +1,16 @@
+import argparse
+import functools
 import json
+from contextlib import contextmanager
 
-from sympy import *
-from sympy.parsing.sympy_parser import parse_expr
-
-from prop_matrix import PropagatorCalculator
-from shapes import ShapeFunction
+# Importing SymPy takes much longer than e.g. answering a request from the cache. Therefore, this module only
+# imports modules which do not depend on SymPy at the top; SymPy and the analysis modules are imported by the
+# stages which need them.
+from numeric_propagator import calibration_instruction, generator_name
+from shape_memo import ShapeMemo
+from solver_budget import Budget, BudgetExceeded, simplification
+from solver_diagnostics import Diagnostics, ProfiledSolver, serialize
+from solver_parallel import worker_map
 
 import sys
 
@@ -23,6 +29,13 @@ class SolverInput:
 
         self.__dict__ = json.loads(json_serialization)
 
+    def option(self, name, default=None):
+        """
+        :return: The value of the option `name` from the optional `options` object of the input, e.g.
+        `"options": {"cse": true}`.
+        """
+        return self.__dict__.get("options", {}).get(name, default)
+
 
 class SolverOutput:
     """
@@ -47,6 +60,15 @@ class SolverOutput:
         self.updates_to_shape_state_variables = []
         self.shape_state_odes = []
 
+    @staticmethod
+    def from_dict(dictionary):
+        """
+        Restores a `SolverOutput` from the dictionary of its fields, e.g. from a cached result.
+        """
+        result = SolverOutput(None, None, None, None, None, None)
+        result.__dict__ = dict(dictionary)
+        return result
+
     def decode_apostroph(self, ode):
         return
 
@@ -63,40 +85,75 @@ class SolverOutput:
         self.initial_values += initial_values
 
 
-h = symbols("__h")
-
-
 class OdeAnalyzer(object):
     """
     Orchestrates the execution of analysis activities which lead to a exact solution.
     """
 
+    # reuses the analysis of shapes which differ only in the names of their symbols
+    shape_memo = ShapeMemo()
+    # limits the time and the expression sizes of the stages, see `solver_budget.py`
+    budget = Budget()
+    # records the stages of the current request if diagnostics are requested, see `solver_diagnostics.py`
+    diagnostics = Diagnostics(enabled=False)
+    # default of the option "diagnostics"
+    collect_diagnostics = False
+    # default of the option "shape_processes", see `solver_parallel.py`
+    shape_processes = 1
+
     @staticmethod
-    def is_linear_constant_coefficient_ode(ode_var, ode_rhs, shape_vars, shape_definitions, function_vars,
-                                           function_definitions):
-        for shape, shape_definition in zip(shape_vars, shape_definitions):
-            exec ("{} = parse_expr(\"{}\")".format(shape, shape_definition))
+    @contextmanager
+    def stage(name):
+        """
+        Runs a stage of the solver within the `budget` and records it in the `diagnostics`.
+        """
+        with OdeAnalyzer.budget.stage(name):
+            with OdeAnalyzer.diagnostics.stage(name):
+                yield
 
-        for function_var, function_definition in zip(function_vars, function_definitions):
-            exec ("{} = parse_expr(\"{}\", local_dict=locals())".format(function_var, function_definition))
+    @staticmethod
+    @contextmanager
+    def optional_stage(name, result):
+        """
+        Runs a stage which adds an optional section to the `result`. If the stage exceeds the `budget`, the section
+        is left out and the exceeded budget is recorded in the field `budget` of the `result`.
+        """
+        try:
+            with OdeAnalyzer.stage(name):
+                yield
+        except BudgetExceeded as e:
+            result.budget["fallbacks"].append({"level": result.budget["level"], "stage": e.stage, "reason": e.reason})
+
+    @staticmethod
+    def check_operations(stage, exprs):
+        """
+        Checks the expressions produced by a stage against the `budget` and records their size.
+        """
+        exprs = list(exprs)
+        OdeAnalyzer.budget.check_operations(stage, exprs)
+        OdeAnalyzer.diagnostics.count_operations(stage, exprs)
+
+    @staticmethod
+    def is_linear_constant_coefficient_ode(model):
+        """
+        Checks if the ODE of the `SolverModel` is linear in the ODE variable with a coefficient which does not
+        depend on the time, once the shapes are inserted.
+        """
+        from sympy import Symbol, diff
+        from zero_testing import is_zero
 
-        # ode functions are defined in the local scope. it must be passed explicitly into the parse_exp,
-        # otherwise, all functions in the ode would not be recognized as `complex` defined through the rhs symbols
-        ode_var = parse_expr(ode_var)
-        ode_rhs = parse_expr(ode_rhs, local_dict=locals())
+        ode_rhs = model.ode_rhs_with_shape_definitions()
 
-        dvar = diff(ode_rhs, ode_var)
+        dvar = diff(ode_rhs, model.ode_var)
         dtdvar = diff(dvar, Symbol("t"))
 
-        if simplify(dtdvar) == simplify(0):
+        if is_zero(dtdvar):
             return True
         else:
             return False
 
     @staticmethod
     def compute_solution(input_json):
-        input_ode_block = SolverInput(input_json)
-
         """
         The function computes a list with propagator matrices.
         :arguments A list starting with an ODE of the first order followed by shape definitions. An ODE is of the form 
@@ -104,114 +161,229 @@ class OdeAnalyzer(object):
         
         :returns JSON object containing all data necessary to compute an update step.
         """
-        if len(input_ode_block.shapes) == 1:
-            tmp = input_ode_block.shapes[0].split('=')
-            shape_name = str(tmp[0])
-            shape_expr = parse_expr(tmp[1].strip())
-            if shape_expr.is_Function and str(shape_expr.func).startswith("delta"):
-                # extract the name of the ODE and its defining expression
-                ode_definition = input_ode_block.ode.split('=')  # it is now a list with 2 elements
-                ode_var = ode_definition[0].replace("'", "").strip()
-                ode_rhs = ode_definition[1].strip()
-
-                function_vars = []  #
-                function_definitions = []  # contains shape functions as ShapeFunction objects
-                if "functions" in input_ode_block.__dict__:
-                    for function_def in input_ode_block.functions:
-                        tmp = function_def.split('=')
-                        function_vars.append(tmp[0].strip())
-                        function_definitions.append(tmp[1].strip())
-
-                if OdeAnalyzer.is_linear_constant_coefficient_ode(ode_var,
-                                                                  ode_rhs,
-                                                                  [shape_name],
-                                                                  [shape_expr],
-                                                                  function_vars,
-                                                                  function_definitions):
-                    for function_var, function_definition in zip(function_vars, function_definitions):
-                        exec ("{} = parse_expr(\"{}\", local_dict=locals())".format(function_var, function_definition))
-
-                    # TODO discuss with Inga
-                    ode_rhs_expr = parse_expr(ode_rhs, local_dict=locals())
-                    const_input = simplify(1 / diff(ode_rhs_expr, parse_expr(shape_name)) * (
-                        ode_rhs_expr - diff(ode_rhs_expr, parse_expr(ode_var)) * parse_expr(ode_var)) - (
-                        parse_expr(shape_name)))
-
-                    c1 = diff(ode_rhs_expr, parse_expr(ode_var))
-                    # The symbol must be declared again. Otherwise, the right hand side will be used for the derivative
-                    c2 = diff(ode_rhs_expr, parse_expr(shape_name))
-
-                    tau_constant = shape_expr.args[1] # is is passed as the second argument of the delta function
-                    ode_var_factor = exp(-h/tau_constant)
-                    ode_var_update_instructions = [
-                        ode_var + " = __ode_var_factor * " + str(ode_var),
-                        ode_var + " += " + str(str(simplify(c2 / c1 * (exp(h * c1) - 1)))) + " * __const_input"]
-                    result = SolverOutput(
-                        "success",
-                        "delta",
-                        None,
-                        {"__ode_var_factor": str(ode_var_factor)},
-                        {"__const_input": str(const_input)},
-                        ode_var_update_instructions)
-                    return json.dumps(result.__dict__, indent=2)
+        result = OdeAnalyzer.analyze(SolverInput(input_json))
+        if result is None:
+            return None
+        return serialize(result.__dict__, indent=2)
+
+    @staticmethod
+    def analyze(input_ode_block):
+        """
+        Computes the solution for an already deserialized `SolverInput`.
+        :return: `SolverOutput` object or None if the ODE block cannot be handled.
+        """
+        import zero_testing
+
+        diagnostics = Diagnostics(input_ode_block.option("diagnostics", OdeAnalyzer.collect_diagnostics))
+        OdeAnalyzer.diagnostics = diagnostics
+        # the decisions of the zero test are reported per request, e.g. in the server and the batch mode
+        zero_testing.default_tester.reset()
+        try:
+            if OdeAnalyzer.budget.is_limited():
+                result, record = OdeAnalyzer.budget.solve(OdeAnalyzer.solve_with_options, input_ode_block)
+                if result is None and record["level"] is None:
+                    result = SolverOutput("failed", None, None, None, None, None)
+                if result is not None:
+                    result.budget = record
+            else:
+                result = OdeAnalyzer.solve_with_options(input_ode_block)
+            if result is not None and result.solver in ("exact", "delta") and input_ode_block.option("cse", False):
+                with OdeAnalyzer.optional_stage("cse", result):
+                    from solver_cse import eliminate_common_subexpressions
+                    result.cse = eliminate_common_subexpressions(result)
+            if result is not None and result.status == "success" and input_ode_block.option("dependencies", False):
+                with OdeAnalyzer.optional_stage("dependencies", result):
+                    from solver_dependencies import classify_dependencies
+                    result.dependencies = classify_dependencies(result, input_ode_block.option("inputs", []))
+            if result is not None and result.status == "success" and input_ode_block.option("numpy_kernels", False):
+                with OdeAnalyzer.optional_stage("numpy_kernels", result):
+                    from numpy_kernels import generate_numpy_module
+                    result.numpy_kernels = generate_numpy_module(result)
+        finally:
+            OdeAnalyzer.shape_memo.flush()
+            OdeAnalyzer.diagnostics = Diagnostics(enabled=False)
+            stages = diagnostics.close()
+
+        if result is not None and diagnostics.enabled:
+            result.diagnostics = stages
+            result.diagnostics["zero_test"] = zero_testing.default_tester.report()
+        return result
+
+    @staticmethod
+    def solve_with_options(input_ode_block):
+        """
+        Solves the ODE block with the options of the input which are not handled by `solve_ode_block` itself.
+        """
+        with simplification(input_ode_block.option("simplify", True)):
+            return OdeAnalyzer.solve_ode_block(input_ode_block)
+
+    @staticmethod
+    def solve_ode_block(input_ode_block):
+        from sympy import diff, exp, simplify, symbols
+        from delta_shapes import is_delta_shape, separate_delta_shapes
+        from solver_model import SolverModel
+
+        h = symbols("__h")
+
+        with OdeAnalyzer.stage("parse"):
+            model = SolverModel.from_solver_input(input_ode_block)
+
+        if len(model.shapes) == 1 and not model.is_system():
+            shape_name, shape_expr = model.shapes[0]
+            if is_delta_shape(shape_expr):
+                with OdeAnalyzer.stage("linearity"):
+                    is_linear = OdeAnalyzer.is_linear_constant_coefficient_ode(model)
+                if is_linear:
+                    with OdeAnalyzer.stage("delta"):
+                        ode_var = model.ode_var
+                        ode_rhs_expr = model.ode_rhs
+                        # TODO discuss with Inga
+                        const_input = simplify(1 / diff(ode_rhs_expr, shape_name) * (
+                            ode_rhs_expr - diff(ode_rhs_expr, ode_var) * ode_var) - shape_name)
+
+                        c1 = diff(ode_rhs_expr, ode_var)
+                        c2 = diff(ode_rhs_expr, shape_name)
+
+                        tau_constant = shape_expr.args[1] # is is passed as the second argument of the delta function
+                        ode_var_factor = exp(-h/tau_constant)
+                        ode_var_update_instructions = [
+                            str(ode_var) + " = __ode_var_factor * " + str(ode_var),
+                            str(ode_var) + " += " + str(str(simplify(c2 / c1 * (exp(h * c1) - 1)))) + " * __const_input"]
+                        result = SolverOutput(
+                            "success",
+                            "delta",
+                            None,
+                            {"__ode_var_factor": str(ode_var_factor)},
+                            {"__const_input": str(const_input)},
+                            ode_var_update_instructions)
+                    return result
                 return None
 
-        shape_functions = []  # contains shape functions as ShapeFunction objects
-        for shape_function in input_ode_block.shapes:
-            tmp = shape_function.split('=')
-            lhs_var = tmp[0].strip()
-            shape_expr = tmp[1].strip()
-            shape_functions.append(ShapeFunction(lhs_var, shape_expr))
-
-        if input_ode_block.ode is None:
-            result = OdeAnalyzer.convert_shapes_to_odes(shape_functions)
-            return json.dumps(result.__dict__, indent=2)
-
-        # extract the name of the ODE and its defining expression
-        ode_definition = input_ode_block.ode.split('=')  # it is now a list with 2 elements
-        ode_var = ode_definition[0].replace("'", "").strip()
-        ode_rhs = ode_definition[1].strip()
-
-        function_vars = []  #
-        function_definitions = []  # contains shape functions as ShapeFunction objects
-        if "functions" in input_ode_block.__dict__:
-            for function_def in input_ode_block.functions:
-                tmp = function_def.split('=')
-                function_vars.append(tmp[0].strip())
-                function_definitions.append(tmp[1].strip())
-
-        if OdeAnalyzer.is_linear_constant_coefficient_ode(ode_var,
-                                                          ode_rhs,
-                                                          [shape.name for shape in shape_functions],
-                                                          [shape.shape_expr for shape in shape_functions],
-                                                          function_vars,
-                                                          function_definitions):
-
-            return OdeAnalyzer.compute_exact_solution(function_definitions,
-                                                      function_vars,
-                                                      ode_rhs,
-                                                      ode_var,
-                                                      shape_functions)
+        # delta shapes which are combined with other shapes become jumps of the ODE variables, see `delta_shapes.py`
+        delta_shapes = []
+        if any(is_delta_shape(shape_expr) for _, shape_expr in model.shapes):
+            if not input_ode_block.option("delta_jumps", False):
+                # the code generator does not apply the jumps yet, the delta input would be lost silently
+                raise ValueError("Delta shapes combined with other shapes are only solved with the option "
+                                 "\"delta_jumps\", which requires a consumer of the field `delta_shapes`.")
+            with OdeAnalyzer.stage("delta"):
+                separated = separate_delta_shapes(model)
+            if separated is None:
+                return None
+            model, delta_shapes = separated
+
+        with worker_map(input_ode_block.option("shape_processes", OdeAnalyzer.shape_processes)) as map_function:
+            result = OdeAnalyzer.solve_model(model, input_ode_block, map_function)
+        if result is not None and delta_shapes:
+            result.delta_shapes = delta_shapes
+        return result
+
+    @staticmethod
+    def solve_model(model, input_ode_block, map_function=map):
+        """
+        Solves the parsed `SolverModel` of the ODE block, which contains no delta shapes.
+        :param map_function: Analyzes the shapes and computes their propagators, e.g. in worker processes (see
+        `solver_parallel.py`).
+        """
+        from prop_matrix import PROPAGATOR_MODES
+        from shape_merging import merge_equivalent_shapes
+        from shapes import ShapeFunction, ShapeODE
+
+        propagator_mode = input_ode_block.option("propagator", "symbolic")
+        if propagator_mode not in PROPAGATOR_MODES:
+            raise ValueError("Unknown propagator mode: {}".format(propagator_mode))
+
+        shape_functions = []  # contains shape functions as ShapeFunction objects or the given ShapeODE objects
+        with OdeAnalyzer.stage("shapes"):
+            if map_function is not map:
+                # the workers analyze every canonical form once, the shapes below are found in the memo
+                OdeAnalyzer.shape_memo.prefetch([shape_expr for _, shape_expr in model.shapes
+                                                 if not isinstance(shape_expr, ShapeODE)], map_function)
+            for shape_name, shape_expr in model.shapes:
+                if isinstance(shape_expr, ShapeODE):
+                    shape_functions.append(shape_expr)
+                else:
+                    shape_functions.append(ShapeFunction(str(shape_name), shape_expr, memo=OdeAnalyzer.shape_memo))
+        for shape in shape_functions:
+            if isinstance(shape, ShapeFunction):
+                OdeAnalyzer.check_operations("shapes", shape.derivative_factors + shape.initial_values)
+
+        if not model.odes or not input_ode_block.option("exact", True):
+            return OdeAnalyzer.convert_shapes_to_odes(shape_functions)
+
+        with OdeAnalyzer.stage("linearity"):
+            if model.is_system():
+                is_linear = OdeAnalyzer.is_linear_constant_coefficient_system(model)
+            else:
+                is_linear = OdeAnalyzer.is_linear_constant_coefficient_ode(model)
+
+        if model.is_system():
+            if is_linear:
+                return OdeAnalyzer.compute_exact_solution(model, shape_functions, propagator_mode, map_function)
+            return OdeAnalyzer.convert_shapes_to_odes(shape_functions)
+
+        if is_linear:
+            if not input_ode_block.option("merge_shapes", False):
+                return OdeAnalyzer.compute_exact_solution(model, shape_functions, propagator_mode, map_function)
+
+            model, shape_functions, merged_shapes = merge_equivalent_shapes(model, shape_functions)
+            result = OdeAnalyzer.compute_exact_solution(model, shape_functions, propagator_mode, map_function)
+            result.merged_shapes = merged_shapes
+            return result
         else:  # is_linear_constant_coefficient_ode evaluates to false
-            result = OdeAnalyzer.convert_shapes_to_odes(shape_functions)
-            return json.dumps(result.__dict__, indent=2)
+            return OdeAnalyzer.convert_shapes_to_odes(shape_functions)
 
     @staticmethod
-    def compute_exact_solution(function_definitions, function_vars, ode_rhs, ode_var, shape_functions):
+    def is_linear_constant_coefficient_system(model):
+        """
+        Checks if the ODEs of the `SolverModel` form a linear system with constant coefficients: the derivatives of
+        all right-hand sides by the ODE variables and the shapes must depend neither on the ODE variables and the
+        shapes nor on the time.
+        """
+        from sympy import Symbol, diff
+
+        variables = [ode_var for ode_var, _ in model.odes] + [shape for shape, _ in model.shapes]
+        forbidden_symbols = set(variables + [Symbol("t")])
+        for _, ode_rhs in model.odes:
+            for variable in variables:
+                if diff(ode_rhs, variable).free_symbols & forbidden_symbols:
+                    return False
+        return True
+
+    @staticmethod
+    def compute_exact_solution(model, shape_functions, propagator_mode="symbolic", map_function=map):
+        from prop_matrix import PropagatorCalculator
+
         calculator = PropagatorCalculator()
-        prop_matrices, const_input, step_const = calculator.ode_to_prop_matrices(
-            shape_functions,
-            ode_var,
-            ode_rhs,
-            function_vars,
-            function_definitions)
-        propagator_elements, ode_var_factor, const_input, ode_var_update_instructions = \
-            calculator.prop_matrix_to_prop_step(
-                prop_matrices,
-                const_input,
-                step_const,
-                shape_functions,
-                ode_var)
+        with OdeAnalyzer.stage("propagators"):
+            if model.is_system():
+                prop_matrices, ode_var_factor, step_const, const_input = calculator.system_to_prop_matrices(
+                    model, shape_functions, propagator_mode, map_function)
+            else:
+                prop_matrices, const_input, step_const = calculator.model_to_prop_matrices(
+                    model, shape_functions, propagator_mode, map_function)
+        for p in prop_matrices:
+            OdeAnalyzer.check_operations("propagators", p.matrix)
+
+        with OdeAnalyzer.stage("elements"):
+            if model.is_system():
+                propagator_elements, ode_var_factor, const_input, ode_var_update_instructions = \
+                    calculator.system_prop_matrix_to_prop_step(
+                        prop_matrices,
+                        ode_var_factor,
+                        step_const,
+                        const_input,
+                        shape_functions,
+                        [str(ode_var) for ode_var, _ in model.odes])
+            else:
+                propagator_elements, ode_var_factor, const_input, ode_var_update_instructions = \
+                    calculator.prop_matrix_to_prop_step(
+                        prop_matrices,
+                        const_input,
+                        step_const,
+                        shape_functions,
+                        str(model.ode_var),
+                        None if shape_functions else calculator.ode_var_propagator(model))
         # build result JSON
         result = SolverOutput("success",
                               "exact",
@@ -223,7 +395,18 @@ class OdeAnalyzer(object):
             result.add_shape_state_variables(shape.additional_shape_state_variables())
             result.add_initial_values(shape.get_initial_values())
             result.add_updates_to_shape_state_variables(shape.get_updates_to_shape_state_variables())
-        return json.dumps(result.__dict__, indent=2)
+
+        # propagators which are computed at the calibration, see `numeric_propagator.py`
+        if any(p.generator is not None for p in prop_matrices):
+            result.solver = "numeric_propagator"
+            result.propagator_generators = {}
+            result.calibration_instructions = []
+            for p, shape in zip(prop_matrices, shape_functions):
+                if p.generator is not None:
+                    result.propagator_generators[generator_name(shape.name)] = \
+                        [[str(p.generator[i, j]) for j in range(p.generator.cols)] for i in range(p.generator.rows)]
+                    result.calibration_instructions.append(calibration_instruction(shape.name))
+        return result
 
     @staticmethod
     def convert_shapes_to_odes(shape_functions):
@@ -235,8 +418,138 @@ class OdeAnalyzer(object):
         return result
 
 
+def solve_request(input_json, cache=None):
+    """
+    Solves one `SolverInput` given as JSON. If a `SolverCache` is passed, the cached result is returned
+    if there is one, and new results are stored in the cache.
+    :return: `SolverOutput` object or None.
+    """
+    if cache is None:
+        return OdeAnalyzer.analyze(SolverInput(input_json))
+
+    key = cache.key(input_json)
+    cached = cache.get(key)
+    if cached is not None:
+        result = SolverOutput.from_dict(cached)
+    else:
+        result = OdeAnalyzer.analyze(SolverInput(input_json))
+        # degraded results are not cached, a later run with a larger budget may compute the full solution
+        if result is not None and result.status == "success" and not getattr(result, "budget", {}).get("fallbacks"):
+            # the diagnostics describe this run only
+            cache.put(key, dict((name, value) for name, value in result.__dict__.items() if name != "diagnostics"))
+
+    if result is not None:
+        result.cache = cache.statistics(cached is not None)
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Computes the solution of an ODE block given as SolverInput JSON.")
+    parser.add_argument("input", nargs="?", help="SolverInput as JSON string, the result is stored in `result.tmp`")
+    parser.add_argument("--input-file", metavar="PATH",
+                        help="Read the SolverInput JSON from PATH instead of the argument, '-' reads from stdin")
+    parser.add_argument("--output", metavar="PATH",
+                        help="Write the result as compact JSON to PATH instead of `result.tmp`, '-' writes to stdout")
+    parser.add_argument("--server", action="store_true",
+                        help="Serve newline-delimited SolverInput requests until a shutdown command is received")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="In the server mode, listen on the UNIX domain socket PATH instead of stdin")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="Solve all SolverInputs from a directory of *.json files or from a JSONL file")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Number of worker processes in the batch mode (default: number of CPUs)")
+    parser.add_argument("--batch-output", metavar="PATH",
+                        help="JSONL file or existing directory for the batch results (default: stdout)")
+    parser.add_argument("--cache-dir", metavar="PATH",
+                        help="Directory of the persistent result cache, which can be shared between builds")
+    parser.add_argument("--cache-size", type=int, default=100, metavar="MB",
+                        help="Size limit of the result cache in megabytes (default: 100)")
+    parser.add_argument("--shape-memo", metavar="PATH",
+                        help="JSON file which persists the analysis of shapes between runs")
+    parser.add_argument("--zero-test", metavar="TIERS",
+                        help="Comma separated tiers of the zero test, out of structural, expand, numeric and "
+                             "simplify (default: all)")
+    parser.add_argument("--stage-timeout", type=float, metavar="SECONDS",
+                        help="Wall-clock limit of every solver stage, exceeding it falls back to a cheaper strategy")
+    parser.add_argument("--max-operations", type=int, metavar="N",
+                        help="Limit of the operations in the shape and propagator expressions, exceeding it falls "
+                             "back to a cheaper strategy")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="Record the time, memory and expression sizes of every stage in the SolverOutput")
+    parser.add_argument("--shape-processes", type=int, default=1, metavar="N",
+                        help="Number of worker processes which analyze the shapes of an ODE block and compute their "
+                             "propagators (default: 1, i.e. no workers)")
+    parser.add_argument("--profile-dir", metavar="PATH",
+                        help="Existing directory into which a cProfile file is dumped for every request")
+    args = parser.parse_args(argv)
+
+    if args.shape_memo:
+        OdeAnalyzer.shape_memo = ShapeMemo(args.shape_memo)
+    if args.zero_test:
+        import zero_testing
+        try:
+            zero_testing.default_tester = zero_testing.ZeroTester(args.zero_test.split(","))
+        except ValueError as e:
+            parser.error(str(e))
+
+    OdeAnalyzer.budget = Budget(args.stage_timeout, args.max_operations)
+    OdeAnalyzer.collect_diagnostics = args.diagnostics
+    OdeAnalyzer.shape_processes = args.shape_processes
+
+    solve = solve_request
+    if args.cache_dir:
+        from solver_cache import SolverCache
+        solve = functools.partial(solve_request, cache=SolverCache(args.cache_dir, args.cache_size * 1024 * 1024))
+    if args.profile_dir:
+        solve = ProfiledSolver(solve, args.profile_dir)
+
+    if args.server:
+        from solver_server import SolverServer
+        server = SolverServer(solve)
+        if args.socket:
+            server.serve_socket(args.socket)
+        else:
+            server.serve_stdin()
+        return 0
+
+    if args.batch:
+        from solver_batch import read_batch_inputs, solve_batch, write_batch_results
+        try:
+            items = read_batch_inputs(args.batch)
+        except ValueError as e:
+            parser.error(str(e))
+        records = solve_batch(solve, items, args.processes)
+        failed = write_batch_results(records, args.batch_output, sys.stdout)
+        return 1 if failed > 0 else 0
+
+    if args.input is not None and args.input_file:
+        parser.error("the SolverInput JSON is given both as argument and as --input-file")
+    if args.input_file == "-":
+        input_json = sys.stdin.read()
+    elif args.input_file:
+        with open(args.input_file) as f:
+            input_json = f.read()
+    elif args.input is not None:
+        input_json = args.input
+    else:
+        parser.error("the SolverInput JSON is required")
+
+    result = solve(input_json)
+    if args.output is None:
+        f = open('result.tmp', 'w')
+        f.write(serialize(result.__dict__, indent=2))
+        return 0
+
+    output = serialize(result.__dict__ if result is not None else None, separators=(",", ":"))
+    if args.output == "-":
+        sys.stdout.write(output + "\n")
+        sys.stdout.flush()
+    else:
+        with open(args.output, "w") as f:
+            f.write(output)
+    return 0
+
+
 # MAIN ENTRY POINT ###
 if __name__ == "__main__":
-    result = OdeAnalyzer.compute_solution(sys.argv[1])
-    f = open('result.tmp', 'w')
-    f.write(result)
+    sys.exit(main(sys.argv[1:]))
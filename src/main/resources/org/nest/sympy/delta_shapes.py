@@ -0,0 +1,54 @@
+"""
+   Delta shapes on the exact path. A shape `G = delta(t, tau)` is a Dirac
+   pulse: a spike of weight `w` which is received by `G` lets every ODE
+   variable `x` jump by `w * jump_factor`, where
+
+       jump_factor = d rhs_x / d G
+
+   is the factor of the shape in the right-hand side of the ODE of `x`. Delta
+   shapes therefore need neither state variables nor propagators and can be
+   combined with any number of other shapes in one exact solution: the delta
+   shapes are set to zero in the ODEs, the other shapes keep their
+   propagators, and the jumps are reported in the field `delta_shapes` of the
+   `SolverOutput`.
+
+   The jumps must be applied by the consumer of the output; the code
+   generator does not read `delta_shapes` yet. Such blocks are therefore only
+   solved with the option "delta_jumps" and rejected otherwise.
+"""
+
+from sympy import Symbol, diff
+
+from shapes import ShapeODE
+from zero_testing import is_zero
+
+
+def is_delta_shape(shape_expr):
+    return not isinstance(shape_expr, ShapeODE) and shape_expr.is_Function and str(shape_expr.func).startswith("delta")
+
+
+def separate_delta_shapes(model):
+    """
+    Removes the delta shapes from the ODEs of the model.
+    :param model: `SolverModel` with at least one delta shape.
+    :return: The model without the delta shapes and the list of the jumps as dictionaries with the keys `shape`,
+    `ode_var` and `jump_factor`, or None if the model has no ODEs or a jump factor is not constant, i.e. depends on
+    the ODE variables, the shapes or the time.
+    """
+    if not model.odes:
+        return None
+
+    delta_symbols = set(shape for shape, shape_expr in model.shapes if is_delta_shape(shape_expr))
+    forbidden_symbols = set([ode_var for ode_var, _ in model.odes] + [shape for shape, _ in model.shapes] +
+                            [Symbol("t")])
+    jumps = []
+    for shape, _ in model.shapes:
+        if shape not in delta_symbols:
+            continue
+        for ode_var, ode_rhs in model.odes:
+            jump_factor = diff(ode_rhs, shape)
+            if jump_factor.free_symbols & forbidden_symbols:
+                return None
+            if not is_zero(jump_factor):
+                jumps.append({"shape": str(shape), "ode_var": str(ode_var), "jump_factor": str(jump_factor)})
+    return model.without_shapes(delta_symbols), jumps
@@ -0,0 +1,64 @@
+import unittest
+
+import json
+import math
+
+import numpy
+from sympy import Symbol, sympify
+
+from OdeAnalyzer import OdeAnalyzer
+from delta_shapes import separate_delta_shapes
+from solver_model import SolverModel
+from solver_simulator import ReferenceSimulator
+
+mixed_ode_block = {"functions": ["I_syn = G + I_in + I_e"],
+                   "shapes": ["G = delta(t, tau_m)", "I_in = exp(-t/tau_syn_in)"],
+                   "ode": "V_m' = -V_m/tau_m + I_syn/C_m",
+                   "options": {"delta_jumps": True}}
+
+parameters = {"tau_m": 10.0, "tau_syn_in": 2.0, "C_m": 250.0, "I_e": 0.0, "__h": 0.1}
+
+
+class TestDeltaShapes(unittest.TestCase):
+
+    def test_separate_delta_shapes(self):
+        model = SolverModel("V_m' = -V_m/tau_m + (G - 2*H + I_in)/C_m",
+                            ["G = delta(t, tau_m)", "H = delta(t, tau_m)", "I_in = exp(-t/tau_syn_in)"], [])
+        model, jumps = separate_delta_shapes(model)
+        self.assertEqual([{"shape": "G", "ode_var": "V_m", "jump_factor": "1/C_m"},
+                          {"shape": "H", "ode_var": "V_m", "jump_factor": "-2/C_m"}], jumps)
+        self.assertEqual([Symbol("I_in")], [shape for shape, _ in model.shapes])
+        self.assertEqual(sympify("-V_m/tau_m + I_in/C_m"), model.ode_rhs)
+
+    def test_jump_factor_must_be_constant(self):
+        model = SolverModel("V_m' = -V_m/tau_m + G*(E_ex - V_m)/C_m", ["G = delta(t, tau_m)"], [])
+        self.assertIsNone(separate_delta_shapes(model))
+        self.assertIsNone(separate_delta_shapes(SolverModel(None, ["G = delta(t, tau_m)"], [])))
+
+    def test_mixed_shapes_are_solved_exactly(self):
+        result = json.loads(OdeAnalyzer.compute_solution(json.dumps(mixed_ode_block)))
+        self.assertEqual("exact", result["solver"])
+        self.assertEqual(["I_in"], result["shape_state_variables"])
+        self.assertEqual([{"shape": "G", "ode_var": "V_m", "jump_factor": "1/C_m"}], result["delta_shapes"])
+
+        # a spike to the delta shape lets `V_m` jump, after which it decays with `tau_m`
+        simulator = ReferenceSimulator(result, parameters, 2)
+        simulator.step({"G": [250.0, 500.0], "I_in": [0.0, 0.0]})
+        V_m = simulator.run(10)["V_m"]
+        numpy.testing.assert_allclose(numpy.array([1.0, 2.0]) * math.exp(-1.0 / parameters["tau_m"]), V_m[-1])
+
+    def test_mixed_shapes_require_option(self):
+        ode_block = dict(mixed_ode_block, options={})
+        self.assertRaises(ValueError, OdeAnalyzer.compute_solution, json.dumps(ode_block))
+
+    def test_only_delta_shapes(self):
+        ode_block = dict(mixed_ode_block, functions=["I_syn = G + 2*H + I_e"],
+                         shapes=["G = delta(t, tau_m)", "H = delta(t, tau_m)"])
+        result = json.loads(OdeAnalyzer.compute_solution(json.dumps(ode_block)))
+        self.assertEqual("exact", result["solver"])
+        self.assertEqual({"__ode_var_factor": "exp(-__h/tau_m)"}, result["ode_var_factor"])
+        self.assertEqual(["G", "H"], [jump["shape"] for jump in result["delta_shapes"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+   Propagators which are computed numerically at the calibration of the
+   generated model. For shapes whose propagator `exp(A * h)` is too costly to
+   compute symbolically, the solver mode "numeric_propagator" emits the matrix
+   `A` (with entries in the model parameters) instead of the entries of
+   `exp(A * h)`:
+
+   `propagator_generators`: `{"__A_<shape>": rows of A}`
+   `calibration_instructions`: `["__P_<shape> = expm(__A_<shape> * __h)"]`
+   `propagator_elements`: `{"__P_<shape>__i_j": "__P_<shape>[i][j]"}`, i.e.
+       the elements are entries of the numerically computed matrix
+
+   All other fields and the update instructions have the same form as for the
+   exact solver, so the per-step work is unchanged.
+
+   `expm` is the reference implementation of the matrix exponential for the
+   calibration: a diagonal Pade approximation with scaling and squaring.
+"""
+
+import math
+
+# Order of the diagonal Pade approximation
+PADE_ORDER = 6
+# `A` is scaled by a power of 2 until its norm is below this bound
+SCALING_NORM = 0.5
+
+
+def generator_name(shape_name):
+    return "__A_" + str(shape_name)
+
+
+def propagator_name(shape_name):
+    return "__P_" + str(shape_name)
+
+
+def calibration_instruction(shape_name):
+    return "{} = expm({} * __h)".format(propagator_name(shape_name), generator_name(shape_name))
+
+
+def identity(n):
+    return [[1.0 if i == j else 0.0 for j in range(n)] for i in range(n)]
+
+
+def multiply(X, Y):
+    return [[sum(X[i][k] * Y[k][j] for k in range(len(Y))) for j in range(len(Y[0]))] for i in range(len(X))]
+
+
+def linear_combination(a, X, b, Y):
+    return [[a * x + b * y for x, y in zip(row_x, row_y)] for row_x, row_y in zip(X, Y)]
+
+
+def solve(X, Y):
+    """
+    Solves `X * Z = Y` for the matrix `Z` by Gaussian elimination with partial pivoting.
+    """
+    n = len(X)
+    M = [list(row_x) + list(row_y) for row_x, row_y in zip(X, Y)]
+    for k in range(n):
+        pivot = max(range(k, n), key=lambda i: abs(M[i][k]))
+        M[k], M[pivot] = M[pivot], M[k]
+        for i in range(k + 1, n):
+            factor = M[i][k] / M[k][k]
+            M[i] = [m_i - factor * m_k for m_i, m_k in zip(M[i], M[k])]
+
+    Z = [[0.0] * len(Y[0]) for _ in range(n)]
+    for i in reversed(range(n)):
+        for j in range(len(Y[0])):
+            Z[i][j] = (M[i][n + j] - sum(M[i][k] * Z[k][j] for k in range(i + 1, n))) / M[i][i]
+    return Z
+
+
+def expm(A):
+    """
+    Computes the matrix exponential of `A` (a list of rows of floats): `A` is scaled by `2**-s` such that its norm
+    is small, `exp` of the scaled matrix is approximated by `Q**-1 * N` with the diagonal Pade polynomials `N` and
+    `Q`, and the result is squared `s` times.
+    """
+    n = len(A)
+    norm = max(sum(abs(entry) for entry in row) for row in A)
+    squarings = max(0, int(math.ceil(math.log(norm / SCALING_NORM, 2)))) if norm > 0 else 0
+    scaled_A = [[entry / 2 ** squarings for entry in row] for row in A]
+
+    N = identity(n)
+    Q = identity(n)
+    power = identity(n)
+    coefficient = 1.0
+    for k in range(1, PADE_ORDER + 1):
+        coefficient *= float(PADE_ORDER - k + 1) / (k * (2 * PADE_ORDER - k + 1))
+        power = multiply(power, scaled_A)
+        N = linear_combination(1.0, N, coefficient, power)
+        Q = linear_combination(1.0, Q, (-1) ** k * coefficient, power)
+
+    P = solve(Q, N)
+    for _ in range(squarings):
+        P = multiply(P, P)
+    return P
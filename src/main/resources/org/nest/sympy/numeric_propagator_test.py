@@ -0,0 +1,54 @@
+import unittest
+
+import json
+import math
+import re
+
+import mpmath
+
+from OdeAnalyzer import OdeAnalyzer
+from numeric_propagator import expm
+from ode_analyzer_test import psc_ode_block
+
+parameters = {"Tau": 10.0, "C_m": 250.0, "tau_syn_in": 2.0, "tau_syn_ex": 0.5, "pA": 1.0, "e": math.e, "__h": 0.1}
+
+
+class TestNumericPropagator(unittest.TestCase):
+
+    def test_pade_approximation(self):
+        for A in [[[-0.5, 0.0], [1.0, -0.1]],
+                  [[-30.0, -300.0, -1000.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+                  [[0.0]]]:
+            expected = mpmath.expm(mpmath.matrix(A))
+            P = expm(A)
+            for i in range(len(A)):
+                for j in range(len(A)):
+                    self.assertAlmostEqual(float(expected[i, j]), P[i][j], places=10)
+
+    def test_same_propagator_as_exact_solver(self):
+        exact = json.loads(OdeAnalyzer.compute_solution(psc_ode_block))
+        ode_block = json.loads(psc_ode_block)
+        ode_block["options"] = {"propagator": "numeric"}
+        deferred = json.loads(OdeAnalyzer.compute_solution(json.dumps(ode_block)))
+
+        self.assertEqual("numeric_propagator", deferred["solver"])
+        self.assertEqual(exact["ode_var_update_instructions"], deferred["ode_var_update_instructions"])
+        self.assertEqual(exact["updates_to_shape_state_variables"], deferred["updates_to_shape_state_variables"])
+        self.assertEqual(["__P_I_shape_in = expm(__A_I_shape_in * __h)", "__P_I_shape_ex = expm(__A_I_shape_ex * __h)"],
+                         deferred["calibration_instructions"])
+
+        namespace = dict(parameters, exp=math.exp)
+        for instruction in deferred["calibration_instructions"]:
+            propagator, generator = re.match(r"(\w+) = expm\((\w+) \* __h\)", instruction).groups()
+            A = [[eval(entry, namespace) * parameters["__h"] for entry in row]
+                 for row in deferred["propagator_generators"][generator]]
+            namespace[propagator] = expm(A)
+
+        for exact_element, deferred_element in zip(exact["propagator_elements"], deferred["propagator_elements"]):
+            self.assertEqual(list(exact_element.keys()), list(deferred_element.keys()))
+            for name in exact_element:
+                self.assertAlmostEqual(eval(exact_element[name], namespace), eval(deferred_element[name], namespace),
+                                       places=10)
+
+if __name__ == '__main__':
+    unittest.main()
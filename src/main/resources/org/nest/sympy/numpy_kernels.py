@@ -0,0 +1,110 @@
+"""
+   NumPy kernels of a `SolverOutput`. Sweeps over large parameter grids need
+   the emitted expressions as numbers for every grid point; instead of parsing
+   the strings again, the expressions are emitted as the source of a Python
+   module of array-aware functions, which needs only NumPy:
+
+   `propagator_generators`: `{"__A_<shape>": rows of A}`, only for the
+       numeric-propagator solver, see `numeric_propagator.py`
+   `propagator_elements`:   `{"__P_<shape>__i_j": value}`
+   `ode_var_factor`:        `{"__ode_var_factor": value}`
+   `const_input`:           `{"__const_input": value}`
+   `initial_values`:        `{"iv__<state variable>": value}`
+   `shape_state_odes`:      `{state variable: derivative}`, the right-hand
+       sides of the shape ODEs of the numeric solver
+
+   Only the functions of the fields which are set in the output are emitted.
+   Every function takes the symbols of its expressions as arguments and
+   ignores all further keyword arguments, so that one dictionary of
+   parameters (including `__h`) can be passed to all of them. The arguments
+   may be numbers or NumPy arrays of broadcastable shapes. Expressions which
+   refer to other results, e.g. `__ode_var_factor` to the propagator
+   elements, take these as arguments; the numerically computed propagators
+   `__P_<shape>` are indexed as `__P_<shape>[i, j]`.
+
+   The module is stored in the field `numpy_kernels` of the output if the
+   option "numpy_kernels" is set.
+"""
+
+import re
+
+from sympy import IndexedBase
+from sympy.parsing.sympy_parser import parse_expr
+from sympy.printing.lambdarepr import NumPyPrinter
+
+# fields of `SolverOutput` which are lists of single-entry dictionaries `{name: expression}` or dictionaries,
+# in the order of the emitted functions
+KERNEL_FIELDS = ["propagator_elements", "ode_var_factor", "const_input", "initial_values", "shape_state_odes"]
+# entry `__P_<shape>[i][j]` of a numerically computed propagator, see `numeric_propagator.py`
+PROPAGATOR_ENTRY = re.compile(r"(__P_\w+)\[(\d+)\]\[(\d+)\]")
+
+MODULE_HEADER = '''"""
+   NumPy kernels of a SolverOutput of the {} solver, generated by `numpy_kernels.py`.
+"""
+
+from __future__ import division
+
+from numpy import *
+
+# names of the SymPy string representation
+Abs = absolute
+E = e'''
+
+
+def parse(expression):
+    """
+    Parses an emitted expression; the entries `__P_<shape>[i][j]` of numerically computed propagators become
+    `__P_<shape>[i, j]`.
+    """
+    local_dict = dict((name, IndexedBase(name)) for name, _, _ in PROPAGATOR_ENTRY.findall(expression))
+    return parse_expr(PROPAGATOR_ENTRY.sub(r"\1[\2, \3]", expression), local_dict=local_dict)
+
+
+def field_definitions(output, field):
+    """
+    :return: List of (name, expression) tuples of the field `field` of `output`.
+    """
+    value = getattr(output, field, None)
+    if not value:
+        return []
+    if isinstance(value, dict):
+        return sorted(value.items())
+    return [item for entry in value for item in entry.items()]
+
+
+def function_source(name, values, exprs, printer):
+    """
+    :param values: Source of the returned value, in which `{}` is replaced by the printed expressions in order.
+    :return: Source of the function `name` whose arguments are the free symbols of `exprs`.
+    """
+    arguments = sorted(set(str(symbol) for expr in exprs for symbol in expr.free_symbols))
+    return "def {}({}):\n    return {}".format(
+        name, ", ".join(arguments + ["**_"]), values.format(*[printer.doprint(expr) for expr in exprs]))
+
+
+def generate_numpy_module(output):
+    """
+    :param output: `SolverOutput` of any solver.
+    :return: Source of the Python module with the NumPy kernels of `output`.
+    """
+    printer = NumPyPrinter()
+    sections = [MODULE_HEADER.format(output.solver)]
+
+    generators = getattr(output, "propagator_generators", None)
+    if generators:
+        exprs = []
+        values = []
+        for name, rows in sorted(generators.items()):
+            exprs += [parse(entry) for row in rows for entry in row]
+            values.append('        "{}": [{}],'.format(
+                name, ", ".join("[" + ", ".join("{}" for _ in row) + "]" for row in rows)))
+        sections.append(function_source("propagator_generators", "{{\n" + "\n".join(values) + "\n    }}", exprs,
+                                        printer))
+
+    for field in KERNEL_FIELDS:
+        definitions = field_definitions(output, field)
+        if definitions:
+            values = "{{\n" + "\n".join('        "{}": {{}},'.format(name) for name, _ in definitions) + "\n    }}"
+            sections.append(function_source(field, values, [parse(expression) for _, expression in definitions],
+                                            printer))
+    return "\n\n\n".join(sections) + "\n"
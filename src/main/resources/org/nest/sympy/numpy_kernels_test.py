@@ -0,0 +1,81 @@
+import unittest
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy
+from sympy import Symbol
+from sympy.parsing.sympy_parser import parse_expr
+
+from OdeAnalyzer import OdeAnalyzer
+from numeric_propagator import expm
+from ode_analyzer_test import cond_alpha_ode_block, psc_ode_block, solve
+
+parameters = {"Tau": 10.0, "C_m": 250.0, "tau_syn_in": 2.0, "tau_syn_ex": numpy.linspace(0.5, 5.0, 7),
+              "pA": 1.0, "e": numpy.e, "I_e": 376.0, "currents": 0.0, "__h": 0.1}
+
+
+def load_kernels(source):
+    namespace = {}
+    exec(compile(source, "<numpy kernels>", "exec", 0, True), namespace)
+    return namespace
+
+
+def evaluate(expression, values):
+    return float(parse_expr(expression).subs(dict((Symbol(name), value) for name, value in values.items())))
+
+
+class TestNumpyKernels(unittest.TestCase):
+
+    def test_exact_solution(self):
+        result = solve(psc_ode_block, numpy_kernels=True)
+        kernels = load_kernels(result["numpy_kernels"])
+        elements = kernels["propagator_elements"](**parameters)
+
+        for idx, tau_syn_ex in enumerate(parameters["tau_syn_ex"]):
+            values = dict(parameters, tau_syn_ex=tau_syn_ex)
+            for element in result["propagator_elements"]:
+                for name, expression in element.items():
+                    self.assertAlmostEqual(evaluate(expression, values), numpy.broadcast_to(elements[name], 7)[idx])
+        self.assertAlmostEqual(numpy.exp(-0.01), kernels["ode_var_factor"](**parameters)["__ode_var_factor"])
+        self.assertAlmostEqual(376.0 / 250.0, kernels["const_input"](**parameters)["__const_input"])
+
+    def test_shape_state_odes(self):
+        kernels = load_kernels(solve(cond_alpha_ode_block, numpy_kernels=True)["numpy_kernels"])
+        self.assertNotIn("propagator_elements", kernels)
+        derivatives = kernels["shape_state_odes"](g_in=1.0, g_in__1=0.0, g_ex=numpy.ones(7), g_ex__1=numpy.zeros(7),
+                                                  **parameters)
+        numpy.testing.assert_allclose(-1 / parameters["tau_syn_ex"] ** 2, derivatives["g_ex__1"])
+        self.assertEqual(-0.25, derivatives["g_in__1"])
+
+    def test_numeric_propagator(self):
+        exact = load_kernels(solve(psc_ode_block, numpy_kernels=True)["numpy_kernels"])
+        deferred = load_kernels(solve(psc_ode_block, propagator="numeric", numpy_kernels=True)["numpy_kernels"])
+
+        values = dict(parameters, tau_syn_ex=3.0)
+        propagators = dict((name.replace("__A_", "__P_"), numpy.array(expm((numpy.array(A) * values["__h"]).tolist())))
+                           for name, A in deferred["propagator_generators"](**values).items())
+        expected = exact["propagator_elements"](**values)
+        for name, value in deferred["propagator_elements"](**propagators).items():
+            self.assertAlmostEqual(expected[name], value)
+
+    def test_disabled_by_default(self):
+        self.assertNotIn("numpy_kernels", json.loads(OdeAnalyzer.compute_solution(psc_ode_block)))
+
+    def test_module_does_not_import_sympy(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(directory, "psc_kernels.py"), "w") as f:
+                f.write(solve(psc_ode_block, numpy_kernels=True)["numpy_kernels"])
+            check = "import sys, psc_kernels; print('sympy' in sys.modules)"
+            self.assertEqual("False", subprocess.check_output([sys.executable, "-c", check], cwd=directory).strip())
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,15 @@
 import unittest
 
 import json
+import os
+import shutil
+import tempfile
 from prop_matrix import PropagatorCalculator
 from shapes import ShapeFunction
 from OdeAnalyzer import OdeAnalyzer
 from OdeAnalyzer import SolverInput
+from OdeAnalyzer import main
+from solver_simulator import ReferenceSimulator
 
 cond_alpha_ode_block = '{' \
                  '"functions" : [ "I_syn_exc = g_ex*(V_m-E_ex)", "I_syn_inh = g_in*(V_m-E_in)", "I_leak = g_L*(V_m-E_L)" ],' \
@@ -35,6 +40,15 @@ shapes_only = '{'   '"functions" : [ ], '\
               '"ode" : null'\
               '}'
 
+# `psc_ode_block2` with the excitatory shape given as ODEs
+shape_ode_block = '{' \
+                  '"ode" : "V_m\' = -V_m/Tau + (I_in + I_ex + I_e) / C_m", ' \
+                  '"shapes" : ["I_in = (e/tau_syn_in) * t * exp(-t/tau_syn_in)", ' \
+                  '{"name": "I_ex", "odes": ["I_ex\' = I_ex__1", ' \
+                  '"I_ex__1\' = -I_ex/tau_syn_ex**2 - 2*I_ex__1/tau_syn_ex"], ' \
+                  '"initial_values": {"I_ex": "0", "I_ex__1": "e/tau_syn_ex"}} ]' \
+                  '}'
+
 delta_shape = '{' \
               '"functions" : [ ],' \
               '"shapes" : [ "G = delta(t, tau_m)" ],' \
@@ -42,6 +56,22 @@ delta_shape = '{' \
               '}'
 
 
+def with_options(ode_block, **options):
+    """
+    :return: The JSON of the `ode_block` with the `options`.
+    """
+    block = json.loads(ode_block)
+    block["options"] = options
+    return json.dumps(block)
+
+
+def solve(ode_block, **options):
+    """
+    :return: The `SolverOutput` of the `ode_block` with the `options` as dictionary.
+    """
+    return json.loads(OdeAnalyzer.compute_solution(with_options(ode_block, **options)))
+
+
 class TestSolutionComputation(unittest.TestCase):
 
     def test_is_linear_constant_coefficient_ode(self):
@@ -99,5 +129,46 @@ class TestSolutionComputation(unittest.TestCase):
         self.assertIsNotNone(testant)
         print testant
 
+    def test_steep_shape(self):
+        ode_block = {"ode": "V_m' = -V_m/tau_m + I_in/C_m", "shapes": ["I_in = exp(-t*100)"], "functions": []}
+        result = json.loads(OdeAnalyzer.compute_solution(json.dumps(ode_block)))
+        self.assertEqual("exact", result["solver"])
+        self.assertIn({"__P_I_in__0_0": "exp(-100*__h)"}, result["propagator_elements"])
+
+    def test_shape_odes(self):
+        result = json.loads(OdeAnalyzer.compute_solution(shape_ode_block))
+        self.assertEqual("exact", result["solver"])
+        self.assertEqual(["I_in__1", "I_in", "I_ex__1", "I_ex"], result["shape_state_variables"])
+
+        parameters = {"Tau": 10.0, "C_m": 250.0, "tau_syn_in": 2.0, "tau_syn_ex": 0.5, "I_e": 0.0, "e": 2.718281828,
+                      "__h": 0.1}
+        spikes = {"I_in": [[0.0]] * 20, "I_ex": [[1.0]] + [[0.0]] * 19}
+        V_m = ReferenceSimulator(result, parameters).run(20, spikes)["V_m"]
+        expected = ReferenceSimulator(OdeAnalyzer.compute_solution(psc_ode_block2), parameters).run(20, spikes)["V_m"]
+        self.assertAlmostEqual(0.0, abs(V_m - expected).max())
+
+    def test_nonlinear_shape_odes_are_solved_numerically(self):
+        ode_block = json.loads(shape_ode_block)
+        ode_block["ode"] = "V_m' = -V_m/Tau + (I_in + I_ex * (E_ex - V_m) + I_e) / C_m"
+        result = json.loads(OdeAnalyzer.compute_solution(json.dumps(ode_block)))
+        self.assertEqual("numeric", result["solver"])
+        self.assertIn({"I_ex__1": "-I_ex/tau_syn_ex**2 - 2*I_ex__1/tau_syn_ex"}, result["shape_state_odes"])
+
+    def test_input_file_and_compact_output(self):
+        directory = tempfile.mkdtemp()
+        try:
+            input_path = os.path.join(directory, "input.json")
+            output_path = os.path.join(directory, "output.json")
+            with open(input_path, "w") as f:
+                f.write(psc_ode_block)
+
+            self.assertEqual(0, main(["--input-file", input_path, "--output", output_path]))
+            with open(output_path) as f:
+                output = f.read()
+            self.assertNotIn("\n", output)
+            self.assertEqual(json.loads(OdeAnalyzer.compute_solution(psc_ode_block)), json.loads(output))
+        finally:
+            shutil.rmtree(directory)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+import json
+import math
+
+import mpmath
+
+from OdeAnalyzer import OdeAnalyzer
+
+two_compartment_ode_block = {
+    "ode": ["V_s' = -V_s/tau_s + (I_syn + I_e)/C_s",
+            "V_d' = -V_d/tau_d + g_c*(V_s - V_d)"],
+    "functions": ["I_syn = I_shape"],
+    "shapes": ["I_shape = (e/tau_syn) * t * exp(-t/tau_syn)"]}
+
+parameters = {"tau_s": 10.0, "tau_d": 25.0, "C_s": 250.0, "I_e": 376.0, "g_c": 0.05, "tau_syn": 2.0, "e": math.e,
+              "__h": 0.1}
+
+
+def execute_step(result, state):
+    """
+    Executes one update step of the `SolverOutput` `result` in Python.
+    """
+    namespace = dict(parameters, exp=math.exp, sqrt=math.sqrt)
+    namespace.update(state)
+    for element in result["propagator_elements"]:
+        for name, expression in element.items():
+            namespace[name] = eval(expression, namespace)
+    for name, expression in list(result["ode_var_factor"].items()) + list(result["const_input"].items()):
+        namespace[name] = eval(expression, namespace)
+    for instruction in result["ode_var_update_instructions"]:
+        exec(instruction, namespace)
+    for update in result["updates_to_shape_state_variables"]:
+        for name, expression in update.items():
+            namespace[name] = eval(expression, namespace)
+    return dict((name, namespace[name]) for name in state)
+
+
+class TestSystemOfODEs(unittest.TestCase):
+
+    def test_block_propagator(self):
+        result = json.loads(OdeAnalyzer.compute_solution(json.dumps(two_compartment_ode_block)))
+        self.assertEqual("exact", result["solver"])
+        self.assertEqual(["V_s = __tmp__V_s", "V_d = __tmp__V_d"], result["ode_var_update_instructions"][-2:])
+
+        state = {"V_s": -5.0, "V_d": 3.0, "I_shape": 20.0, "I_shape__1": -4.0}
+        p = parameters
+
+        def rhs(_, y):
+            V_s, V_d, I_shape, dI_shape = y
+            return [-V_s / p["tau_s"] + (I_shape + p["I_e"]) / p["C_s"],
+                    -V_d / p["tau_d"] + p["g_c"] * (V_s - V_d),
+                    dI_shape,
+                    -I_shape / p["tau_syn"] ** 2 - 2 * dI_shape / p["tau_syn"]]
+
+        # the state variables of a shape of order 2 are `I_shape` and `I_shape__1 = I_shape' + I_shape / tau_syn`
+        # (see `PropagatorCalculator.shape_matrix`)
+        dI_shape = state["I_shape__1"] - state["I_shape"] / p["tau_syn"]
+        solution = mpmath.odefun(rhs, 0, [state["V_s"], state["V_d"], state["I_shape"], dI_shape])
+        expected = solution(p["__h"])
+        step = execute_step(result, state)
+        for name, value in zip(["V_s", "V_d", "I_shape"], expected):
+            self.assertAlmostEqual(float(value), step[name], places=9)
+
+    def test_nonlinear_system_is_solved_numerically(self):
+        ode_block = dict(two_compartment_ode_block)
+        ode_block["ode"] = ["V_s' = -V_s/tau_s + (I_syn + I_e)/C_s", "V_d' = -V_d/tau_d + g_c*(V_s - V_d)*V_d"]
+        result = json.loads(OdeAnalyzer.compute_solution(json.dumps(ode_block)))
+        self.assertEqual("numeric", result["solver"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,62 @@
-from math import *
 from sympy import *
 from sympy.parsing.sympy_parser import parse_expr
 from sympy.matrices import zeros
 
+from propagator_engine import characteristic_roots, normalize_entry, propagator_from_roots, sparsity_pattern
 from shapes import ShapeFunction, ShapeODE
+from numeric_propagator import propagator_name
+from solver_model import SolverModel
+from zero_testing import is_zero
 
 h = symbols("__h")
 
+# "closed_form" constructs the propagators from the eigenvalues of `A` (see `propagator_engine.py`) and uses the
+# generic `simplify(exp(A * h))` only for matrices with an unknown structure; "generic" always uses the latter.
+PROPAGATOR_ENGINE = "closed_form"
+
+# If False, the constant input and generic propagators are only normalized by the much cheaper `normalize_entry`
+# instead of `simplify` (e.g. after a time budget is exhausted, see `solver_budget.py`)
+SIMPLIFY = True
+
+# modes of `PropagatorCalculator.shape_propagator`, selected by the option "propagator" of the `SolverInput`
+PROPAGATOR_MODES = ["symbolic", "numeric", "auto"]
+
+
+def simplify_expression(expr):
+    """
+    Simplifies an expression or a matrix according to `SIMPLIFY`.
+    """
+    if SIMPLIFY:
+        return simplify(expr)
+    if isinstance(expr, MatrixBase):
+        return expr.applyfunc(normalize_entry)
+    return normalize_entry(expr)
+
+
+class PropagatorMatrix(object):
+    """
+    A propagator `exp(A * h)` together with its sparsity pattern: the set of the (i, j) of all entries which are
+    not zero by the structure of `A` (see `propagator_engine.sparsity_pattern`). Entries are accessed as in the
+    wrapped `matrix`. For a propagator which is computed at the calibration of the generated model, `generator` is
+    `A` and the entries are placeholders (see `PropagatorCalculator.deferred_propagator`).
+    """
+
+    def __init__(self, matrix, sparsity, generator=None):
+        self.matrix = matrix
+        self.sparsity = sparsity
+        self.generator = generator
+
+    def __getitem__(self, key):
+        return self.matrix[key]
+
+
+def compute_shape_propagator(task):
+    """
+    Calls `PropagatorCalculator.shape_propagator` with the arguments `task`; unlike the static method, this function
+    can be passed to worker processes.
+    """
+    return PropagatorCalculator.shape_propagator(*task)
+
 
 class PropagatorCalculator(object):
     global h
@@ -33,12 +83,22 @@ class PropagatorCalculator(object):
         ode_rhs = "-1/Tau * V_m-1/C * (shape_alpha + shape_exp + shape_sin + currents + I_E)"
         prop_matrices, const_input, step_const = otpm.ode_to_prop_matrices(shapes, ode_var, ode_rhs)
         """
-        for function_var, function_definition in zip(function_vars, function_definitions):
-            exec("{0} = parse_expr(\"{1}\")".format(function_var, function_definition))
-        # ode functions are defined in the local scope. it must be passed explicitly into the parse_exp,
-        # otherwise, all functions in the ode would not be recognized as `complex` symbols
-        ode_rhs = parse_expr(ode_rhs_str, local_dict=locals())
-        ode_var = parse_expr(ode_var_str)
+        model = SolverModel("{}' = {}".format(ode_var_str, ode_rhs_str),
+                            [],
+                            ["{} = {}".format(var, definition)
+                             for var, definition in zip(function_vars, function_definitions)])
+        return PropagatorCalculator.model_to_prop_matrices(model, shapes)
+
+    @staticmethod
+    def model_to_prop_matrices(model, shapes, propagator_mode="symbolic", map_function=map):
+        """
+        Same as `ode_to_prop_matrices`, but for the ODE of an already parsed `SolverModel`.
+        :param propagator_mode: See `shape_propagator`.
+        :param map_function: Computes the propagators of the shapes, e.g. in worker processes (see
+        `solver_parallel.py`).
+        """
+        ode_var = model.ode_var
+        ode_rhs = model.ode_rhs
 
         # For V'= 1/Tau * V + 1/C * shape `ode_var_factor` is `1/Tau`
         # The `shape_factor` here is `1/C` this will be a list `shape_factors`
@@ -46,48 +106,23 @@ class PropagatorCalculator(object):
         # multiple different shapes is possible.
         ode_var_factor = diff(ode_rhs, ode_var)
         shape_factors = []
-        # This is a list of different propagator matrices for different shapes.
-        # These will be combined to give a complete step.
-        prop_matrices = []
+        # This is a list of the arguments of `shape_propagator` for different shapes.
+        # The propagator matrices will be combined to give a complete step.
+        propagator_tasks = []
 
         for shape in shapes:
 
             shape_factor = diff(ode_rhs, shape.name)
 
-            if isinstance(shape, ShapeFunction):
-                # For shapes that satisfy a homogeneous linear ODE of order 1 or
-                # 2 we calculate a upper triangular matrix to make calculations more
-                # efficient.
-                if shape.order == 1:
-                    A = Matrix([[shape.derivative_factors[0], 0             ],
-                                [shape_factor,                ode_var_factor]])
-                elif shape.order == 2:
-                    solutionpq = -shape.derivative_factors[1]/2 + sqrt(shape.derivative_factors[1]**2 / 4 + shape.derivative_factors[0])
-                    A = Matrix([[shape.derivative_factors[1]+solutionpq, 0,            0             ],
-                                [1,                                      -solutionpq,  0             ],
-                                [0,                                     shape_factor, ode_var_factor]])
-                # For shapes that satisfy a homogeneous linear ODE of order larger than
-                # 2 we calculate A by choosing the state variables canonicaly as
-                # y_0=I^(n),..., y_{n-1}=I, y_n=V
-                else:
-                    A = zeros(shape.order+1)
-                    A[shape.order, shape.order] = ode_var_factor
-                    A[shape.order, shape.order - 1] = shape_factor
-                    for j in range(0, shape.order):
-                        A[0, j] = shape.derivative_factors[shape.order - j - 1]
-                    for i in range(1, shape.order):
-                        A[i, i - 1] = 1
-
-            if isinstance(shape, ShapeODE):
-
-                A = zeros(shape.order + 1)
-                A[:shape.order, :shape.order] = shape.matrix
-                A[shape.order, shape.order] = ode_var_factor
-                A[shape.order, shape.order - 1] = shape_factor
+            A = zeros(shape.order + 1)
+            A[:shape.order, :shape.order] = PropagatorCalculator.shape_matrix(shape)
+            A[shape.order, shape.order] = ode_var_factor
+            A[shape.order, shape.order - 1] = shape_factor
 
             shape_factors.append(shape_factor)
-            # Calculate the mat
-            prop_matrices.append(simplify(exp(A * h)))
+            propagator_tasks.append((A, shape, propagator_mode, None))
+
+        prop_matrices = map_function(compute_shape_propagator, propagator_tasks)
 
         step_const = -1/ode_var_factor * (1 - exp(h * ode_var_factor))
 
@@ -95,16 +130,136 @@ class PropagatorCalculator(object):
         for shape_factor, shape in zip(shape_factors, shapes):
             const_input -= shape_factor * shape.name
 
-        return prop_matrices, simplify(const_input), simplify(step_const)
+        return prop_matrices, simplify_expression(const_input), simplify_expression(step_const)
+
+    @staticmethod
+    def shape_matrix(shape):
+        """
+        :return: The matrix of the linear homogeneous ODE system which the state variables of `shape` satisfy. The
+        last state variable is the shape itself.
+        """
+        if isinstance(shape, ShapeODE):
+            return shape.matrix
+
+        # For shapes that satisfy a homogeneous linear ODE of order 1 or
+        # 2 we calculate a upper triangular matrix to make calculations more
+        # efficient.
+        if shape.order == 1:
+            return Matrix([[shape.derivative_factors[0]]])
+        elif shape.order == 2:
+            solutionpq = -shape.derivative_factors[1]/2 + sqrt(shape.derivative_factors[1]**2 / 4 + shape.derivative_factors[0])
+            return Matrix([[shape.derivative_factors[1]+solutionpq, 0          ],
+                           [1,                                      -solutionpq]])
+        # For shapes that satisfy a homogeneous linear ODE of order larger than
+        # 2 we calculate A by choosing the state variables canonicaly as
+        # y_0=I^(n),..., y_{n-1}=I
+        B = zeros(shape.order)
+        for j in range(0, shape.order):
+            B[0, j] = shape.derivative_factors[shape.order - j - 1]
+        for i in range(1, shape.order):
+            B[i, i - 1] = 1
+        return B
+
+    @staticmethod
+    def system_to_prop_matrices(model, shapes, propagator_mode="symbolic", map_function=map):
+        """
+        Calculates the propagators of a system of linear ODEs with constant coefficients `x' = J x + S y + c` of the
+        ODE variables `x`, where the inhomogeneous part is a linear combination of the `shapes` `y` plus a constant
+        input `c`. As in `ode_to_prop_matrices`, there is one propagator per shape, which now covers the state
+        variables of the shape and all ODE variables. The evolution of `x` without shapes is given by
+        `exp(J h) x + Phi c` with `Phi = int_0^h exp(J s) ds`; both are computed as blocks of the exponential of
+        `[[0, 0], [1, J]]`.
+        :param propagator_mode: See `shape_propagator`; applies to the propagators of the shapes.
+        :param map_function: See `model_to_prop_matrices`.
+        :return: The propagators, `exp(J h)`, `Phi` and the vector `c`.
+        """
+        ode_vars = [ode_var for ode_var, _ in model.odes]
+        n = len(ode_vars)
+        J = Matrix(n, n, lambda i, j: diff(model.odes[i][1], ode_vars[j]))
+
+        M = zeros(2 * n)
+        M[n:, :n] = eye(n)
+        M[n:, n:] = J
+        E = PropagatorCalculator.propagator(M, [(0, n), (n, 2 * n)]).matrix
+        ode_var_factor = E[n:, n:]
+        step_const = E[n:, :n]
+
+        const_input = [ode_rhs - sum(J[i, j] * ode_vars[j] for j in range(n)) for i, (_, ode_rhs) in enumerate(model.odes)]
+        propagator_tasks = []
+        for shape in shapes:
+            shape_factors = [diff(ode_rhs, shape.name) for _, ode_rhs in model.odes]
+
+            A = zeros(shape.order + n)
+            A[:shape.order, :shape.order] = PropagatorCalculator.shape_matrix(shape)
+            A[shape.order:, shape.order:] = J
+            for i in range(n):
+                A[shape.order + i, shape.order - 1] = shape_factors[i]
+                const_input[i] -= shape_factors[i] * shape.name
+
+            propagator_tasks.append((A, shape, propagator_mode, [(0, shape.order), (shape.order, shape.order + n)]))
+
+        prop_matrices = map_function(compute_shape_propagator, propagator_tasks)
+        return prop_matrices, ode_var_factor, step_const, [simplify_expression(c) for c in const_input]
+
+    @staticmethod
+    def shape_propagator(A, shape, propagator_mode, blocks=None):
+        """
+        Computes the propagator of `shape`:
+        "symbolic": always symbolically (see `propagator`)
+        "numeric": always at the calibration of the generated model (see `deferred_propagator`)
+        "auto": at the calibration if the closed form is not applicable
+        """
+        if propagator_mode == "numeric" or (propagator_mode == "auto" and characteristic_roots(A, blocks) is None):
+            return PropagatorCalculator.deferred_propagator(A, propagator_name(shape.name))
+        return PropagatorCalculator.propagator(A, blocks)
+
+    @staticmethod
+    def deferred_propagator(A, name):
+        """
+        Defers the computation of `exp(A * h)` to the calibration of the generated model. The returned
+        `PropagatorMatrix` holds `A` as generator and placeholders `name[i][j]` for all entries in the sparsity
+        pattern.
+        """
+        sparsity = sparsity_pattern(A)
+        placeholders = Matrix(A.rows, A.cols,
+                              lambda i, j: Symbol("{}[{}][{}]".format(name, i, j)) if (i, j) in sparsity else 0)
+        return PropagatorMatrix(placeholders, sparsity, generator=A)
+
+    @staticmethod
+    def propagator(A, blocks=None):
+        """
+        Computes the propagator `exp(A * h)` as `PropagatorMatrix`.
+        :param blocks: Diagonal blocks of `A` (see `propagator_engine.characteristic_roots`).
+        """
+        sparsity = sparsity_pattern(A)
+        if PROPAGATOR_ENGINE == "closed_form":
+            eigenvalues = characteristic_roots(A, blocks)
+            if eigenvalues is not None:
+                return PropagatorMatrix(propagator_from_roots(A, h, eigenvalues, pattern=sparsity), sparsity)
+        return PropagatorMatrix(simplify_expression(exp(A * h)), sparsity)
 
     @staticmethod
     def constant_input(step_const, ode_var_str):
         return "__ode_var_factor * " + ode_var_str + " + __const_input * (" + str(step_const) + ")"
 
     @staticmethod
-    def prop_matrix_to_prop_step(prop_matrices, const_input, step_const, shapes, ode_var_str):
-        p_order_order = prop_matrices[0][shapes[0].order, shapes[0].order]
-        ode_var = parse_expr(ode_var_str)
+    def ode_var_propagator(model):
+        """
+        :return: The propagator `exp(h * ode_var_factor)` of the ODE variable of the model without any shapes.
+        """
+        return simplify_expression(exp(h * diff(model.ode_rhs, model.ode_var)))
+
+    @staticmethod
+    def prop_matrix_to_prop_step(prop_matrices, const_input, step_const, shapes, ode_var_str, ode_var_propagator=None):
+        """
+        :param ode_var_propagator: See `ode_var_propagator`; only required if there are no shapes, otherwise it is
+        an element of the propagators of the shapes.
+        """
+        if prop_matrices:
+            p_order_order = prop_matrices[0][shapes[0].order, shapes[0].order]
+        else:
+            p_order_order = ode_var_propagator
+        ode_var = Symbol(ode_var_str)
         ode_var_factor = {"__ode_var_factor": str(p_order_order)}
         const_input = {"__const_input": str(const_input)}
 
@@ -112,15 +267,15 @@ class PropagatorCalculator(object):
         ode_var_update_instructions = [ode_var_str + " = " + str(PropagatorCalculator.constant_input(step_const, ode_var_str))]
         for p, shape in zip(prop_matrices, shapes):
             P = zeros(shape.order + 1, shape.order + 1)
-            for i in range(shape.order + 1):
-                for j in range(shape.order + 1):
-                    if simplify(p[i, j]) != sympify(0):
-                        P[i, j] = parse_expr("__P_{}__{}_{}".format(shape.name, i, j))
-                        propagator_elements.append({"__P_{}__{}_{}".format(shape.name, i, j): str(p[i, j])})
+            # entries outside of the sparsity pattern are zero by construction and need no zero test
+            for i, j in sorted(p.sparsity):
+                if not is_zero(p[i, j]):
+                    P[i, j] = Symbol("__P_{}__{}_{}".format(shape.name, i, j))
+                    propagator_elements.append({"__P_{}__{}_{}".format(shape.name, i, j): str(p[i, j])})
 
             y = zeros(shape.order + 1, 1)
             for i in range(shape.order):
-                y[i] = parse_expr(shape.additional_shape_state_variables()[i])
+                y[i] = Symbol(shape.additional_shape_state_variables()[i])
             y[shape.order] = ode_var
 
             P[shape.order, shape.order] = 0
@@ -128,13 +283,73 @@ class PropagatorCalculator(object):
 
             ode_var_update_instructions.append(ode_var_str + " += " + str(z[shape.order]))
 
-            shape_state_vector_as_expr = zeros(shape.order, 1)
-            for idx in range(len(shape.additional_shape_state_variables())):
-                shape_state_vector_as_expr[idx, 0] = Symbol(shape.additional_shape_state_variables()[idx])
-
-            shape_state_updates = P[:shape.order, :shape.order] * shape_state_vector_as_expr
-            for idx in range(0, shape_state_updates.rows):
-                shape.add_update_to_shape_state_variable(shape_state_vector_as_expr[idx], shape_state_updates[idx])
+            PropagatorCalculator.add_shape_state_updates(P, shape)
 
         return propagator_elements, ode_var_factor, const_input, ode_var_update_instructions
 
+    @staticmethod
+    def add_shape_state_updates(P, shape):
+        """
+        Stores the updates of the state variables of `shape` in terms of the propagator symbols `P` in the shape.
+        """
+        shape_state_vector_as_expr = zeros(shape.order, 1)
+        for idx in range(len(shape.additional_shape_state_variables())):
+            shape_state_vector_as_expr[idx, 0] = Symbol(shape.additional_shape_state_variables()[idx])
+
+        shape_state_updates = P[:shape.order, :shape.order] * shape_state_vector_as_expr
+        for idx in range(0, shape_state_updates.rows):
+            shape.add_update_to_shape_state_variable(shape_state_vector_as_expr[idx], shape_state_updates[idx])
+
+    @staticmethod
+    def system_prop_matrix_to_prop_step(prop_matrices, ode_var_factor, step_const, const_input, shapes, ode_vars):
+        """
+        Same as `prop_matrix_to_prop_step` for the result of `system_to_prop_matrices`. The ODE variables are updated
+        simultaneously via temporary variables `__tmp__<ode_var>`; the elements of `exp(J h)` and `Phi` are named
+        `__ode_var_factor__<ode_var>__<ode_var>` and `__P_const_input__<ode_var>__<ode_var>`, the constant inputs
+        `__const_input__<ode_var>`.
+        """
+        n = len(ode_vars)
+        ode_var_factor_elements = {}
+        const_input_elements = {}
+        propagator_elements = []
+        ode_var_update_instructions = []
+
+        for i, ode_var in enumerate(ode_vars):
+            terms = []
+            for j, other_ode_var in enumerate(ode_vars):
+                if not is_zero(ode_var_factor[i, j]):
+                    name = "__ode_var_factor__{}__{}".format(ode_var, other_ode_var)
+                    ode_var_factor_elements[name] = str(ode_var_factor[i, j])
+                    terms.append("{} * {}".format(name, other_ode_var))
+            for j, other_ode_var in enumerate(ode_vars):
+                if not is_zero(step_const[i, j]) and not is_zero(const_input[j]):
+                    name = "__P_const_input__{}__{}".format(ode_var, other_ode_var)
+                    propagator_elements.append({name: str(step_const[i, j])})
+                    terms.append("{} * __const_input__{}".format(name, other_ode_var))
+            ode_var_update_instructions.append("__tmp__{} = {}".format(ode_var, " + ".join(terms) if terms else "0"))
+
+        for j, ode_var in enumerate(ode_vars):
+            if not is_zero(const_input[j]):
+                const_input_elements["__const_input__{}".format(ode_var)] = str(const_input[j])
+
+        for p, shape in zip(prop_matrices, shapes):
+            P = zeros(shape.order + n, shape.order)
+            # the block of the ODE variables is `exp(J h)`, which is emitted above
+            for i, j in sorted(p.sparsity):
+                if j < shape.order and not is_zero(p[i, j]):
+                    P[i, j] = Symbol("__P_{}__{}_{}".format(shape.name, i, j))
+                    propagator_elements.append({"__P_{}__{}_{}".format(shape.name, i, j): str(p[i, j])})
+
+            y = Matrix([Symbol(variable) for variable in shape.additional_shape_state_variables()])
+            z = P[shape.order:, :] * y
+            for i, ode_var in enumerate(ode_vars):
+                if z[i] != 0:
+                    ode_var_update_instructions.append("__tmp__{} += {}".format(ode_var, z[i]))
+
+            PropagatorCalculator.add_shape_state_updates(P, shape)
+
+        for ode_var in ode_vars:
+            ode_var_update_instructions.append("{} = __tmp__{}".format(ode_var, ode_var))
+
+        return propagator_elements, ode_var_factor_elements, const_input_elements, ode_var_update_instructions
+
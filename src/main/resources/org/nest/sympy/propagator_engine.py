@@ -0,0 +1,153 @@
+"""
+   Closed-form construction of propagators `exp(A * h)`.
+
+   The matrices `A` built in `PropagatorCalculator.ode_to_prop_matrices` are
+   block lower triangular:
+
+       A = [[B, 0             ],
+            [r, ode_var_factor]]
+
+   where `B` describes the shape (a triangular matrix for shapes of order 1 and
+   2, a companion matrix for higher orders) and `r` couples the shape to the
+   ODE variable. The eigenvalues of `A` are therefore the roots of the
+   characteristic polynomial of `B` (for a companion matrix, the polynomial
+   with the coefficients `derivative_factors`) together with `ode_var_factor`.
+   For systems of ODEs, `ode_var_factor` is the matrix of the coefficients of
+   the ODE variables and contributes the roots of its characteristic
+   polynomial; in general, any block lower triangular matrix is handled.
+
+   With the eigenvalues `z_0, ..., z_{N-1}` (repeated according to their
+   multiplicity) the exponential is the Hermite interpolation polynomial of
+   `f(z) = exp(z * h)` evaluated at `A`, written in Newton form:
+
+       exp(A * h) = sum_k f[z_0, ..., z_k] * (A - z_0) * ... * (A - z_{k-1})
+
+   The divided differences `f[...]` are explicit: for a group of `m + 1` equal
+   nodes `z` it is `h**m * exp(z * h) / m!`. In contrast to the generic
+   `exp(A * h)` of SymPy, no eigenvectors or Jordan forms are computed.
+"""
+
+from sympy import Dummy, Matrix, eye, exp, factor_terms, factorial, roots, sympify, together
+
+from zero_testing import is_zero
+
+
+def normalize_entry(entry):
+    """
+    Cheap normalization of a propagator entry. For the matrices built here it is much faster than `simplify` and
+    yields expressions with fewer operations.
+    """
+    return factor_terms(together(entry))
+
+
+def is_triangular(A):
+    return A.is_lower or A.is_upper
+
+
+def characteristic_roots(A, blocks=None):
+    """
+    Computes the eigenvalues of a block lower triangular propagator matrix `A` from its diagonal blocks, which are
+    either triangular or small enough to find the roots of their characteristic polynomials.
+    :param blocks: List of the (start, end) index ranges of the diagonal blocks. By default, the blocks of the
+    matrices of `PropagatorCalculator.ode_to_prop_matrices` (see above): the shape and the ODE variable.
+    :return: List of (eigenvalue, multiplicity) tuples, or None if `A` is not block lower triangular or the roots
+    of a characteristic polynomial cannot be found.
+    """
+    if blocks is None:
+        blocks = [(0, A.rows - 1), (A.rows - 1, A.rows)]
+
+    candidates = []
+    for start, end in blocks:
+        if any(A[i, j] != 0 for i in range(start, end) for j in range(end, A.cols)):
+            return None
+
+        B = A[start:end, start:end]
+        if is_triangular(B):
+            candidates += [B[i, i] for i in range(B.rows)]
+        else:
+            x = Dummy("x")
+            block_roots = roots(B.charpoly(x).as_expr(), x)
+            if sum(block_roots.values()) != B.rows:
+                return None
+            for root, multiplicity in block_roots.items():
+                candidates += [root] * multiplicity
+
+    eigenvalues = []
+    for candidate in candidates:
+        for idx, (eigenvalue, multiplicity) in enumerate(eigenvalues):
+            if is_zero(candidate - eigenvalue):
+                eigenvalues[idx] = (eigenvalue, multiplicity + 1)
+                break
+        else:
+            eigenvalues.append((candidate, 1))
+    return eigenvalues
+
+
+def sparsity_pattern(A):
+    """
+    Computes the entries of `exp(A * h)` which can be nonzero: `(A**k)[i, j]` vanishes for all `k` unless the
+    graph of the nonzero entries of `A` has a path from `j` to `i`.
+    :return: Set of the (i, j) tuples of the structurally nonzero entries.
+    """
+    N = A.rows
+    # sources[i] contains all j with a path from j to i
+    sources = [{i} for i in range(N)]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(N):
+            for k in range(N):
+                if A[i, k] != 0 and not sources[k] <= sources[i]:
+                    sources[i] |= sources[k]
+                    changed = True
+    return set((i, j) for i in range(N) for j in sources[i])
+
+
+def divided_differences(nodes, h):
+    """
+    Computes the divided differences `f[z_0, ..., z_k]` of `f(z) = exp(z * h)` for all `k`.
+    :param nodes: List of (eigenvalue, group) tuples; equal eigenvalues have the same group and are adjacent.
+    """
+    N = len(nodes)
+    # table[i] holds f[z_i, ..., z_{i+level}] for the current level
+    table = [exp(z * h) for z, _ in nodes]
+    result = [table[0]]
+    for level in range(1, N):
+        next_table = []
+        for i in range(N - level):
+            z_first, group_first = nodes[i]
+            z_last, group_last = nodes[i + level]
+            if group_first == group_last:
+                next_table.append(h ** level * exp(z_first * h) / factorial(level))
+            else:
+                next_table.append((table[i + 1] - table[i]) / (z_last - z_first))
+        table = next_table
+        result.append(table[0])
+    return result
+
+
+def propagator_from_roots(A, h, eigenvalues, normalize=normalize_entry, pattern=None):
+    """
+    Computes `exp(A * h)` from the eigenvalues of `A`.
+    :param eigenvalues: List of (eigenvalue, multiplicity) tuples as returned by `characteristic_roots`.
+    :param normalize: Function which is applied to every nonzero entry of the result.
+    :param pattern: The `sparsity_pattern` of `A`; the entries outside of it are set to zero without normalization.
+    """
+    nodes = []
+    for group, (eigenvalue, multiplicity) in enumerate(eigenvalues):
+        nodes += [(eigenvalue, group)] * multiplicity
+
+    coefficients = divided_differences(nodes, h)
+    N = A.rows
+    P = Matrix.zeros(N, N)
+    product = eye(N)
+    for k, (z, _) in enumerate(nodes):
+        P += coefficients[k] * product
+        product = product * (A - z * eye(N))
+
+    if pattern is None:
+        pattern = sparsity_pattern(A)
+    for i in range(N):
+        for j in range(N):
+            P[i, j] = normalize(P[i, j]) if (i, j) in pattern and P[i, j] != 0 else sympify(0)
+    return P
@@ -0,0 +1,65 @@
+import unittest
+
+from sympy import Matrix, diff, exp, eye, symbols
+
+from propagator_engine import characteristic_roots, propagator_from_roots, sparsity_pattern
+
+h, tau, Tau, C = symbols("__h, tau, Tau, C")
+
+
+def satisfies_propagator_ode(A, P):
+    """
+    Checks numerically that P(0) = 1 and dP/dh = A * P
+    """
+    values = {tau: 0.7, Tau: 1.9, C: 2.3}
+    initial = (P.subs(values).subs(h, 0) - eye(A.rows)).evalf()
+    residual = (diff(P, h) - A * P).subs(values).subs(h, 0.3).evalf()
+    return max(abs(x) for x in initial) < 1e-12 and max(abs(x) for x in residual) < 1e-12
+
+
+class TestPropagatorEngine(unittest.TestCase):
+
+    def test_repeated_roots_of_alpha_shape(self):
+        A = Matrix([[-1 / tau, 0, 0],
+                    [1, -1 / tau, 0],
+                    [0, 1 / C, -1 / Tau]])
+        eigenvalues = characteristic_roots(A)
+        self.assertEqual([(-1 / tau, 2), (-1 / Tau, 1)], eigenvalues)
+
+        P = propagator_from_roots(A, h, eigenvalues)
+        self.assertEqual(0, P[0, 1])
+        self.assertEqual(h * exp(-h / tau), P[1, 0])
+        self.assertTrue(satisfies_propagator_ode(A, P))
+
+    def test_companion_matrix_of_third_order_shape(self):
+        # shape t**2 * exp(-t/tau) satisfies I''' = -1/tau**3 * I - 3/tau**2 * I' - 3/tau * I''
+        A = Matrix([[-3 / tau, -3 / tau ** 2, -1 / tau ** 3, 0],
+                    [1, 0, 0, 0],
+                    [0, 1, 0, 0],
+                    [0, 0, 1 / C, -1 / Tau]])
+        eigenvalues = characteristic_roots(A)
+        self.assertEqual([(-1 / tau, 3), (-1 / Tau, 1)], eigenvalues)
+        self.assertTrue(satisfies_propagator_ode(A, propagator_from_roots(A, h, eigenvalues)))
+
+    def test_sparsity_pattern(self):
+        A = Matrix([[-1 / tau, 0, 0],
+                    [1, -1 / tau, 0],
+                    [0, 1 / C, -1 / Tau]])
+        self.assertEqual({(0, 0), (1, 0), (1, 1), (2, 0), (2, 1), (2, 2)}, sparsity_pattern(A))
+
+        # the shape block of a companion matrix is dense, the ODE variable does not feed back into the shape
+        A = Matrix([[-3 / tau, -3 / tau ** 2, -1 / tau ** 3, 0],
+                    [1, 0, 0, 0],
+                    [0, 1, 0, 0],
+                    [0, 0, 1 / C, -1 / Tau]])
+        pattern = sparsity_pattern(A)
+        self.assertEqual(13, len(pattern))
+        self.assertTrue(all((i, 3) not in pattern for i in range(3)))
+
+    def test_unknown_structure(self):
+        A = Matrix([[-1 / tau, 1],
+                    [1 / C, -1 / Tau]])
+        self.assertIsNone(characteristic_roots(A))
+
+if __name__ == '__main__':
+    unittest.main()
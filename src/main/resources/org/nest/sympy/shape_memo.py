@@ -0,0 +1,207 @@
+"""
+   Memoization of the shape analysis up to the renaming of symbols. Models
+   use the same shape forms over and over again with different names for
+   the time constants, e.g. `e/tau_syn_in*t*exp(-t/tau_syn_in)` and
+   `e/tau_syn_ex*t*exp(-t/tau_syn_ex)`. Before a shape is analyzed, all its
+   free symbols except `t` are renamed in a canonical way, so that both
+   shapes above yield the same canonical expression. The ODE (order,
+   derivative factors and initial values) is computed once for the
+   canonical expression and mapped back to the symbols of each shape. The
+   entries are keyed by the canonical expression and the order detection
+   mode, since the modes can find different ODEs for the same shape.
+
+   The memo lives in the process (e.g. in the server or batch mode) and
+   keeps at most `MAX_ENTRIES` entries, the least recently used ones are
+   evicted. It can additionally be persisted as a JSON file, into which the
+   new entries are written by `flush`, i.e. once per request. The canonical
+   forms of several shapes can be analyzed in advance by worker processes
+   (`prefetch`).
+"""
+
+import json
+from collections import OrderedDict
+
+from solver_cache import atomic_write_json
+
+# the symbols of a canonical shape expression are CANONICAL_SYMBOL_PREFIX + index
+CANONICAL_SYMBOL_PREFIX = "__shape_symbol_"
+
+# default limit of the entries of a `ShapeMemo` in the process
+MAX_ENTRIES = 1000
+
+
+def canonicalize(shape_expr):
+    """
+    Renames the free symbols of `shape_expr` (all but `t`) independently of their names.
+
+    The symbols are ordered by their role in the expression: for every symbol, the expression is rewritten with
+    this symbol replaced by a marker and all other symbols replaced by one placeholder. Since SymPy orders the
+    arguments of the rewritten expression itself, this signature does not depend on the original names.
+    Symbols with identical signatures are ordered by name, which can only cause a miss in the memo.
+    :return: The canonical expression and the mapping from canonical to original symbols.
+    """
+    from sympy import Symbol, srepr
+    from shapes import t
+
+    symbols = shape_expr.free_symbols - {t}
+    marker = Symbol(CANONICAL_SYMBOL_PREFIX + "marker")
+    placeholder = Symbol(CANONICAL_SYMBOL_PREFIX + "placeholder")
+
+    def signature(symbol):
+        replacements = dict((other, placeholder) for other in symbols)
+        replacements[symbol] = marker
+        return srepr(shape_expr.xreplace(replacements))
+
+    ordered_symbols = sorted(symbols, key=lambda symbol: (signature(symbol), str(symbol)))
+    canonical_symbols = [Symbol(CANONICAL_SYMBOL_PREFIX + str(idx)) for idx in range(len(ordered_symbols))]
+
+    canonical_expr = shape_expr.xreplace(dict(zip(ordered_symbols, canonical_symbols)))
+    return canonical_expr, dict(zip(canonical_symbols, ordered_symbols))
+
+
+def memo_key(canonical_expr, order_detection):
+    """
+    :return: The key of the ODE of `canonical_expr` found with the order detection mode `order_detection`.
+    """
+    from sympy import srepr
+    return "{}:{}".format(order_detection, srepr(canonical_expr))
+
+
+def find_canonical_ode(task):
+    """
+    Calls `shapes.find_shape_ode` with the arguments `task`; can be passed to worker processes.
+    """
+    from shapes import find_shape_ode
+    return find_shape_ode(*task)
+
+
+class ShapeMemo(object):
+    """
+    Stores the ODEs of canonical shape expressions, at most `max_entries` of them. If `path` is given, the memo is
+    loaded from this JSON file (at the first lookup, since the entries are parsed by SymPy) and the new entries are
+    written back to it by `flush`.
+    """
+
+    def __init__(self, path=None, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        # ordered from the least to the most recently used entry
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.loaded = path is None
+        # True if there are entries which are not in the memo file yet
+        self.dirty = False
+        # keys which were analyzed by `prefetch` and not looked up since
+        self.prefetched = set()
+
+    @staticmethod
+    def load(path):
+        """
+        :return: The entries of the memo file `path`; an unreadable file is treated as empty.
+        """
+        try:
+            with open(path) as memo_file:
+                stored_entries = json.load(memo_file)
+        except (IOError, ValueError):
+            return {}
+
+        from sympy import sympify
+        entries = {}
+        for key, entry in stored_entries.items():
+            entries[key] = (entry["order"],
+                            [sympify(factor) for factor in entry["derivative_factors"]],
+                            [sympify(initial_value) for initial_value in entry["initial_values"]])
+        return entries
+
+    def save(self):
+        """
+        Merges the entries into the memo file, so that concurrent processes do not lose each other's entries.
+        """
+        from sympy import srepr
+        entries = self.load(self.path)
+        entries.update(self.entries)
+        stored_entries = {}
+        for key, (order, derivative_factors, initial_values) in entries.items():
+            stored_entries[key] = {"order": order,
+                                   "derivative_factors": [srepr(factor) for factor in derivative_factors],
+                                   "initial_values": [srepr(initial_value) for initial_value in initial_values]}
+        atomic_write_json(self.path, stored_entries)
+
+    def flush(self):
+        """
+        Saves the memo if it is persisted and has new entries.
+        """
+        if self.dirty and self.path is not None:
+            self.save()
+        self.dirty = False
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            for key, entry in self.load(self.path).items():
+                self.store(key, entry)
+            self.loaded = True
+
+    def store(self, key, entry):
+        """
+        Adds an entry and evicts the least recently used entries beyond `max_entries`.
+        """
+        self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            evicted_key, _ = self.entries.popitem(last=False)
+            self.prefetched.discard(evicted_key)
+
+    def prefetch(self, shape_exprs, map_function=map, order_detection=None):
+        """
+        Analyzes every canonical form of `shape_exprs` which is not in the memo yet exactly once with
+        `map_function`, e.g. in worker processes (see `solver_parallel.py`). The following `find_ode` of such a
+        shape counts as miss.
+        """
+        from shapes import ORDER_DETECTION
+
+        if order_detection is None:
+            order_detection = ORDER_DETECTION
+        self.ensure_loaded()
+
+        missing = {}
+        for shape_expr in shape_exprs:
+            canonical_expr, _ = canonicalize(shape_expr)
+            key = memo_key(canonical_expr, order_detection)
+            if key not in self.entries and key not in missing:
+                missing[key] = canonical_expr
+        keys = sorted(missing)
+        for key, entry in zip(keys, map_function(find_canonical_ode,
+                                                 [(missing[key], order_detection) for key in keys])):
+            self.store(key, entry)
+            self.prefetched.add(key)
+        self.dirty = self.dirty or bool(keys)
+
+    def find_ode(self, shape_expr, order_detection=None):
+        """
+        Same as `shapes.find_shape_ode`, but the analysis is reused for all shapes with the same canonical form.
+        :return: `order`, `derivative_factors` and `initial_values` in the symbols of `shape_expr`.
+        """
+        from shapes import ORDER_DETECTION, find_shape_ode
+
+        if order_detection is None:
+            order_detection = ORDER_DETECTION
+        self.ensure_loaded()
+
+        canonical_expr, symbol_map = canonicalize(shape_expr)
+        key = memo_key(canonical_expr, order_detection)
+
+        if key in self.prefetched:
+            self.prefetched.discard(key)
+            self.misses += 1
+        elif key in self.entries:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.store(key, find_shape_ode(canonical_expr, order_detection))
+            self.dirty = True
+
+        order, derivative_factors, initial_values = self.entries.pop(key)
+        self.entries[key] = (order, derivative_factors, initial_values)
+        return (order,
+                [factor.xreplace(symbol_map) for factor in derivative_factors],
+                [initial_value.xreplace(symbol_map) for initial_value in initial_values])
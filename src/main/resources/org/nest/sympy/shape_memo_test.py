@@ -0,0 +1,91 @@
+import unittest
+
+import os
+import shutil
+import tempfile
+
+from sympy.parsing.sympy_parser import parse_expr
+
+from shape_memo import ShapeMemo, canonicalize
+from shapes import ShapeFunction, find_shape_ode
+
+
+class TestShapeMemo(unittest.TestCase):
+
+    def test_canonical_form_ignores_names(self):
+        shape_in, _ = canonicalize(parse_expr("pA*(e/tau_syn_in)*t*exp((-1)/tau_syn_in*t)"))
+        shape_ex, _ = canonicalize(parse_expr("a_weight*(e/tau_syn_ex)*t*exp((-1)/tau_syn_ex*t)"))
+        self.assertEqual(shape_in, shape_ex)
+
+        beta = parse_expr("exp(-t/tau_decay) - exp(-t/tau_rise)")
+        canonical_beta, symbol_map = canonicalize(beta)
+        self.assertEqual(beta, canonical_beta.xreplace(symbol_map))
+        self.assertEqual(canonical_beta, canonicalize(parse_expr("exp(-t/tau_2) - exp(-t/tau_1)"))[0])
+        self.assertNotEqual(canonical_beta, canonicalize(parse_expr("exp(-t/tau_2) + exp(-t/tau_1)"))[0])
+
+    def test_renamed_shape_is_reused(self):
+        memo = ShapeMemo()
+        shape_in = ShapeFunction("I_shape_in", "(e/tau_syn_in) * t * exp(-t/tau_syn_in)", memo=memo)
+        shape_ex = ShapeFunction("I_shape_ex", "(e/tau_syn_ex) * t * exp(-t/tau_syn_ex)", memo=memo)
+        self.assertEqual(1, memo.hits)
+        self.assertEqual(1, memo.misses)
+
+        expected = ShapeFunction("I_shape_ex", "(e/tau_syn_ex) * t * exp(-t/tau_syn_ex)")
+        self.assertEqual(expected.order, shape_ex.order)
+        self.assertEqual(expected.derivative_factors, shape_ex.derivative_factors)
+        self.assertEqual(expected.initial_values, shape_ex.initial_values)
+        self.assertEqual(expected.nestml_ode_form, shape_ex.nestml_ode_form)
+        self.assertEqual([parse_expr("-1/tau_syn_in**2"), parse_expr("-2/tau_syn_in")], shape_in.derivative_factors)
+
+    def test_persistent_memo(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            memo_path = os.path.join(tmp_dir, "shapes.json")
+            memo = ShapeMemo(memo_path)
+            ShapeFunction("g_in", "exp(-t/tau_syn_in)", memo=memo)
+            self.assertFalse(os.path.exists(memo_path))
+            memo.flush()
+
+            memo = ShapeMemo(memo_path)
+            shape = ShapeFunction("g_ex", "exp(-t/tau_syn_ex)", memo=memo)
+            self.assertEqual(1, memo.hits)
+            self.assertEqual([parse_expr("-1/tau_syn_ex")], shape.derivative_factors)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_prefetch(self):
+        memo = ShapeMemo()
+        shape_exprs = [parse_expr("exp(-t/tau_syn_in)"), parse_expr("exp(-t/tau_syn_ex)"),
+                       parse_expr("t*exp(-t/tau_syn_ex)")]
+        memo.prefetch(shape_exprs)
+        self.assertEqual(2, len(memo.entries))
+
+        shape = ShapeFunction("g_in", "exp(-t/tau_syn_in)", memo=memo)
+        ShapeFunction("g_ex", "exp(-t/tau_syn_ex)", memo=memo)
+        self.assertEqual(1, memo.hits)
+        self.assertEqual(1, memo.misses)
+        self.assertEqual([parse_expr("-1/tau_syn_in")], shape.derivative_factors)
+
+    def test_order_detection_is_part_of_key(self):
+        memo = ShapeMemo()
+        shape_expr = parse_expr("exp(-t/tau_syn_in)")
+        memo.find_ode(shape_expr, "symbolic")
+        memo.find_ode(shape_expr, "fast")
+        self.assertEqual(0, memo.hits)
+        self.assertEqual(2, memo.misses)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        memo = ShapeMemo(max_entries=2)
+        shape_exprs = [parse_expr("exp(-t/tau)"), parse_expr("t*exp(-t/tau)"), parse_expr("t**2*exp(-t/tau)")]
+        memo.find_ode(shape_exprs[0])
+        memo.find_ode(shape_exprs[1])
+        memo.find_ode(shape_exprs[0])
+        memo.find_ode(shape_exprs[2])
+        self.assertEqual(2, len(memo.entries))
+        memo.find_ode(shape_exprs[0])
+        self.assertEqual(2, memo.hits)
+        self.assertEqual(find_shape_ode(shape_exprs[1]), memo.find_ode(shape_exprs[1]))
+        self.assertEqual(4, memo.misses)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+   Merging of shapes with identical dynamics. Two shapes `I_a` and `I_b`
+   which satisfy the same linear homogeneous ODE and whose initial values are
+   proportional, `I_b = c * I_a`, are the same function up to the factor `c`,
+   e.g. excitatory and inhibitory alpha kernels with the same time constant.
+
+   Since the ODE is linear in the shapes, the contribution
+   `shape_factor_b * I_b` of the merged shape `I_b` can be carried by the
+   state variables of `I_a`: a spike of weight `w` which is received by `I_b`
+   increments the state variables of `I_a` by `w * input_factor` times the
+   initial values of `I_a`, where
+
+       input_factor = c * shape_factor_b / shape_factor_a
+
+   The merged shapes get neither state variables nor propagators; the
+   mapping is reported in the field `merged_shapes` of the `SolverOutput`.
+"""
+
+from sympy import cancel, diff
+
+from shapes import ShapeFunction
+from zero_testing import is_zero
+
+
+def proportionality_factor(shape_a, shape_b):
+    """
+    :return: `c` with `shape_b = c * shape_a` if both `ShapeFunction`s satisfy the same ODE and have proportional
+    initial values, otherwise None.
+    """
+    if shape_a.order != shape_b.order:
+        return None
+    if not all(is_zero(factor_a - factor_b)
+               for factor_a, factor_b in zip(shape_a.derivative_factors, shape_b.derivative_factors)):
+        return None
+
+    pivots = [idx for idx, initial_value in enumerate(shape_a.initial_values) if not is_zero(initial_value)]
+    if not pivots:
+        return None
+    c = cancel(shape_b.initial_values[pivots[0]] / shape_a.initial_values[pivots[0]])
+    if all(is_zero(initial_value_b - c * initial_value_a)
+           for initial_value_a, initial_value_b in zip(shape_a.initial_values, shape_b.initial_values)):
+        return c
+    return None
+
+
+def merge_equivalent_shapes(model, shape_functions):
+    """
+    Merges every shape into the first preceding shape with identical dynamics. Shapes whose factor in the ODE is
+    zero or depends on a shape and shapes which are given as `ShapeODE` are never merged.
+    :param model: `SolverModel` with a linear constant coefficient ODE.
+    :return: The model without the merged shapes, the remaining `ShapeFunction`s and the list of the merged shapes
+    as dictionaries with the keys `shape`, `merged_into` and `input_factor`.
+    """
+    shape_symbols = set(shape.name for shape in shape_functions)
+    representatives = []  # (shape, shape factor) tuples
+    merged_shapes = []
+    for shape in shape_functions:
+        shape_factor = diff(model.ode_rhs, shape.name)
+        if not isinstance(shape, ShapeFunction) or is_zero(shape_factor) or shape_factor.free_symbols & shape_symbols:
+            representatives.append((shape, None))
+            continue
+
+        for representative, representative_factor in representatives:
+            if representative_factor is None:
+                continue
+            c = proportionality_factor(representative, shape)
+            if c is not None:
+                merged_shapes.append({"shape": str(shape.name),
+                                      "merged_into": str(representative.name),
+                                      "input_factor": str(cancel(c * shape_factor / representative_factor))})
+                break
+        else:
+            representatives.append((shape, shape_factor))
+
+    merged_symbols = shape_symbols - set(shape.name for shape, _ in representatives)
+    return (model.without_shapes(merged_symbols),
+            [shape for shape, _ in representatives],
+            merged_shapes)
@@ -0,0 +1,41 @@
+import unittest
+
+import json
+
+from sympy.parsing.sympy_parser import parse_expr
+
+from OdeAnalyzer import OdeAnalyzer
+from shape_merging import proportionality_factor
+from shapes import ShapeFunction
+
+shared_tau_ode_block = {
+    "ode": "V_m' = -V_m/Tau + (I_in + I_ex + I_e) / C_m",
+    "shapes": ["I_in = (e/tau_syn) * t * exp(-t/tau_syn)",
+               "I_ex = 2 * (e/tau_syn) * t * exp(-t/tau_syn)",
+               "I_slow = (e/tau_slow) * t * exp(-t/tau_slow)"]}
+
+
+class TestShapeMerging(unittest.TestCase):
+
+    def test_proportionality_factor(self):
+        alpha = ShapeFunction("I_a", "(e/tau) * t * exp(-t/tau)")
+        scaled_alpha = ShapeFunction("I_b", "-w * (e/tau) * t * exp(-t/tau)")
+        self.assertEqual(parse_expr("-w"), proportionality_factor(alpha, scaled_alpha))
+        # same ODE, but not proportional
+        self.assertIsNone(proportionality_factor(alpha, ShapeFunction("I_c", "exp(-t/tau)")))
+        self.assertIsNone(proportionality_factor(alpha, ShapeFunction("I_d", "exp(-t/tau_d)")))
+
+    def test_merged_output(self):
+        ode_block = dict(shared_tau_ode_block, options={"merge_shapes": True})
+        result = json.loads(OdeAnalyzer.compute_solution(json.dumps(ode_block)))
+        self.assertEqual([{"shape": "I_ex", "merged_into": "I_in", "input_factor": "2"}], result["merged_shapes"])
+        self.assertEqual(["I_in__1", "I_in", "I_slow__1", "I_slow"], result["shape_state_variables"])
+        self.assertFalse(any("I_ex" in list(element.keys())[0] for element in result["propagator_elements"]))
+
+        unmerged = json.loads(OdeAnalyzer.compute_solution(json.dumps(shared_tau_ode_block)))
+        self.assertNotIn("merged_shapes", unmerged)
+        self.assertEqual(unmerged["const_input"], result["const_input"])
+        self.assertEqual(unmerged["propagator_elements"][:6], result["propagator_elements"][:6])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+"""
+   Fast detection of the linear homogeneous ODE with constant coefficients
+   which a shape function satisfies.
+
+   The symbolic search in `ShapeFunction` solves a linear system with fully
+   symbolic entries and calls `simplify` for every candidate order. Here, the
+   candidate orders are first probed numerically: all parameters of the shape
+   are replaced by random rational values, the derivatives are evaluated with
+   high precision at a few points `t` and the resulting (small, numeric)
+   linear system is solved. If the ODE found in that way does not hold at
+   additional check points, the order is rejected without any symbolic work.
+
+   Only the first order which passes the probing is solved symbolically (by
+   fraction-free Gaussian elimination) and confirmed by a single zero test
+   of the residual (see `zero_testing.py`).
+"""
+
+import random
+
+import mpmath
+from sympy import Matrix, S, cancel, diff, lambdify, zoo
+
+from zero_testing import is_zero
+
+# Decimal digits used for the numeric probing
+NUMERIC_PRECISION = 50
+# A candidate order is rejected if the relative residual of the ODE exceeds this value
+RELATIVE_TOLERANCE = mpmath.mpf(10) ** (-NUMERIC_PRECISION // 2)
+# Number of random parameter sets which are probed
+PARAMETER_SAMPLES = 2
+# Number of points `t`, in addition to the points which determine the derivative factors,
+# at which the ODE is checked numerically
+CHECK_POINTS = 2
+# The probing is deterministic, so that repeated builds produce identical results
+RANDOM_SEED = 42
+
+
+def random_parameter_values(parameters, rng):
+    """
+    :return: A list of random rational values from [1/2, 2], one for each parameter.
+    """
+    return [mpmath.mpf(rng.randint(50, 200)) / 100 for _ in parameters]
+
+
+def numeric_probe(derivative_functions, order, samples, max_tries):
+    """
+    Checks numerically if the function with the derivatives `derivative_functions` satisfies a linear
+    homogeneous ODE of order `order` for the parameter values in `samples`.
+    :return: False if the ODE is certainly not satisfied, True if it is (or the probing was inconclusive).
+    """
+    with mpmath.workdps(NUMERIC_PRECISION):
+        for sample in samples:
+            for k in range(max_tries):
+                points = [k + i + 1 for i in range(order + CHECK_POINTS)]
+                try:
+                    values = [[f(point, *sample) for f in derivative_functions[:order + 1]] for point in points]
+                    derivative_factors = mpmath.lu_solve(mpmath.matrix([row[:order] for row in values[:order]]),
+                                                         mpmath.matrix([row[order] for row in values[:order]]))
+                except (ZeroDivisionError, ValueError):
+                    # singular system or a pole for this parameter set, try other points
+                    continue
+
+                for row in values[order:]:
+                    terms = [derivative_factors[i] * row[i] for i in range(order)]
+                    scale = max([abs(row[order])] + [abs(term) for term in terms])
+                    if abs(row[order] - sum(terms)) > RELATIVE_TOLERANCE * scale:
+                        return False
+                break
+    return True
+
+
+def numerically_nonsingular(derivative_functions, order, points, samples):
+    """
+    :return: True if the matrix of the derivatives up to `order - 1` at the `points` is invertible for one
+    of the parameter sets in `samples`, which proves that the symbolic matrix is invertible.
+    """
+    with mpmath.workdps(NUMERIC_PRECISION):
+        for sample in samples:
+            try:
+                rows = [[f(point, *sample) for f in derivative_functions[:order]] for point in points]
+                # Hadamard's inequality bounds |det(X)| by the product of the row norms, so the ratio does not
+                # depend on the scale of the shape, e.g. on its amplitude or its decay
+                bound = mpmath.fprod(mpmath.norm(row) for row in rows)
+                if bound > 0 and abs(mpmath.det(mpmath.matrix(rows))) > RELATIVE_TOLERANCE * bound:
+                    return True
+            except (ZeroDivisionError, ValueError):
+                continue
+    return False
+
+
+def fraction_free_solve(X, Y):
+    """
+    Solves `X * c = Y` by fraction-free (Bareiss) elimination followed by back substitution. In contrast to
+    `X.inv()`, all intermediate entries are polynomials in the entries of `X` and `Y` and no determinant is needed.
+    :return: The solution as a list.
+    """
+    n = X.rows
+    M = X.row_join(Y)
+    previous_pivot = S.One
+    for k in range(n - 1):
+        if M[k, k] == 0:
+            for i in range(k + 1, n):
+                if M[i, k] != 0:
+                    M.row_swap(k, i)
+                    break
+        for i in range(k + 1, n):
+            for j in range(k + 1, n + 1):
+                M[i, j] = cancel((M[k, k] * M[i, j] - M[i, k] * M[k, j]) / previous_pivot)
+            M[i, k] = 0
+        previous_pivot = M[k, k]
+
+    solution = [S.Zero] * n
+    for i in reversed(range(n)):
+        rhs = M[i, n] - sum(M[i, j] * solution[j] for j in range(i + 1, n))
+        solution[i] = cancel(rhs / M[i, i])
+    return solution
+
+
+def find_ode(shape_expr, t, max_order, max_tries):
+    """
+    Searches the lowest order `order <= max_order` of a linear homogeneous ODE with constant coefficients
+    which `shape_expr` (a function of `t`) satisfies.
+    :return: `order`, the `derivative_factors` of the ODE (as column vector) and the list of the derivatives
+    of `shape_expr` up to the `order`.
+    :raises Exception: If there is no such ODE.
+    """
+    parameters = sorted(shape_expr.free_symbols - {t}, key=str)
+    rng = random.Random(RANDOM_SEED)
+    samples = [random_parameter_values(parameters, rng) for _ in range(PARAMETER_SAMPLES)]
+
+    derivatives = [shape_expr]
+    derivative_functions = [lambdify([t] + parameters, shape_expr, modules="mpmath")]
+    for order in range(1, max_order + 1):
+        derivatives.append(diff(derivatives[-1], t))
+        derivative_functions.append(lambdify([t] + parameters, derivatives[-1], modules="mpmath"))
+
+        if not numeric_probe(derivative_functions, order, samples, max_tries):
+            continue
+
+        # Symbolic system at the points `k + 1`, ..., `k + order` for the first `k` which yields
+        # an invertible matrix `X`
+        for k in range(max_tries):
+            points = [k + i + 1 for i in range(order)]
+            if numerically_nonsingular(derivative_functions, order, points, samples):
+                break
+        else:
+            continue
+
+        X = Matrix([[derivatives[j].subs(t, point) for j in range(order)] for point in points])
+        Y = Matrix([[derivatives[order].subs(t, point)] for point in points])
+
+        derivative_factors = Matrix(fraction_free_solve(X, Y))
+        if derivative_factors.has(S.NaN, zoo):
+            derivative_factors = X.LUsolve(Y)
+
+        diff_rhs_lhs = derivatives[order] - sum(factor * derivative
+                                                for factor, derivative in zip(derivative_factors, derivatives))
+        if is_zero(diff_rhs_lhs):
+            return order, derivative_factors, derivatives
+
+    raise Exception("Shape does not satisfy any ODE of order <= {}".format(max_order))
@@ -46,8 +46,9 @@
    Example:
    ========
     
-   shape_alpha = ShapeODE("shape_alpha",  "shape_alpha", 
-   [-1/tau**2 * shape_alpha -2/tau * shape_alpha'],[0, e/tau]) 
+   shape_alpha = ShapeODE("shape_alpha", ["shape_alpha", "shape_alpha__1"],
+   ["shape_alpha__1", "-1/tau**2 * shape_alpha - 2/tau * shape_alpha__1"],
+   ["0", "e/tau"])
   
    The calculation of the properties, `order`, `name`, 
    `initial_values` and the system of ODEs in matrix form is canonical.
@@ -58,6 +59,9 @@ from sympy import *
 
 from sympy.matrices import zeros
 
+from shape_order import find_ode
+from zero_testing import is_zero
+
 # Define constants:
 # When we are checking if a function satisfies a linear homogeneous ODE
 # of some order n we will check from n=0 to n=MAX_ORDERS. 
@@ -69,13 +73,184 @@ MAX_ORDER = 10
 # with certain properties. For this purpose we
 MAX_TRIES = 100
 
+# The engine which finds the ODE of a `ShapeFunction`: "fast" probes the
+# candidate orders numerically and confirms only the final order symbolically
+# (see `shape_order.py`), "symbolic" solves and simplifies the symbolic system
+# for every candidate order.
+ORDER_DETECTION = "fast"
+
 # 't' is predefined in NESTML and represents time
 # 'derivative_factor' is the factor in 
 # shape'=derivative_factor*shape in case shape satisfies such an ODE.
 derivative_factor, t = symbols("derivative_factor, t")
 
 
-class ShapeFunction(object):
+def find_ode_symbolically(shape_expr):
+    """
+    Searches the linear homogeneous ODE which `shape_expr` satisfies by solving the symbolic linear
+    system for every order up to `MAX_ORDER`.
+    :return: `order`, the `derivative_factors` of the ODE and the list of the derivatives of `shape_expr`
+    up to the `order`.
+    """
+    # found_ode is true if we find a linear homogeneous ODE that
+    # `shape` satisfies
+    found_ode = False
+
+    # First we check if `shape` satisfies a linear homogeneous ODE
+    # of order 1. `derivatives` is a list of all derivatives of `shape`
+    # up to the order we are checking (which we just call 'order')
+    derivatives = [shape_expr, diff(shape_expr, t)]
+
+    # If `diff_rhs_lhs`, which is here shape'-derivative_factors*shape
+    # equals 0 for some 'derivative_factors', 'shape' satisfies a
+    # first order linear homogeneous ODE (and does for t=1).
+    # Thereafter `diff_rhs_lhs` will be the difference of the derivative
+    # of shape of order 'order' and the sum of all lower derivatives times their
+    # 'derivative_factors'. This is a list of the potential
+    # factors in the ODE from the factor of shape^(0) to
+    # shape^(order-1).
+    # In the case of the ODE of order 1 we have only one `derivative_factor`
+    # but in all other cases we have several. For unified handling we define
+    # `derivative_factors` as a list for all orders (also for order 1).
+    # As I(t)=0 is possible for some ts we check for several ts to make
+    # sure we are not dividing by zero.
+    for k in range(1, MAX_TRIES):
+        if derivatives[0].subs(t, k) != 0:
+            l = k
+            break
+    derivative_factors = (1 / derivatives[0] * derivatives[1]).subs(t, l),
+
+    diff_rhs_lhs = derivatives[1] - derivative_factors[0] * derivatives[0]
+
+    if is_zero(diff_rhs_lhs):
+        found_ode = True
+
+    # Initialize the (potential) order of the differential equation.
+    order = 1
+
+    # while an ODE has not yet been found and we have not yet
+    # reached the maximum order we are checking for, we check if
+    # `shape` satisfies a linear homogeneous ODE of the next higher
+    # order.
+    while not found_ode and order < MAX_ORDER:
+        # The potential order must be at least `order+1`
+        order += 1
+        # Add the next higher derivative to the list of
+        # derivatives of `shape`
+        derivatives.append(diff(derivatives[-1], t))
+
+        # The goal here is to calculate the factors (which we call
+        # `derivative_factors`) of the ODE (assuming they
+        # exist). The idea is to create a system of equations by
+        # substituting (natural) numbers into the homogeneous
+        # linear homogeneous ODE with variable derivative factors
+        # order many times for varying (natural) numbers and solving for
+        # derivative factors. Once we have derivative factors the
+        # ODE is uniquely defined. This is assuming that shape
+        # satisfies an ODE of this order. (This we must stil
+        # check)
+
+        # `X` will contain as rows derivatives up to `order-1` of some
+        # natural numbers (differing in each row)
+        X = zeros(order)
+
+        # `Y` will contain the derivatives of `order` of the natural
+        # number in the corresponding row of `X`
+        Y = zeros(order, 1)
+
+        # It is possible that by choosing certain natural numbers,
+        # the system of equations will not be solvable, i.e. `X` is
+        # not invertible. This is unlikely but we check for
+        # invertibility of `X` for varying sets of natural numbers.
+        invertible = False
+        for k in range(MAX_TRIES):
+            for i in range(order):
+                substitute = i + k + 1
+                Y[i] = derivatives[order].subs(t, substitute)
+                for j in range(order):
+                    X[i, j] = derivatives[j].subs(t, substitute)
+            d = det(X)
+            if d != 0:
+                invertible = True
+                break
+
+        if not invertible:
+            raise Exception("Failed to find homogeneous linear ODE "
+                            "which shape satisfies, or shape does "
+                            "not satisfy any such ODE of order <= {}".format(MAX_ORDER))
+
+        derivative_factors = X.inv() * Y
+        diff_rhs_lhs = 0
+        # Once we have 'derivative_factors' the
+
+        # If $shape^{(order)}(t) = \sum_{i<order} C_i shape^{(i)}(t)$, where
+        # the $C_i$ are the derivative factors then we can find the
+        # $order-1$ derivative factors by evaluating the previous equation as a
+        # linear system of order $order-1$ such that Y = [shape^{(order)}] = X * [C_i]
+        # hence [C_i] can be found by inverting X.
+
+        # We calculated derivative_factors of the linear
+        # homogeneous ODE of order `order` but assumed that shape satisfies
+        # such an ODE. This we check here
+        for k in range(order):
+            # sum up derivatives 'shapes' times their potential 'derivative_factors'
+            diff_rhs_lhs -= derivative_factors[k] * derivatives[k]
+        diff_rhs_lhs += derivatives[order]
+        if is_zero(diff_rhs_lhs):
+            found_ode = True
+            break
+
+    # It is still possible that `shape` satisfies a linear homogeneous ODE of some order larger than `MAX_ORDER`
+    if not found_ode:
+        raise Exception("Shape does not satisfy any ODE of order <= {}".format(MAX_ORDER))
+
+    return order, derivative_factors, derivatives
+
+
+def find_shape_ode(shape_expr, order_detection=ORDER_DETECTION):
+    """
+    Finds the linear homogeneous ODE which `shape_expr` satisfies with the engine `order_detection`.
+    :return: `order`, the simplified `derivative_factors` and the `initial_values` of the shape and its
+    derivatives up to `order - 1`.
+    """
+    if order_detection == "fast":
+        order, derivative_factors, derivatives = find_ode(shape_expr, t, MAX_ORDER, MAX_TRIES)
+    else:
+        order, derivative_factors, derivatives = find_ode_symbolically(shape_expr)
+
+    return order, list(simplify(derivative_factors)), [x.subs(t, 0) for x in derivatives[:-1]]
+
+
+class ShapeStateUpdates(object):
+    """
+    Collects the updates of the state variables of a shape, which are computed together with its propagator (see
+    `PropagatorCalculator.add_shape_state_updates`). Common base of `ShapeFunction` and `ShapeODE`.
+    """
+
+    def add_update_to_shape_state_variable(self, shape_state_variable, shape_state_variable_update):
+        self.updates_to_state_shape_variables = [{str(shape_state_variable): str(shape_state_variable_update)}] + self.updates_to_state_shape_variables
+
+    def get_updates_to_shape_state_variables(self):
+        result = []
+        if self.order > 0:  # FIX ME
+
+            for entry_map in self.updates_to_state_shape_variables:
+                # by construction, there is only one value in the `entry_map`
+                for shape_state_variable, shape_state_variable_update in entry_map.iteritems():
+                    result.append({"__tmp__" + shape_state_variable: shape_state_variable_update})
+
+            for entry_map in self.updates_to_state_shape_variables:
+                # by construction, there is only one value in the `entry_map`
+                for shape_state_variable, shape_state_variable_update in entry_map.iteritems():
+                    result.append({shape_state_variable: "__tmp__" + shape_state_variable})
+
+        else:
+            result = self.updates_to_state_shape_variables
+
+        return result
+
+
+class ShapeFunction(ShapeStateUpdates):
     """
     Here we provide a class, `ShapeFunction` that can be called
     with a chosen name of the shape and its mathematical description;
@@ -107,126 +282,26 @@ class ShapeFunction(object):
     From lowest derivative to highest.
     """
 
-    def __init__(self, name, function_def):
-
-        self.name = parse_expr(name)
-
-        # convert the shape function from a string to a symbolic expression
-        self.shape_expr = parse_expr(function_def)
-
-        # found_ode is true if we find a linear homogeneous ODE that
-        # `shape` satisfies
-        found_ode = False
-
-        # First we check if `shape` satisfies a linear homogeneous ODE
-        # of order 1. `derivatives` is a list of all derivatives of `shape`
-        # up to the order we are checking (which we just call 'order')
-        derivatives = [self.shape_expr, diff(self.shape_expr, t)]
-
-        # If `diff_rhs_lhs`, which is here shape'-derivative_factors*shape
-        # equals 0 for some 'derivative_factors', 'shape' satisfies a
-        # first order linear homogeneous ODE (and does for t=1).
-        # Thereafter `diff_rhs_lhs` will be the difference of the derivative
-        # of shape of order 'order' and the sum of all lower derivatives times their
-        # 'derivative_factors'. This is a list of the potential
-        # factors in the ODE from the factor of shape^(0) to
-        # shape^(order-1).
-        # In the case of the ODE of order 1 we have only one `derivative_factor`
-        # but in all other cases we have several. For unified handling we define
-        # `derivative_factors` as a list for all orders (also for order 1).
-        # As I(t)=0 is possible for some ts we check for several ts to make
-        # sure we are not dividing by zero.
-        for k in range(1, MAX_TRIES):
-            if derivatives[0].subs(t, k) != 0:
-                l = k
-                break
-        derivative_factors = (1 / derivatives[0] * derivatives[1]).subs(t, l),
-
-        diff_rhs_lhs = derivatives[1] - derivative_factors[0] * derivatives[0]
+    def __init__(self, name, function_def, order_detection=ORDER_DETECTION, memo=None):
 
-        if simplify(diff_rhs_lhs) == sympify(0):
-            found_ode = True
+        self.name = Symbol(name)
 
-        # Initialize the (potential) order of the differential equation.
-        order = 1
-
-        # while an ODE has not yet been found and we have not yet
-        # reached the maximum order we are checking for, we check if
-        # `shape` satisfies a linear homogeneous ODE of the next higher
-        # order.
-        while not found_ode and order < MAX_ORDER:
-            # The potential order must be at least `order+1`
-            order += 1
-            # Add the next higher derivative to the list of
-            # derivatives of `shape`
-            derivatives.append(diff(derivatives[-1], t))
-
-            # The goal here is to calculate the factors (which we call
-            # `derivative_factors`) of the ODE (assuming they
-            # exist). The idea is to create a system of equations by
-            # substituting (natural) numbers into the homogeneous
-            # linear homogeneous ODE with variable derivative factors
-            # order many times for varying (natural) numbers and solving for
-            # derivative factors. Once we have derivative factors the
-            # ODE is uniquely defined. This is assuming that shape
-            # satisfies an ODE of this order. (This we must stil
-            # check)
-
-            # `X` will contain as rows derivatives up to `order-1` of some
-            # natural numbers (differing in each row)
-            X = zeros(order)
-
-            # `Y` will contain the derivatives of `order` of the natural
-            # number in the corresponding row of `X`
-            Y = zeros(order, 1)
-
-            # It is possible that by choosing certain natural numbers,
-            # the system of equations will not be solvable, i.e. `X` is
-            # not invertible. This is unlikely but we check for
-            # invertibility of `X` for varying sets of natural numbers.
-            invertible = False
-            for k in range(MAX_TRIES):
-                for i in range(order):
-                    substitute = i + k + 1
-                    Y[i] = derivatives[order].subs(t, substitute)
-                    for j in range(order):
-                        X[i, j] = derivatives[j].subs(t, substitute)
-                d = det(X)
-                if d != 0:
-                    invertible = True
-                    break
-
-            if not invertible:
-                raise Exception("Failed to find homogeneous linear ODE "
-                                "which shape satisfies, or shape does "
-                                "not satisfy any such ODE of order <= {}".format(MAX_ORDER))
-
-            derivative_factors = X.inv() * Y
-            diff_rhs_lhs = 0
-            # Once we have 'derivative_factors' the
-
-            # If $shape^{(order)}(t) = \sum_{i<order} C_i shape^{(i)}(t)$, where
-            # the $C_i$ are the derivative factors then we can find the
-            # $order-1$ derivative factors by evaluating the previous equation as a
-            # linear system of order $order-1$ such that Y = [shape^{(order)}] = X * [C_i]
-            # hence [C_i] can be found by inverting X.
-
-            # We calculated derivative_factors of the linear
-            # homogeneous ODE of order `order` but assumed that shape satisfies
-            # such an ODE. This we check here
-            for k in range(order):
-                # sum up derivatives 'shapes' times their potential 'derivative_factors'
-                diff_rhs_lhs -= derivative_factors[k] * derivatives[k]
-            diff_rhs_lhs += derivatives[order]
-            if simplify(diff_rhs_lhs) == sympify(0):
-                found_ode = True
-                break
+        # convert the shape function from a string to a symbolic expression; an already parsed definition
+        # (e.g. from a `SolverModel`) is used as it is
+        if isinstance(function_def, basestring):
+            self.shape_expr = parse_expr(function_def)
+        else:
+            self.shape_expr = function_def
 
-        # It is still possible that `shape` satisfies a linear homogeneous ODE of some order larger than `MAX_ORDER`
-        if not found_ode:
-            raise Exception("Shape does not satisfy any ODE of order <= {}".format(MAX_ORDER))
+        # a `ShapeMemo` reuses the ODE of shapes which were already analyzed under different names
+        if memo is not None:
+            order, derivative_factors, initial_values = memo.find_ode(self.shape_expr, order_detection)
+        else:
+            order, derivative_factors, initial_values = find_shape_ode(self.shape_expr, order_detection)
 
         self.order = order
+        self.derivative_factors = derivative_factors
+        self.initial_values = initial_values
         self.nestml_ode_form = []
 
         for cur_order in range(0, order-1):
@@ -239,10 +314,10 @@ class ShapeFunction(object):
 
         for k in range(order):
             if k > 0:
-                rhs_str.append("{} * {}__{}".format(simplify(derivative_factors[k]), name, str(k)))
+                rhs_str.append("{} * {}__{}".format(derivative_factors[k], name, str(k)))
 
             else:
-                rhs_str.append("{} * {}".format(simplify(derivative_factors[k]), name))
+                rhs_str.append("{} * {}".format(derivative_factors[k], name))
 
         rhs = " + ".join(rhs_str)
         if order == 1:
@@ -251,8 +326,6 @@ class ShapeFunction(object):
             lhs = name + "__" + str(order-1)
 
         self.nestml_ode_form.append({lhs: rhs})
-        self.derivative_factors = list(simplify(derivative_factors))
-        self.initial_values = [x.subs(t, 0) for x in derivatives[:-1]]
         self.updates_to_state_shape_variables = []  # must be filled after the propagator matrix is computed
 
     def additional_shape_state_variables(self):
@@ -268,28 +341,6 @@ class ShapeFunction(object):
                 result = [str(self.name)] + result
         return result
 
-    def add_update_to_shape_state_variable(self, shape_state_variable, shape_state_variable_update):
-        self.updates_to_state_shape_variables = [{str(shape_state_variable): str(shape_state_variable_update)}] + self.updates_to_state_shape_variables
-
-    def get_updates_to_shape_state_variables(self):
-        result = []
-        if self.order > 0:  # FIX ME
-
-            for entry_map in self.updates_to_state_shape_variables:
-                # by construction, there is only one value in the `entry_map`
-                for shape_state_variable, shape_state_variable_update in entry_map.iteritems():
-                    result.append({"__tmp__" + shape_state_variable: shape_state_variable_update})
-
-            for entry_map in self.updates_to_state_shape_variables:
-                # by construction, there is only one value in the `entry_map`
-                for shape_state_variable, shape_state_variable_update in entry_map.iteritems():
-                    result.append({shape_state_variable: "__tmp__" + shape_state_variable})
-
-        else:
-            result = self.updates_to_state_shape_variables
-
-        return result
-
     def get_initial_values(self):
         result = []
         for idx, initial_value in enumerate(self.initial_values):
@@ -301,28 +352,67 @@ class ShapeFunction(object):
         return result
 
 
-class ShapeODE(object):
+class ShapeODE(ShapeStateUpdates):
     """
     Provides a class 'ShapeODE'. An instance of `ShapeODE` is
     defined with the name of the shape (i.e a function of `t`
     that satisfies a certain ODE), the variables on the left handside
     of the ODE system, the right handsides of the ODE systems
-    and the initial value of the function.
-        
+    and the initial values of the variables.
+
     Canonical calculation of the properties, `order`, `name`,
     `initial_values` and the system of ODEs in matrix form are made.
+    The shape itself is moved to the end of the variables, as in the
+    state variables of a `ShapeFunction`. The variables other than the
+    shape must be named `<shape>__<suffix>`, e.g. `I_ex__1` for `I_ex'`.
+    Since the ODE is given, no order detection is needed.
     """
     def __init__(self, name, ode_sys_var, ode_sys_rhs, initial_values):
 
-        self.name = parse_expr(name)
-
-        self.ode_sys_var = [symbols(i) for i in ode_sys_var]
-        self.ode_sys_rhs = [parse_expr(i) for i in ode_sys_rhs]
+        self.name = Symbol(name) if isinstance(name, basestring) else name
+
+        variables = [Symbol(i) if isinstance(i, basestring) else i for i in ode_sys_var]
+        # the variables are symbols even if SymPy knows a constant or function with this name, e.g. `I`
+        local_dict = dict((str(var), var) for var in variables)
+        rhs = [parse_expr(i, local_dict=local_dict) if isinstance(i, basestring) else i for i in ode_sys_rhs]
+        values = [parse_expr(i, local_dict=local_dict) if isinstance(i, basestring) else i for i in initial_values]
+        if not len(variables) == len(rhs) == len(values):
+            raise ValueError("Shape {}: every variable needs one ODE and one initial value".format(self.name))
+        if self.name not in variables:
+            raise ValueError("Shape {}: the shape itself is not a variable of its ODEs".format(self.name))
+        for var in variables:
+            if var != self.name and not str(var).startswith(str(self.name) + "__"):
+                raise ValueError("Shape {}: the variable {} must be named {}__<suffix>".format(
+                    self.name, var, self.name))
+
+        permutation = sorted(range(len(variables)), key=lambda i: variables[i] == self.name)
+        self.ode_sys_var = [variables[i] for i in permutation]
+        self.ode_sys_rhs = [rhs[i] for i in permutation]
         self.order = len(initial_values)
-        self.initial_values = [parse_expr(i) for i in initial_values]
+        self.initial_values = [values[i] for i in permutation]
 
         self.matrix = zeros(self.order)
 
         for i, rhs in enumerate(self.ode_sys_rhs):
             for j, var in enumerate(self.ode_sys_var):
                 self.matrix[i, j] = diff(rhs, var)
+
+        forbidden_symbols = set(self.ode_sys_var + [t])
+        if any(entry.free_symbols & forbidden_symbols for entry in self.matrix) or \
+                not all(is_zero(rhs - (self.matrix[i, :] * Matrix(self.ode_sys_var))[0])
+                        for i, rhs in enumerate(self.ode_sys_rhs)):
+            raise ValueError("Shape {}: the ODEs must be linear and homogeneous with constant coefficients".format(
+                self.name))
+
+        self.nestml_ode_form = [{str(var): str(rhs)} for var, rhs in zip(self.ode_sys_var, self.ode_sys_rhs)]
+        self.updates_to_state_shape_variables = []  # must be filled after the propagator matrix is computed
+
+    def additional_shape_state_variables(self):
+        """
+        :return: The variables of the ODEs, the shape itself last.
+        """
+        return [str(var) for var in self.ode_sys_var]
+
+    def get_initial_values(self):
+        return [{"iv__" + str(var): str(initial_value)}
+                for var, initial_value in zip(self.ode_sys_var, self.initial_values)]
@@ -1,6 +1,9 @@
 import unittest
 
-from shapes import ShapeFunction
+from sympy import Matrix, simplify
+from sympy.parsing.sympy_parser import parse_expr
+
+from shapes import ShapeFunction, ShapeODE
 
 
 class TestThatShapeIsConvertedToODEs(unittest.TestCase):
@@ -12,5 +15,51 @@ class TestThatShapeIsConvertedToODEs(unittest.TestCase):
         print(shape_inh.get_ode_form())
         print(shape_exc.get_ode_form())
 
+    def test_fast_order_detection_matches_symbolic_search(self):
+        for name, function_def in [("I_exp", "exp(-t/tau_syn)"), ("I_alpha", "(e/tau_syn) * t * exp(-t/tau_syn)")]:
+            fast = ShapeFunction(name, function_def, order_detection="fast")
+            symbolic = ShapeFunction(name, function_def, order_detection="symbolic")
+            self.assertEqual(symbolic.order, fast.order)
+            self.assertEqual(symbolic.derivative_factors, fast.derivative_factors)
+            self.assertEqual(symbolic.initial_values, fast.initial_values)
+            self.assertEqual(symbolic.nestml_ode_form, fast.nestml_ode_form)
+
+    def test_fast_order_detection_of_steep_and_small_shapes(self):
+        for function_def in ["exp(-60*t)", "t*exp(-30*t)", "1e-30*exp(-t/tau)", "exp(-t*100)"]:
+            fast = ShapeFunction("I_shape", function_def, order_detection="fast")
+            symbolic = ShapeFunction("I_shape", function_def, order_detection="symbolic")
+            self.assertEqual(symbolic.order, fast.order)
+            self.assertEqual(symbolic.derivative_factors, fast.derivative_factors)
+            self.assertEqual(symbolic.initial_values, fast.initial_values)
+
+    def test_fast_order_detection_of_third_order_shape(self):
+        shape = ShapeFunction("I_shape", "t**2 * exp(-t/tau_syn)")
+        self.assertEqual(3, shape.order)
+        expected = [parse_expr(factor) for factor in ["-1/tau_syn**3", "-3/tau_syn**2", "-3/tau_syn"]]
+        for factor, expected_factor in zip(shape.derivative_factors, expected):
+            self.assertEqual(0, simplify(factor - expected_factor))
+        self.assertEqual([0, 0, 2], shape.initial_values)
+
+
+class TestShapeODE(unittest.TestCase):
+
+    def test_shape_is_last_state_variable(self):
+        shape = ShapeODE("I_ex", ["I_ex", "I_ex__1"], ["I_ex__1", "-I_ex/tau**2 - 2*I_ex__1/tau"], ["0", "e/tau"])
+        self.assertEqual(2, shape.order)
+        self.assertEqual(["I_ex__1", "I_ex"], shape.additional_shape_state_variables())
+        self.assertEqual([{"iv__I_ex__1": "e/tau"}, {"iv__I_ex": "0"}], shape.get_initial_values())
+        self.assertEqual(parse_expr("Matrix([[-2/tau, -1/tau**2], [1, 0]])"), shape.matrix)
+
+    def test_names_are_symbols(self):
+        shape = ShapeODE("I", ["I"], ["-I/tau"], ["1"])
+        self.assertEqual(["I"], shape.additional_shape_state_variables())
+        self.assertEqual(parse_expr("Matrix([[-1/tau]])"), shape.matrix)
+
+    def test_invalid_odes(self):
+        self.assertRaises(ValueError, ShapeODE, "I_ex", ["I_ex", "g"], ["g", "-I_ex"], ["0", "1"])
+        self.assertRaises(ValueError, ShapeODE, "I_ex", ["I_ex"], ["-I_ex**2"], ["1"])
+        self.assertRaises(ValueError, ShapeODE, "I_ex", ["I_ex"], ["-I_ex + 1"], ["1"])
+        self.assertRaises(ValueError, ShapeODE, "I_ex", ["I_ex"], ["-I_ex/tau"], [])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,143 @@
+"""
+   Solves many ODE blocks in one run. The inputs are either all `*.json`
+   files of a directory (one `SolverInput` per file) or a JSONL file with one
+   `SolverInput` per line. The blocks are distributed over a pool of worker
+   processes; every input yields exactly one result record:
+
+   {"id": ..., "status": "success", "wall_time": 1.23, "result": {...SolverOutput...}}
+   {"id": ..., "status": "failed", "wall_time": 0.01, "error": "..."}
+
+   The `id` of an input is its file name without the extension (directory input),
+   or its `id` field, or `line-<n>` for the n-th line of a JSONL file. The ids
+   must be unique and must not contain paths, since they name the result
+   files of a directory output.
+"""
+
+import functools
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+
+def read_batch_inputs(path):
+    """
+    :return: List of (id, input_json) tuples in a stable order.
+    :raises ValueError: If two inputs have the same id or an id is not a plain file name.
+    """
+    items = []
+    if os.path.isdir(path):
+        for file_name in sorted(os.listdir(path)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(path, file_name)) as input_file:
+                    items.append((os.path.splitext(file_name)[0], input_file.read()))
+    else:
+        with open(path) as input_file:
+            for line_number, line in enumerate(input_file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    item_id = json.loads(line).get("id")
+                except (ValueError, AttributeError):
+                    # broken lines are reported as failed items by the solver
+                    item_id = None
+                if item_id is None:
+                    item_id = "line-{}".format(line_number)
+                items.append((item_id, line))
+
+    seen_ids = set()
+    for item_id, _ in items:
+        if not is_plain_file_name(str(item_id)):
+            raise ValueError("The id '{}' in the batch {} is not a plain file name".format(item_id, path))
+        if str(item_id) in seen_ids:
+            raise ValueError("The id '{}' occurs more than once in the batch {}".format(item_id, path))
+        seen_ids.add(str(item_id))
+    return items
+
+
+def is_plain_file_name(name):
+    """
+    :return: True if `name` can only name a file in the current directory, i.e. it is neither empty, nor a path, nor a
+    reference to a directory.
+    """
+    separators = [os.sep] + ([os.altsep] if os.altsep else []) + ["/", "\\"]
+    return (name not in ("", os.curdir, os.pardir) and not any(separator in name for separator in separators) and
+            not os.path.isabs(name) and not os.path.splitdrive(name)[0])
+
+
+def solve_item(solve, item):
+    """
+    Solves one batch item and never raises, failures are returned as a failed record.
+    :param solve: Callable which maps the input JSON to a `SolverOutput` object or None.
+    :param item: (id, input_json) tuple
+    """
+    item_id, input_json = item
+    start = time.time()
+    record = {"id": item_id}
+    try:
+        result = solve(input_json)
+        if result is None:
+            record["status"] = "failed"
+            record["error"] = "The ODE block cannot be solved"
+        else:
+            record["status"] = "success"
+            record["result"] = result.__dict__
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = "{}: {}\n{}".format(type(e).__name__, e, traceback.format_exc())
+    record["wall_time"] = time.time() - start
+    return record
+
+
+def solve_batch(solve, items, processes=None):
+    """
+    Solves all `items` with a pool of `processes` workers (defaults to the number of CPUs).
+    `solve` must be picklable, i.e. a module level function.
+    :return: Iterator over the result records in the order of `items`.
+    """
+    if processes == 1:
+        for item in items:
+            yield solve_item(solve, item)
+        return
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        for record in pool.imap(functools.partial(solve_item, solve), items):
+            yield record
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def write_batch_results(records, output_path=None, out_stream=None):
+    """
+    Writes the result records either as one `<id>.json` file per record into the directory `output_path`
+    or as JSONL into the file `output_path`. Without `output_path` the JSONL is written into `out_stream`.
+    :return: Number of failed records.
+    """
+    failed = 0
+    output_file = None
+    if output_path is not None:
+        if os.path.isdir(output_path):
+            out_stream = None
+        else:
+            output_file = open(output_path, "w")
+            out_stream = output_file
+    try:
+        for record in records:
+            if record["status"] != "success":
+                failed += 1
+            if out_stream is None:
+                with open(os.path.join(output_path, "{}.json".format(record["id"])), "w") as record_file:
+                    json.dump(record, record_file, indent=2)
+            else:
+                out_stream.write(json.dumps(record, separators=(",", ":")) + "\n")
+                out_stream.flush()
+    finally:
+        if output_file is not None:
+            output_file.close()
+    return failed
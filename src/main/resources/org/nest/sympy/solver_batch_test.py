@@ -0,0 +1,63 @@
+import unittest
+
+import json
+import os
+import shutil
+import tempfile
+
+from OdeAnalyzer import solve_request
+from solver_batch import read_batch_inputs, solve_batch
+
+shapes_only = '{"functions" : [ ], "shapes" : [ "I_shape = exp(-t/tau_syn)" ], "ode" : null}'
+broken_shape = '{"functions" : [ ], "shapes" : [ "I_shape = " ], "ode" : null}'
+
+
+class TestSolverBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_jsonl_batch_keeps_going_after_failure(self):
+        jsonl_path = os.path.join(self.tmp_dir, "blocks.jsonl")
+        with open(jsonl_path, "w") as jsonl_file:
+            jsonl_file.write(broken_shape + "\n\n")
+            jsonl_file.write(json.dumps(dict(json.loads(shapes_only), id="exp_shape")) + "\n")
+
+        items = read_batch_inputs(jsonl_path)
+        self.assertEqual(["line-1", "exp_shape"], [item_id for item_id, _ in items])
+
+        records = list(solve_batch(solve_request, items, processes=2))
+        self.assertEqual(["line-1", "exp_shape"], [record["id"] for record in records])
+        self.assertEqual("failed", records[0]["status"])
+        self.assertEqual("success", records[1]["status"])
+        self.assertEqual("numeric", records[1]["result"]["solver"])
+        self.assertTrue(records[1]["wall_time"] >= 0)
+
+    def test_duplicate_ids_are_rejected(self):
+        jsonl_path = os.path.join(self.tmp_dir, "blocks.jsonl")
+        with open(jsonl_path, "w") as jsonl_file:
+            for _ in range(2):
+                jsonl_file.write(json.dumps(dict(json.loads(shapes_only), id="exp_shape")) + "\n")
+        self.assertRaises(ValueError, read_batch_inputs, jsonl_path)
+
+    def test_ids_with_paths_are_rejected(self):
+        jsonl_path = os.path.join(self.tmp_dir, "blocks.jsonl")
+        for item_id in ["../../x", "/tmp/x", "a/b", "a\\b", "..", ""]:
+            with open(jsonl_path, "w") as jsonl_file:
+                jsonl_file.write(json.dumps(dict(json.loads(shapes_only), id=item_id)) + "\n")
+            self.assertRaises(ValueError, read_batch_inputs, jsonl_path)
+
+    def test_directory_batch(self):
+        for name in ["b_shape", "a_shape"]:
+            with open(os.path.join(self.tmp_dir, name + ".json"), "w") as input_file:
+                input_file.write(shapes_only)
+
+        records = list(solve_batch(solve_request, read_batch_inputs(self.tmp_dir), processes=1))
+        self.assertEqual(["a_shape", "b_shape"], [record["id"] for record in records])
+        self.assertTrue(all(record["status"] == "success" for record in records))
+
+if __name__ == '__main__':
+    unittest.main()
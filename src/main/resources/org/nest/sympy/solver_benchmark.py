@@ -0,0 +1,277 @@
+"""
+   Benchmark of the solver over the shipped model corpus. The ODE blocks of
+   all neurons in `models/*.nestml` which define shapes are extracted into
+   `SolverInput`s in the same form as the code generator sends them: the
+   functions, the shapes and the first ODE of the `equations` block, with
+   `curr_sum(shape, buffer)` and `cond_sum(shape, buffer)` replaced by the
+   shape and literals with units such as `1.0ms` written as products.
+   Models which the solver cannot handle are reported with their `error`.
+
+   Every input is solved `repetitions` times with a fresh shape memo, in a
+   solver process of its own, so that `peak_memory_kb`, the peak resident set
+   size of that process, belongs to this model alone (it includes the memory
+   of the interpreter and of SymPy, which is the same for all models). The
+   results are written as JSON:
+
+   `{"repetitions": n, "models": {"<file>/<neuron>": {"solver": ...,
+     "seconds": {"min": ..., "median": ...}, "stages": {"<stage>": median
+     seconds}, "peak_memory_kb": ...}}}`
+
+   A result file can serve as the baseline of a later run: every model whose
+   median time exceeds the one of the baseline by more than `threshold`
+   (relative) and `min_seconds` (absolute) is reported as a regression.
+
+   With `--startup`, the results additionally contain the time to the first
+   result of a fresh solver process (`"startup": {"cached": ..., "trivial":
+   ...}`), for an input which is answered from the result cache and for a
+   shapes-only input, respectively.
+
+   Usage: python solver_benchmark.py --output current.json --baseline baseline.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from OdeAnalyzer import OdeAnalyzer
+from shape_memo import ShapeMemo
+
+SOLVER_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODELS_DIR = os.path.join(SOLVER_DIR, *([os.pardir] * 6 + ["models"]))
+# relative increase of the median time which counts as a regression
+DEFAULT_THRESHOLD = 0.25
+# differences below this bound are measurement noise
+DEFAULT_MIN_SECONDS = 0.05
+
+NEURON = re.compile(r"^neuron\s+(\w+)\s*:", re.MULTILINE)
+EQUATIONS_BLOCK = re.compile(r"^\s*equations\s*:\s*$(.*?)^\s*end\s*$", re.MULTILINE | re.DOTALL)
+SHAPE = re.compile(r"^shape\s+(.*)$")
+FUNCTION = re.compile(r"^function\s+(\w+)\s+[^=]*=(.*)$")
+ODE = re.compile(r"^\w+'+\s*=")
+SUM_CALL = re.compile(r"\b(?:curr_sum|cond_sum)\(\s*(\w+)\s*,\s*\w+\s*\)")
+# literals with a unit, e.g. `1.0ms`
+UNIT_LITERAL = re.compile(r"(?<![\w.])(\d+(?:\.\d*)?)(?![eE][-+]?\d)([A-Za-z]\w*)")
+
+# inputs of the startup benchmark
+STARTUP_CACHED_INPUT = json.dumps({"functions": ["I_syn = I_in + I_ex + I_e"],
+                                   "shapes": ["I_in = (e/tau_syn_in) * t * exp(-t/tau_syn_in)",
+                                              "I_ex = (e/tau_syn_ex) * t * exp(-t/tau_syn_ex)"],
+                                   "ode": "V_m' = -V_m/Tau + I_syn/C_m"})
+STARTUP_TRIVIAL_INPUT = json.dumps({"functions": [], "shapes": ["I = exp(-t/tau)"], "ode": None})
+
+
+def extract_solver_inputs(nestml_source):
+    """
+    :return: List of (neuron name, `SolverInput` as dictionary) tuples for all neurons with shapes.
+    """
+    neurons = NEURON.split(nestml_source)[1:]
+    solver_inputs = []
+    for name, body in zip(neurons[0::2], neurons[1::2]):
+        block = EQUATIONS_BLOCK.search(body)
+        if block is None:
+            continue
+
+        functions, shapes, odes = [], [], []
+        for line in block.group(1).splitlines():
+            line = UNIT_LITERAL.sub(r"\1*\2", SUM_CALL.sub(r"\1", line.split("#")[0])).strip().rstrip(";")
+            if SHAPE.match(line):
+                shapes.append(SHAPE.match(line).group(1).strip())
+            elif FUNCTION.match(line):
+                function_name, definition = FUNCTION.match(line).groups()
+                functions.append(function_name + " = " + definition.strip())
+            elif ODE.match(line):
+                odes.append(line)
+
+        if shapes:
+            solver_inputs.append((name, {"functions": functions, "shapes": shapes, "ode": odes[0] if odes else None}))
+    return solver_inputs
+
+
+def read_corpus(models_dir):
+    """
+    :return: Sorted list of (case name, `SolverInput` JSON) tuples of all models in `models_dir`.
+    """
+    cases = []
+    for path in sorted(glob.glob(os.path.join(models_dir, "*.nestml"))):
+        with open(path) as f:
+            source = f.read()
+        model_name = os.path.splitext(os.path.basename(path))[0]
+        for neuron_name, solver_input in extract_solver_inputs(source):
+            cases.append((model_name + "/" + neuron_name, json.dumps(solver_input)))
+    return cases
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def run_case(input_json, repetitions):
+    """
+    Solves `input_json` `repetitions` times with the diagnostics of `solver_diagnostics.py`.
+    :return: The benchmark record of the case.
+    """
+    solver_input = json.loads(input_json)
+    solver_input["options"] = dict(solver_input.get("options", {}), diagnostics=True)
+    input_json = json.dumps(solver_input)
+
+    shape_memo = OdeAnalyzer.shape_memo
+    seconds, stages, solver = [], {}, None
+    try:
+        for _ in range(repetitions):
+            OdeAnalyzer.shape_memo = ShapeMemo()
+            start = time.time()
+            output = OdeAnalyzer.compute_solution(input_json)
+            seconds.append(time.time() - start)
+            if output is None:
+                continue
+            result = json.loads(output)
+            solver = result["solver"]
+            for record in result["diagnostics"]["stages"]:
+                stages.setdefault(record["stage"], []).append(record["seconds"])
+    except Exception as e:
+        return {"error": "{}: {}".format(type(e).__name__, e)}
+    finally:
+        OdeAnalyzer.shape_memo = shape_memo
+
+    return {"solver": solver,
+            "seconds": {"min": min(seconds), "median": median(seconds)},
+            "stages": dict((stage, median(values)) for stage, values in stages.items())}
+
+
+def run_case_in_process(input_json, repetitions):
+    """
+    Runs `run_case` in a fresh solver process.
+    :return: The benchmark record of the case with the `peak_memory_kb` of the process.
+    """
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--case", "--repetitions", str(repetitions)],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=SOLVER_DIR)
+    output = process.communicate(input_json.encode("utf-8"))[0]
+    if process.returncode != 0:
+        return {"error": "The benchmark process failed with exit code {}".format(process.returncode)}
+    return json.loads(output)
+
+
+def run_benchmark(cases, repetitions=3, log=None):
+    """
+    :param cases: List of (case name, `SolverInput` JSON) tuples.
+    :return: The benchmark results as dictionary.
+    """
+    models = {}
+    for name, input_json in cases:
+        models[name] = run_case_in_process(input_json, repetitions)
+        if log is not None:
+            log.write("{}: {}\n".format(name, models[name].get("error") or
+                                        "{:.3f} s".format(models[name]["seconds"]["median"])))
+    return {"repetitions": repetitions, "models": models}
+
+
+def run_solver_process(input_json, arguments=()):
+    """
+    Solves `input_json` in a fresh solver process.
+    :return: The wall-clock time until the result is written.
+    """
+    start = time.time()
+    process = subprocess.Popen([sys.executable, os.path.join(SOLVER_DIR, "OdeAnalyzer.py"),
+                                "--input-file", "-", "--output", "-"] + list(arguments),
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    output = process.communicate(input_json.encode("utf-8"))[0]
+    seconds = time.time() - start
+    if process.returncode != 0 or not output.strip():
+        raise RuntimeError("The solver process failed with exit code {}".format(process.returncode))
+    return seconds
+
+
+def startup_times(repetitions=3):
+    """
+    :return: The minimal time to the first result of a fresh solver process for the `STARTUP_CACHED_INPUT`, which is
+    answered from the result cache, and for the `STARTUP_TRIVIAL_INPUT`.
+    """
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache_arguments = ["--cache-dir", cache_dir]
+        run_solver_process(STARTUP_CACHED_INPUT, cache_arguments)
+        return {"cached": min(run_solver_process(STARTUP_CACHED_INPUT, cache_arguments) for _ in range(repetitions)),
+                "trivial": min(run_solver_process(STARTUP_TRIVIAL_INPUT) for _ in range(repetitions))}
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_seconds=DEFAULT_MIN_SECONDS):
+    """
+    :return: List of the regressions of `results` against `baseline` as dictionaries with the keys `model`,
+    `baseline` and `current` (median seconds, None if the case fails), sorted by model.
+    """
+    regressions = []
+    for name in sorted(set(results["models"]) & set(baseline["models"])):
+        current, previous = results["models"][name], baseline["models"][name]
+        if "error" in previous:
+            continue
+        if "error" in current:
+            regressions.append({"model": name, "baseline": previous["seconds"]["median"], "current": None})
+            continue
+        current_seconds, previous_seconds = current["seconds"]["median"], previous["seconds"]["median"]
+        if current_seconds - previous_seconds > max(threshold * previous_seconds, min_seconds):
+            regressions.append({"model": name, "baseline": previous_seconds, "current": current_seconds})
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmarks the solver over the NESTML model corpus.")
+    parser.add_argument("--models", default=DEFAULT_MODELS_DIR, metavar="PATH",
+                        help="Directory of the *.nestml models (default: the models of the repository)")
+    parser.add_argument("--repetitions", type=int, default=3,
+                        help="Number of solver runs per model (default: 3)")
+    parser.add_argument("--output", metavar="PATH", help="JSON file for the results (default: stdout)")
+    parser.add_argument("--startup", action="store_true",
+                        help="Also measure the time to the first result of a fresh solver process")
+    parser.add_argument("--baseline", metavar="PATH", help="Results of an earlier run to compare against")
+    parser.add_argument("--case", action="store_true",
+                        help="Benchmark the single SolverInput from stdin and write its record to stdout (used for "
+                             "the process of every model)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown which counts as a regression (default: {})".format(DEFAULT_THRESHOLD))
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS,
+                        help="Smallest absolute slowdown which counts as a regression (default: {})".format(
+                            DEFAULT_MIN_SECONDS))
+    args = parser.parse_args(argv)
+
+    if args.case:
+        # the imports of the first solution would otherwise count as the time of the case
+        OdeAnalyzer.compute_solution(STARTUP_TRIVIAL_INPUT)
+        record = run_case(sys.stdin.read(), args.repetitions)
+        # kilobytes on Linux
+        record["peak_memory_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        sys.stdout.write(json.dumps(record) + "\n")
+        return 0
+
+    results = run_benchmark(read_corpus(args.models), args.repetitions, sys.stderr)
+    if args.startup:
+        results["startup"] = startup_times(args.repetitions)
+        sys.stderr.write("startup: {cached:.3f} s (cached), {trivial:.3f} s (trivial)\n".format(**results["startup"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        sys.stdout.write(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_seconds)
+        for regression in regressions:
+            sys.stderr.write("Regression in {model}: {baseline} s -> {current} s\n".format(**regression))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,79 @@
+import unittest
+
+import subprocess
+import sys
+
+from ode_analyzer_test import psc_ode_block
+from solver_benchmark import SOLVER_DIR, compare, extract_solver_inputs, run_case, run_case_in_process, startup_times
+
+nestml_source = """
+neuron iaf_psc_alpha_neuron:
+  state:
+    V_abs mV = 0mV
+  end
+
+  equations:
+    shape I_shape_in = pA * (e/tau_syn_in) * t * exp(-1/tau_syn_in*t)
+    shape I_shape_ex = pA * (e/tau_syn_ex) * t * exp(-1/tau_syn_ex*t) # excitatory
+    function tau_m ms = 10.0ms
+    function I pA = curr_sum(I_shape_in, in_spikes) + curr_sum(I_shape_ex, ex_spikes) + I_e
+    V_abs' = -1/tau_m * V_abs + 1/C_m * I
+  end
+end
+
+neuron iaf_psc_alpha_implicit:
+  equations:
+    I_shape_in'' = (-2/tau_syn_in) * I_shape_in'-(1/tau_syn_in**2) * I_shape_in
+    V_abs' = -1/Tau * V_abs + 1/C_m * I_shape_in
+  end
+end
+"""
+
+
+def record(median):
+    return {"seconds": {"min": median, "median": median}}
+
+
+class TestSolverBenchmark(unittest.TestCase):
+
+    def test_extract_solver_inputs(self):
+        self.assertEqual(
+            [("iaf_psc_alpha_neuron",
+              {"functions": ["tau_m = 10.0*ms", "I = I_shape_in + I_shape_ex + I_e"],
+               "shapes": ["I_shape_in = pA * (e/tau_syn_in) * t * exp(-1/tau_syn_in*t)",
+                          "I_shape_ex = pA * (e/tau_syn_ex) * t * exp(-1/tau_syn_ex*t)"],
+               "ode": "V_abs' = -1/tau_m * V_abs + 1/C_m * I"})],
+            extract_solver_inputs(nestml_source))
+
+    def test_run_case(self):
+        result = run_case(psc_ode_block, 2)
+        self.assertEqual("exact", result["solver"])
+        self.assertLessEqual(result["seconds"]["min"], result["seconds"]["median"])
+        self.assertIn("propagators", result["stages"])
+
+    def test_run_case_in_process(self):
+        result = run_case_in_process(psc_ode_block, 1)
+        self.assertEqual("exact", result["solver"])
+        self.assertGreater(result["peak_memory_kb"], 0)
+        self.assertIn("error", run_case_in_process("{", 1))
+
+    def test_compare(self):
+        baseline = {"models": {"fast": record(0.01), "slow": record(1.0), "stable": record(1.0),
+                               "broken": record(1.0), "removed": record(1.0)}}
+        results = {"models": {"fast": record(0.03), "slow": record(1.5), "stable": record(1.1),
+                              "broken": {"error": "ValueError"}, "added": record(1.0)}}
+        self.assertEqual([{"model": "broken", "baseline": 1.0, "current": None},
+                          {"model": "slow", "baseline": 1.0, "current": 1.5}],
+                         compare(results, baseline, threshold=0.25, min_seconds=0.05))
+
+    def test_entry_point_does_not_import_sympy(self):
+        check = "import sys, OdeAnalyzer, solver_cache; solver_cache.sympy_version(); print('sympy' in sys.modules)"
+        self.assertEqual("False", subprocess.check_output([sys.executable, "-c", check], cwd=SOLVER_DIR).strip())
+
+    def test_startup_times(self):
+        startup = startup_times(1)
+        self.assertLess(startup["cached"], startup["trivial"])
+
+
+if __name__ == '__main__':
+    unittest.main()
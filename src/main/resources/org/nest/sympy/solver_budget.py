@@ -0,0 +1,144 @@
+"""
+   Wall-clock and expression-size budgets for the stages of the solver. A
+   single pathological shape can keep the shape analysis or the propagator
+   computation busy for a very long time; with a `Budget` every stage is
+   interrupted once it exceeds its limits and the ODE block is solved again
+   with a cheaper strategy. The strategies are tried in the order of
+   `FALLBACK_LEVELS`, each given as the options which override those of the
+   `SolverInput`:
+
+   "full":               the options of the input
+   "no_simplify":        `simplify` is neither used for the propagators nor in
+                         the zero test
+   "numeric_propagator": additionally, the propagators are computed
+                         numerically at the calibration of the model
+   "numeric":            the shapes are converted to ODEs, which are solved
+                         numerically
+
+   After a stage exceeded its budget, the levels which do not change this
+   stage (`CHEAPENED_STAGES`) are skipped: e.g. a shape analysis which times
+   out without `simplify` would time out at every later level as well.
+
+   The level which produced the result and the exceeded budgets are recorded
+   in the field `budget` of the `SolverOutput`.
+"""
+
+import copy
+import signal
+import threading
+from contextlib import contextmanager
+
+FALLBACK_LEVELS = [("full", {}),
+                   ("no_simplify", {"simplify": False}),
+                   ("numeric_propagator", {"simplify": False, "propagator": "numeric"}),
+                   ("numeric", {"simplify": False, "exact": False})]
+
+# stages which a level skips or makes cheaper than the previous levels do
+CHEAPENED_STAGES = {"no_simplify": ["delta", "shapes", "linearity", "propagators", "elements"],
+                    "numeric_propagator": ["propagators", "elements"],
+                    "numeric": ["linearity", "propagators", "elements"]}
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised when the stage `stage` exceeds its time or its expression-size budget.
+    """
+
+    def __init__(self, stage, reason):
+        super(BudgetExceeded, self).__init__("Stage '{}' exceeded its budget: {}".format(stage, reason))
+        self.stage = stage
+        self.reason = reason
+
+
+@contextmanager
+def simplification(enabled):
+    """
+    Within the context, `simplify` is used for the propagators and in the zero test only if `enabled` is True.
+    """
+    if enabled:
+        yield
+        return
+
+    import prop_matrix
+    import zero_testing
+
+    previous_simplify, previous_tester = prop_matrix.SIMPLIFY, zero_testing.default_tester
+    prop_matrix.SIMPLIFY = False
+    zero_testing.default_tester = zero_testing.ZeroTester(
+        [tier for tier in previous_tester.tiers if tier != "simplify"], previous_tester.decisions)
+    try:
+        yield
+    finally:
+        prop_matrix.SIMPLIFY, zero_testing.default_tester = previous_simplify, previous_tester
+
+
+class Budget(object):
+    """
+    Limits every stage to `stage_seconds` seconds of wall-clock time and every checked expression to
+    `max_operations` operations (as counted by `count_ops`). A limit of None disables the check.
+    """
+
+    def __init__(self, stage_seconds=None, max_operations=None):
+        self.stage_seconds = stage_seconds
+        self.max_operations = max_operations
+
+    def is_limited(self):
+        return self.stage_seconds is not None or self.max_operations is not None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Raises `BudgetExceeded` if the body of the context runs longer than `stage_seconds`. The time limit uses
+        `SIGALRM` and is only enforced in the main thread.
+        """
+        if self.stage_seconds is None or threading.current_thread().name != "MainThread":
+            yield
+            return
+
+        def on_timeout(signum, frame):
+            raise BudgetExceeded(name, "time limit of {} s".format(self.stage_seconds))
+
+        previous_handler = signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, self.stage_seconds)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    def check_operations(self, stage, exprs):
+        """
+        Raises `BudgetExceeded` if one of `exprs` has more than `max_operations` operations.
+        """
+        if self.max_operations is None:
+            return
+        from sympy import count_ops
+        for expr in exprs:
+            operations = count_ops(expr)
+            if operations > self.max_operations:
+                raise BudgetExceeded(stage, "{} operations exceed the limit of {}".format(
+                    operations, self.max_operations))
+
+    def solve(self, solve_function, solver_input):
+        """
+        Calls `solve_function` with `solver_input` and, whenever a budget is exceeded, with the options of the
+        next of the `FALLBACK_LEVELS` which cheapens the stage that exceeded it.
+        :return: The result of the first level which stays within the budget or None if all levels exceed it,
+        and a dictionary with the `level` of the result and the list of the exceeded budgets as `fallbacks`.
+        """
+        record = {"level": None, "fallbacks": []}
+        exceeded_stage = None
+        for level, overrides in FALLBACK_LEVELS:
+            if exceeded_stage is not None and exceeded_stage not in CHEAPENED_STAGES[level]:
+                continue
+            level_input = copy.copy(solver_input)
+            level_input.options = dict(solver_input.__dict__.get("options", {}), **overrides)
+            try:
+                result = solve_function(level_input)
+            except BudgetExceeded as e:
+                record["fallbacks"].append({"level": level, "stage": e.stage, "reason": e.reason})
+                exceeded_stage = e.stage
+                continue
+            record["level"] = level
+            return result, record
+        return None, record
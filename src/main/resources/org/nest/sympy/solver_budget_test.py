@@ -0,0 +1,76 @@
+import unittest
+
+import json
+import time
+
+import prop_matrix
+import zero_testing
+from OdeAnalyzer import OdeAnalyzer, SolverOutput
+from ode_analyzer_test import psc_ode_block
+from solver_budget import Budget, BudgetExceeded, simplification
+
+
+class TestSolverBudget(unittest.TestCase):
+
+    def tearDown(self):
+        OdeAnalyzer.budget = Budget()
+
+    def test_unlimited_budget_is_not_recorded(self):
+        result = json.loads(OdeAnalyzer.compute_solution(psc_ode_block))
+        self.assertEqual("exact", result["solver"])
+        self.assertNotIn("budget", result)
+
+    def test_fallback_to_numeric_propagator(self):
+        OdeAnalyzer.budget = Budget(max_operations=10)
+        result = json.loads(OdeAnalyzer.compute_solution(psc_ode_block))
+
+        self.assertEqual("success", result["status"])
+        self.assertEqual("numeric_propagator", result["solver"])
+        self.assertEqual("numeric_propagator", result["budget"]["level"])
+        self.assertEqual(["full", "no_simplify"], [fallback["level"] for fallback in result["budget"]["fallbacks"]])
+        self.assertTrue(all(fallback["stage"] == "propagators" for fallback in result["budget"]["fallbacks"]))
+
+    def test_all_levels_exceeded(self):
+        OdeAnalyzer.budget = Budget(max_operations=1)
+        result = json.loads(OdeAnalyzer.compute_solution(psc_ode_block))
+
+        self.assertEqual("failed", result["status"])
+        self.assertIsNone(result["budget"]["level"])
+        # no level after "no_simplify" changes the shape analysis
+        self.assertEqual([("full", "shapes"), ("no_simplify", "shapes")],
+                         [(fallback["level"], fallback["stage"]) for fallback in result["budget"]["fallbacks"]])
+
+    def test_optional_stage_exceeding_budget(self):
+        OdeAnalyzer.budget = Budget(stage_seconds=0.05)
+        result = SolverOutput("success", "exact", [], {}, {}, [])
+        result.budget = {"level": "full", "fallbacks": []}
+        with OdeAnalyzer.optional_stage("cse", result):
+            time.sleep(1)
+            result.cse = {}
+        self.assertNotIn("cse", result.__dict__)
+        self.assertEqual([{"level": "full", "stage": "cse", "reason": "time limit of 0.05 s"}],
+                         result.budget["fallbacks"])
+
+    def test_stage_timeout(self):
+        budget = Budget(stage_seconds=0.05)
+        with self.assertRaises(BudgetExceeded) as context:
+            with budget.stage("shapes"):
+                time.sleep(1)
+        self.assertEqual("shapes", context.exception.stage)
+
+        # the timer is cancelled at the end of the stage
+        with budget.stage("propagators"):
+            pass
+        time.sleep(0.1)
+
+    def test_simplification_is_restored(self):
+        tester = zero_testing.default_tester
+        with simplification(False):
+            self.assertFalse(prop_matrix.SIMPLIFY)
+            self.assertNotIn("simplify", zero_testing.default_tester.tiers)
+        self.assertTrue(prop_matrix.SIMPLIFY)
+        self.assertIs(tester, zero_testing.default_tester)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+"""
+   Persistent, content-addressed cache for solver results. Entries are keyed by
+   a hash over the canonical form of the `SolverInput` (key order and whitespace
+   inside the expressions are normalized), the source code of the solver
+   scripts, the tiers of the zero test (`--zero-test`) and the SymPy version.
+   Thus, changes of the solver or of SymPy never return stale results.
+
+   Every entry is a single JSON file which is written atomically (write into a
+   temporary file and rename it), so that concurrent builds can share one cache
+   directory. The total size of the directory is bounded: the least recently
+   used entries are removed first.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024  # bytes
+
+# fields of the `SolverInput` which contain expressions
+EXPRESSION_FIELDS = ["functions", "shapes", "ode"]
+
+# fields of the request which do not influence the solution
+IGNORED_FIELDS = ["id"]
+
+
+def canonical_input(input_json):
+    """
+    :return: Canonical JSON form of the `SolverInput`: without whitespace in expressions, with sorted keys.
+    """
+    def strip_whitespace(value):
+        if isinstance(value, list):
+            return [strip_whitespace(item) for item in value]
+        elif isinstance(value, dict):
+            # shapes which are given as ODEs
+            return dict((key, strip_whitespace(item)) for key, item in value.items())
+        elif isinstance(value, basestring):
+            return "".join(value.split())
+        return value
+
+    solver_input = json.loads(input_json)
+    for field in IGNORED_FIELDS:
+        solver_input.pop(field, None)
+    for field in EXPRESSION_FIELDS:
+        if field in solver_input:
+            solver_input[field] = strip_whitespace(solver_input[field])
+    return json.dumps(solver_input, sort_keys=True, separators=(",", ":"))
+
+
+def atomic_write_json(path, data):
+    """
+    Writes `data` as JSON into `path`. Readers see either the old or the new content, never a partial file.
+    """
+    file_descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp_")
+    try:
+        with os.fdopen(file_descriptor, "w") as tmp_file:
+            json.dump(data, tmp_file, separators=(",", ":"))
+        os.rename(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_solver_source_hash = None
+
+
+def solver_source_hash():
+    """
+    :return: Hash over all solver scripts which reside next to this module (tests are excluded).
+    """
+    global _solver_source_hash
+    if _solver_source_hash is None:
+        source_hash = hashlib.sha256()
+        solver_dir = os.path.dirname(os.path.abspath(__file__))
+        for script in sorted(glob.glob(os.path.join(solver_dir, "*.py"))):
+            if script.endswith("_test.py"):
+                continue
+            with open(script, "rb") as script_file:
+                source_hash.update(os.path.basename(script).encode("utf-8"))
+                source_hash.update(script_file.read())
+        _solver_source_hash = source_hash.hexdigest()
+    return _solver_source_hash
+
+
+def zero_test_tiers():
+    """
+    :return: The tiers of the current zero test. The tiers can only differ from the default once `zero_testing` is
+    imported, which is not done here, since it imports SymPy.
+    """
+    zero_testing = sys.modules.get("zero_testing")
+    if zero_testing is None or zero_testing.default_tester.tiers == tuple(zero_testing.ZERO_TEST_TIERS):
+        return "default"
+    return ",".join(zero_testing.default_tester.tiers)
+
+
+def sympy_version():
+    """
+    :return: The version of SymPy. It is read from `sympy/release.py` if SymPy is not imported yet, since the import
+    takes much longer than a cache lookup.
+    """
+    if "sympy" not in sys.modules:
+        release = os.path.join(find_package("sympy"), "release.py")
+        if os.path.exists(release):
+            with open(release) as release_file:
+                match = re.search(r"^__version__\s*=\s*['\"]([^'\"]+)['\"]", release_file.read(), re.MULTILINE)
+            if match:
+                return match.group(1)
+    import sympy
+    return sympy.__version__
+
+
+def find_package(name):
+    """
+    :return: The directory of the package `name`, which is not imported.
+    """
+    try:
+        from importlib.util import find_spec
+    except ImportError:  # Python 2
+        import imp
+        return imp.find_module(name)[1]
+    return os.path.dirname(find_spec(name).origin)
+
+
+class SolverCache(object):
+    """
+    Size-bounded LRU cache of solver results in the directory `cache_dir`.
+    The `hits` and `misses` counters are kept for the life time of the object.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError:
+                # the directory was created concurrently
+                if not os.path.isdir(cache_dir):
+                    raise
+
+    def key(self, input_json):
+        key_hash = hashlib.sha256()
+        key_hash.update(canonical_input(input_json).encode("utf-8"))
+        key_hash.update(solver_source_hash().encode("utf-8"))
+        key_hash.update(zero_test_tiers().encode("utf-8"))
+        key_hash.update(sympy_version().encode("utf-8"))
+        return key_hash.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        """
+        :return: The stored result dictionary or None. Updates the hit/miss counters.
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path) as entry_file:
+                result = json.load(entry_file)
+            # the modification time serves as the last access time for the LRU eviction
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """
+        Stores the `result` dictionary atomically and evicts old entries if the cache grew too large.
+        """
+        atomic_write_json(self.entry_path(key), result)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache size is below `max_size`.
+        """
+        entries = []
+        total_size = 0
+        for path in glob.glob(os.path.join(self.cache_dir, "*.json")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # removed by a concurrent process
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # removed by a concurrent process
+            total_size -= size
+
+    def statistics(self, hit):
+        """
+        :return: The hit/miss counters which are reported in the `cache` field of the `SolverOutput`.
+        """
+        return {"hit": hit, "hits": self.hits, "misses": self.misses}
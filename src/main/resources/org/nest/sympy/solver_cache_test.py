@@ -0,0 +1,65 @@
+import unittest
+
+import os
+import shutil
+import tempfile
+
+import zero_testing
+from OdeAnalyzer import solve_request
+from solver_cache import SolverCache, canonical_input
+
+shapes_only = '{"functions" : [ ], "shapes" : [ "I_shape = exp(-t/tau_syn)" ], "ode" : null}'
+shapes_only_reformatted = '{"ode": null, "shapes": ["I_shape=exp( -t / tau_syn )"], "functions": [], "id": 7}'
+
+
+class TestSolverCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_canonical_input(self):
+        self.assertEqual(canonical_input(shapes_only), canonical_input(shapes_only_reformatted))
+        cache = SolverCache(self.cache_dir)
+        self.assertEqual(cache.key(shapes_only), cache.key(shapes_only_reformatted))
+        self.assertNotEqual(cache.key(shapes_only), cache.key(shapes_only.replace("tau_syn", "tau_syn_ex")))
+
+    def test_zero_test_tiers(self):
+        cache = SolverCache(self.cache_dir)
+        key = cache.key(shapes_only)
+        tester = zero_testing.default_tester
+        try:
+            zero_testing.default_tester = zero_testing.ZeroTester(["structural", "simplify"])
+            self.assertNotEqual(key, cache.key(shapes_only))
+            zero_testing.default_tester = zero_testing.ZeroTester()
+            self.assertEqual(key, cache.key(shapes_only))
+        finally:
+            zero_testing.default_tester = tester
+
+    def test_hit_and_miss(self):
+        cache = SolverCache(self.cache_dir)
+        computed = solve_request(shapes_only, cache)
+        self.assertEqual({"hit": False, "hits": 0, "misses": 1}, computed.cache)
+
+        cached = solve_request(shapes_only_reformatted, cache)
+        self.assertEqual({"hit": True, "hits": 1, "misses": 1}, cached.cache)
+        del computed.cache, cached.cache
+        self.assertEqual(computed.__dict__, cached.__dict__)
+
+    def test_lru_eviction(self):
+        cache = SolverCache(self.cache_dir, max_size=250)
+        for idx in range(3):
+            cache.put("entry{}".format(idx), {"payload": "x" * 100})
+            # make the access order unambiguous for the file system time stamps
+            os.utime(cache.entry_path("entry{}".format(idx)), (idx, idx))
+        cache.put("entry3", {"payload": "x" * 100})
+
+        self.assertIsNone(cache.get("entry0"))
+        self.assertIsNone(cache.get("entry1"))
+        self.assertIsNotNone(cache.get("entry2"))
+        self.assertIsNotNone(cache.get("entry3"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+   Common-subexpression elimination over all expressions emitted in a
+   `SolverOutput`. The propagator elements, the constant input and the update
+   instructions repeat subexpressions such as `exp(-__h/tau_syn_ex)` or
+   `1/C_m` many times. All expressions are reduced together: every repeated
+   subexpression is computed once as a named temporary and the expressions are
+   rewritten in terms of the temporaries.
+
+   The result is stored in the section `cse` of the output; the original
+   fields are not changed. The temporaries must be computed in the given
+   order, before any of the rewritten expressions are evaluated.
+"""
+
+import re
+
+from sympy import cse, count_ops, numbered_symbols
+from sympy.parsing.sympy_parser import parse_expr
+
+# the temporaries are named CSE_SYMBOL_PREFIX + index
+CSE_SYMBOL_PREFIX = "__cse_"
+
+# fields of `SolverOutput` which are lists of single-entry dictionaries `{name: expression}`
+DICTIONARY_LIST_FIELDS = ["propagator_elements", "updates_to_shape_state_variables"]
+# fields of `SolverOutput` which are dictionaries `{name: expression}`
+DICTIONARY_FIELDS = ["ode_var_factor", "const_input"]
+# instructions `var = expression` or `var += expression`
+INSTRUCTION = re.compile(r"^\s*(\S+)\s*(\+?=)\s*(.*)$")
+
+
+def eliminate_common_subexpressions(output):
+    """
+    :param output: `SolverOutput` of the exact or the delta solver.
+    :return: Dictionary with the `temporaries` as list of single-entry dictionaries, the rewritten fields of
+    `output` and the operation counts of all expressions before and after the elimination.
+    """
+    # every emitted expression is stored as `container[key] = template.format(rewritten expression)`
+    expressions = []
+    targets = []
+    rewritten = {}
+
+    for field in DICTIONARY_LIST_FIELDS:
+        if getattr(output, field, None) is None:
+            continue
+        rewritten[field] = [dict() for _ in getattr(output, field)]
+        for entry, rewritten_entry in zip(getattr(output, field), rewritten[field]):
+            for name, expression in entry.items():
+                expressions.append(parse_expr(expression))
+                targets.append((rewritten_entry, name, "{}"))
+
+    for field in DICTIONARY_FIELDS:
+        if getattr(output, field, None) is None:
+            continue
+        rewritten[field] = {}
+        for name, expression in getattr(output, field).items():
+            expressions.append(parse_expr(expression))
+            targets.append((rewritten[field], name, "{}"))
+
+    if getattr(output, "ode_var_update_instructions", None) is not None:
+        rewritten["ode_var_update_instructions"] = list(output.ode_var_update_instructions)
+        for idx, instruction in enumerate(output.ode_var_update_instructions):
+            lhs, operator, rhs = INSTRUCTION.match(instruction).groups()
+            expressions.append(parse_expr(rhs))
+            targets.append((rewritten["ode_var_update_instructions"], idx, lhs + " " + operator + " {}"))
+
+    temporaries, reduced_expressions = cse(expressions, symbols=numbered_symbols(CSE_SYMBOL_PREFIX))
+    for (container, key, template), expr in zip(targets, reduced_expressions):
+        container[key] = template.format(expr)
+
+    rewritten["temporaries"] = [{str(symbol): str(expr)} for symbol, expr in temporaries]
+    rewritten["operations_before"] = sum(count_ops(expr) for expr in expressions)
+    rewritten["operations_after"] = (sum(count_ops(expr) for _, expr in temporaries) +
+                                     sum(count_ops(expr) for expr in reduced_expressions))
+    return rewritten
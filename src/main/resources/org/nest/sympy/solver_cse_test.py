@@ -0,0 +1,45 @@
+import unittest
+
+import json
+
+from sympy.parsing.sympy_parser import parse_expr
+
+from OdeAnalyzer import OdeAnalyzer
+from ode_analyzer_test import psc_ode_block
+
+
+def expand_temporaries(expression, temporaries):
+    expr = parse_expr(expression)
+    for temporary in reversed(temporaries):
+        name, definition = list(temporary.items())[0]
+        expr = expr.subs(name, parse_expr(definition))
+    return expr
+
+
+class TestCommonSubexpressionElimination(unittest.TestCase):
+
+    def test_rewritten_elements_are_equivalent(self):
+        ode_block = json.loads(psc_ode_block)
+        ode_block["options"] = {"cse": True}
+        result = json.loads(OdeAnalyzer.compute_solution(json.dumps(ode_block)))
+        cse = result["cse"]
+
+        self.assertTrue(len(cse["temporaries"]) > 0)
+        self.assertTrue(cse["operations_after"] < cse["operations_before"])
+        for element, rewritten_element in zip(result["propagator_elements"], cse["propagator_elements"]):
+            for name, expression in element.items():
+                self.assertEqual(parse_expr(expression),
+                                 expand_temporaries(rewritten_element[name], cse["temporaries"]))
+        for instruction, rewritten_instruction in zip(result["ode_var_update_instructions"],
+                                                      cse["ode_var_update_instructions"]):
+            lhs, rhs = instruction.split("=", 1)
+            rewritten_lhs, rewritten_rhs = rewritten_instruction.split("=", 1)
+            self.assertEqual(lhs.strip(), rewritten_lhs.strip())
+            self.assertEqual(parse_expr(rhs), expand_temporaries(rewritten_rhs, cse["temporaries"]))
+
+    def test_disabled_by_default(self):
+        result = json.loads(OdeAnalyzer.compute_solution(psc_ode_block))
+        self.assertNotIn("cse", result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+   Dependency classes of the expressions emitted in a `SolverOutput`. Every
+   propagator element, `__const_input`, `__ode_var_factor` and update
+   instruction is annotated with the class of the symbols it depends on:
+
+       constant   depends on no symbol
+       parameter  depends only on parameters and the step size `__h`; can be
+                  computed once per calibration
+       input      depends on an input, i.e. a delta shape or a symbol listed
+                  in the option "inputs" (e.g. a current buffer); must be
+                  computed every step
+       state      depends on a state variable; must be computed every step
+
+   The classes are ordered, an expression has the highest class of its parts.
+   A name defined in the output, e.g. a propagator element, has the class of
+   its definition. Every other unknown symbol is a parameter: the solver does
+   not know the buffers of the neuron unless they are given as "inputs".
+
+   Expressions of the class input or state are split: their maximal parts of
+   the class constant or parameter are replaced by named temporaries, which
+   can be hoisted out of the loop over the steps. The result is stored in the
+   section `dependencies` of the output; the original fields are not changed.
+"""
+
+from sympy import Symbol
+from sympy.parsing.sympy_parser import parse_expr
+
+from numpy_kernels import PROPAGATOR_ENTRY
+from solver_cse import DICTIONARY_FIELDS, DICTIONARY_LIST_FIELDS, INSTRUCTION
+
+CONSTANT = "constant"
+PARAMETER = "parameter"
+INPUT = "input"
+STATE = "state"
+DEPENDENCY_CLASSES = [CONSTANT, PARAMETER, INPUT, STATE]
+
+# the hoisted temporaries are named HOISTED_SYMBOL_PREFIX + index
+HOISTED_SYMBOL_PREFIX = "__hoisted_"
+
+# fields of `SolverOutput` whose entries define names which can be used by the other expressions
+DEFINING_FIELDS = ["propagator_elements", "ode_var_factor", "const_input"]
+
+
+def parse_emitted_expression(expression):
+    """
+    Parses an emitted expression; an entry `__P_X[i][j]` of a numeric propagator is kept as one symbol.
+    """
+    entries = {}
+
+    def placeholder(match):
+        name = "__entry_{}".format(len(entries))
+        entries[name] = Symbol(match.group(0))
+        return name
+
+    return parse_expr(PROPAGATOR_ENTRY.sub(placeholder, expression), local_dict=entries)
+
+
+def field_entries(output, field):
+    """
+    :return: List of (name, expression) of a field of the `output` which is a dictionary or a list of dictionaries.
+    """
+    value = getattr(output, field, None)
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return sorted(value.items())
+    return [item for entry in value for item in entry.items()]
+
+
+class DependencyClassifier(object):
+    """
+    Determines the dependency classes of the expressions of one `SolverOutput`.
+    """
+
+    def __init__(self, output, inputs=()):
+        self.state_symbols = set(Symbol(name) for name in getattr(output, "shape_state_variables", None) or [])
+        for name, _ in field_entries(output, "updates_to_shape_state_variables"):
+            self.state_symbols.add(Symbol(name))
+        for instruction in getattr(output, "ode_var_update_instructions", None) or []:
+            self.state_symbols.add(Symbol(INSTRUCTION.match(instruction).group(1)))
+
+        self.input_symbols = set(Symbol(name) for name in inputs)
+        for jump in getattr(output, "delta_shapes", None) or []:
+            self.input_symbols.add(Symbol(jump["shape"]))
+
+        self.definitions = {}
+        for field in DEFINING_FIELDS:
+            for name, expression in field_entries(output, field):
+                self.definitions[Symbol(name)] = parse_emitted_expression(expression)
+        self.symbol_classes = {}
+        self.hoisted = []
+        self.hoisted_symbols = {}
+
+    def symbol_class(self, symbol):
+        if symbol in self.state_symbols:
+            return STATE
+        if symbol in self.input_symbols:
+            return INPUT
+        if symbol not in self.symbol_classes:
+            # marks the symbol while its definition is classified, so that cyclic definitions terminate
+            self.symbol_classes[symbol] = PARAMETER
+            if symbol in self.definitions:
+                self.symbol_classes[symbol] = self.expression_class(self.definitions[symbol])
+        return self.symbol_classes[symbol]
+
+    def expression_class(self, expr):
+        classes = [self.symbol_class(symbol) for symbol in expr.free_symbols]
+        return max(classes, key=DEPENDENCY_CLASSES.index) if classes else CONSTANT
+
+    def is_invariant(self, expr):
+        return self.expression_class(expr) in (CONSTANT, PARAMETER)
+
+    def hoist(self, expr):
+        """
+        :return: The temporary which holds the invariant expression `expr`, or `expr` itself if it is an atom.
+        """
+        if expr.is_Atom:
+            return expr
+        if expr not in self.hoisted_symbols:
+            symbol = Symbol(HOISTED_SYMBOL_PREFIX + str(len(self.hoisted)))
+            self.hoisted_symbols[expr] = symbol
+            self.hoisted.append({str(symbol): str(expr)})
+        return self.hoisted_symbols[expr]
+
+    def split(self, expr):
+        """
+        Replaces the maximal invariant parts of `expr` by hoisted temporaries. The invariant arguments of a sum or a
+        product are hoisted together.
+        """
+        if self.is_invariant(expr):
+            return self.hoist(expr)
+        if expr.is_Add or expr.is_Mul:
+            invariant_args = [arg for arg in expr.args if self.is_invariant(arg)]
+            other_args = [self.split(arg) for arg in expr.args if not self.is_invariant(arg)]
+            if invariant_args:
+                other_args.insert(0, self.hoist(expr.func(*invariant_args)))
+            return expr.func(*other_args)
+        if not expr.args:
+            return expr
+        return expr.func(*[self.split(arg) for arg in expr.args])
+
+    def classify(self, expression):
+        """
+        :return: The dependency class of the emitted `expression` and the expression for the per-step loop.
+        """
+        expr = parse_emitted_expression(expression)
+        expression_class = self.expression_class(expr)
+        if expression_class in (CONSTANT, PARAMETER):
+            return expression_class, expression
+        return expression_class, str(self.split(expr))
+
+
+def classify_dependencies(output, inputs=()):
+    """
+    :param output: `SolverOutput` of the exact, the delta or the numeric propagator solver.
+    :param inputs: Names of the symbols which are inputs of the neuron, e.g. buffers.
+    :return: Dictionary with the dependency `classes` of the fields of `output`, the `hoisted` temporaries as list of
+    single-entry dictionaries, which must be computed in the given order after the propagator elements,
+    `__ode_var_factor` and `__const_input`, and the `rewritten` fields of `output` in which the expressions of the class
+    input or state use the temporaries.
+    """
+    classifier = DependencyClassifier(output, inputs)
+    classes = {}
+    rewritten = {}
+
+    for field in DICTIONARY_LIST_FIELDS:
+        if getattr(output, field, None) is None:
+            continue
+        classes[field] = []
+        rewritten[field] = []
+        for entry in getattr(output, field):
+            classes[field].append({})
+            rewritten[field].append({})
+            for name, expression in entry.items():
+                classes[field][-1][name], rewritten[field][-1][name] = classifier.classify(expression)
+
+    for field in DICTIONARY_FIELDS:
+        if getattr(output, field, None) is None:
+            continue
+        classes[field] = {}
+        rewritten[field] = {}
+        for name, expression in getattr(output, field).items():
+            classes[field][name], rewritten[field][name] = classifier.classify(expression)
+
+    if getattr(output, "ode_var_update_instructions", None) is not None:
+        # the class of an instruction is the class of its right-hand side
+        classes["ode_var_update_instructions"] = []
+        rewritten["ode_var_update_instructions"] = []
+        for instruction in output.ode_var_update_instructions:
+            lhs, operator, rhs = INSTRUCTION.match(instruction).groups()
+            rhs_class, rewritten_rhs = classifier.classify(rhs)
+            classes["ode_var_update_instructions"].append(rhs_class)
+            rewritten["ode_var_update_instructions"].append(lhs + " " + operator + " " + rewritten_rhs)
+
+    return {"classes": classes, "hoisted": classifier.hoisted, "rewritten": rewritten}
@@ -0,0 +1,71 @@
+import unittest
+
+import json
+
+from sympy.parsing.sympy_parser import parse_expr
+
+from OdeAnalyzer import OdeAnalyzer
+from delta_shapes_test import mixed_ode_block
+from ode_analyzer_test import psc_ode_block, solve
+from solver_dependencies import parse_emitted_expression
+
+
+def expand_hoisted(expression, hoisted):
+    expr = parse_emitted_expression(expression)
+    for temporary in reversed(hoisted):
+        name, definition = list(temporary.items())[0]
+        expr = expr.subs(name, parse_expr(definition))
+    return expr
+
+
+class TestDependencyClasses(unittest.TestCase):
+
+    def test_classes(self):
+        dependencies = solve(psc_ode_block, inputs=["currents"], dependencies=True)["dependencies"]
+        classes = dependencies["classes"]
+        self.assertEqual(set(["parameter"]),
+                         set(value for element in classes["propagator_elements"] for value in element.values()))
+        self.assertEqual({"__ode_var_factor": "parameter"}, classes["ode_var_factor"])
+        self.assertEqual({"__const_input": "input"}, classes["const_input"])
+        self.assertEqual(["state", "state", "state"], classes["ode_var_update_instructions"])
+        self.assertEqual({"__tmp__I_shape_in__1": "state"}, classes["updates_to_shape_state_variables"][1])
+
+        # without the option "inputs" the buffer `currents` is a parameter
+        classes = solve(psc_ode_block, dependencies=True)["dependencies"]["classes"]
+        self.assertEqual({"__const_input": "parameter"}, classes["const_input"])
+
+    def test_invariant_parts_are_hoisted(self):
+        result = solve(psc_ode_block, inputs=["currents"], dependencies=True)
+        dependencies = result["dependencies"]
+        self.assertIn({"__hoisted_1": "Tau - Tau*exp(-__h/Tau)"}, dependencies["hoisted"])
+        self.assertEqual("V_abs = V_abs*__ode_var_factor + __const_input*__hoisted_1",
+                         dependencies["rewritten"]["ode_var_update_instructions"][0])
+
+        for instruction, rewritten_instruction in zip(result["ode_var_update_instructions"],
+                                                      dependencies["rewritten"]["ode_var_update_instructions"]):
+            lhs, rhs = instruction.split("=", 1)
+            rewritten_lhs, rewritten_rhs = rewritten_instruction.split("=", 1)
+            self.assertEqual(lhs.strip(), rewritten_lhs.strip())
+            self.assertEqual(parse_expr(rhs), expand_hoisted(rewritten_rhs, dependencies["hoisted"]))
+        self.assertEqual(parse_expr(result["const_input"]["__const_input"]),
+                         expand_hoisted(dependencies["rewritten"]["const_input"]["__const_input"],
+                                        dependencies["hoisted"]))
+
+    def test_numeric_propagator(self):
+        dependencies = solve(psc_ode_block, propagator="numeric", dependencies=True)["dependencies"]
+        self.assertEqual({"__ode_var_factor": "parameter"}, dependencies["classes"]["ode_var_factor"])
+        self.assertEqual({"__P_I_shape_in__2_2": "__P_I_shape_in[2][2]"},
+                         dependencies["rewritten"]["propagator_elements"][5])
+        self.assertEqual("V_abs = V_abs*__ode_var_factor + __hoisted_0",
+                         dependencies["rewritten"]["ode_var_update_instructions"][0])
+
+    def test_delta_shapes(self):
+        dependencies = solve(json.dumps(mixed_ode_block), delta_jumps=True, dependencies=True)["dependencies"]
+        self.assertEqual(["state", "state"], dependencies["classes"]["ode_var_update_instructions"])
+
+    def test_disabled_by_default(self):
+        self.assertNotIn("dependencies", json.loads(OdeAnalyzer.compute_solution(psc_ode_block)))
+
+
+if __name__ == '__main__':
+    unittest.main()
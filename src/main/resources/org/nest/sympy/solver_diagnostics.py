@@ -0,0 +1,176 @@
+"""
+   Opt-in instrumentation of the solver. With the option `"diagnostics": true`
+   of the `SolverInput` (or the command line flag `--diagnostics`) the
+   `SolverOutput` gets a section `diagnostics` which lists for every stage
+   that ran, in order:
+
+   `stage`:      "parse", "delta", "linearity", "shapes", "propagators",
+                 "elements", "cse", "dependencies", "numpy_kernels" or
+                 "serialization"
+   `seconds`:    wall-clock time of the stage
+   `peak_memory_kb`: peak of the memory allocated during the stage (traced
+                 with `tracemalloc` where it is available, i.e. Python 3);
+                 otherwise
+   `rss_delta_kb`: change of the resident set size of the process during
+                 the stage (read from `/proc/self/statm`, i.e. Linux), which
+                 is negative if the stage released memory; otherwise
+   `process_max_rss_kb`: the peak resident set size of the whole process so
+                 far, which is not a property of the stage
+   `operations`: total operation count of the expressions produced by the
+                 stage, for the stages which produce expressions
+
+   The stage "serialization" covers the serialization of all fields of the
+   output except the section `diagnostics` itself (see `serialize`).
+
+   The entry `zero_test` of the section counts the zero and nonzero
+   decisions of every tier of the zero test (see `zero_testing.py`).
+
+   `ProfiledSolver` additionally dumps a cProfile file for every request.
+"""
+
+import cProfile
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+    import resource
+
+STATM_PATH = "/proc/self/statm"
+
+
+def current_rss_kb():
+    """
+    :return: The current resident set size of the process or None if it cannot be read.
+    """
+    try:
+        with open(STATM_PATH) as statm:
+            pages = int(statm.read().split()[1])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class Diagnostics(object):
+    """
+    Records the stages of one request. A disabled instance records nothing.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = []
+        self.started_tracing = False
+        if enabled and tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        started = self.begin()
+        try:
+            yield
+        finally:
+            self.end(name, started)
+
+    def begin(self):
+        """
+        Starts the measurement of a stage, which is recorded by `end`.
+        """
+        if tracemalloc is not None and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        return time.time(), None if tracemalloc is not None else current_rss_kb()
+
+    def end(self, name, started):
+        start, start_rss = started
+        record = {"stage": name, "seconds": time.time() - start}
+        if tracemalloc is not None:
+            record["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        elif start_rss is not None and current_rss_kb() is not None:
+            record["rss_delta_kb"] = current_rss_kb() - start_rss
+        else:
+            record["process_max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stages.append(record)
+
+    def count_operations(self, stage, exprs):
+        """
+        Adds the operation count of `exprs` to the last record of `stage`.
+        """
+        if not self.enabled:
+            return
+        from sympy import count_ops
+        for record in reversed(self.stages):
+            if record["stage"] == stage:
+                record["operations"] = record.get("operations", 0) + sum(count_ops(expr) for expr in exprs)
+                return
+
+    def close(self):
+        """
+        :return: The `diagnostics` section of the `SolverOutput`.
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        return {"stages": self.stages}
+
+
+def serialize(fields, **json_options):
+    """
+    Serializes the dictionary `fields` of a `SolverOutput` with `json.dumps` and the `json_options`. A section
+    `diagnostics` is serialized last, and only then gets the record of the stage "serialization", so that the
+    output is serialized once and the record covers all other fields.
+    """
+    if not isinstance(fields, dict) or "diagnostics" not in fields:
+        return json.dumps(fields, **json_options)
+
+    diagnostics = Diagnostics()
+    started = diagnostics.begin()
+    ordered_fields = OrderedDict((name, value) for name, value in fields.items() if name != "diagnostics")
+    ordered_fields["diagnostics"] = PendingDiagnostics(fields["diagnostics"])
+
+    def complete(value):
+        if not isinstance(value, PendingDiagnostics):
+            raise TypeError("{!r} is not JSON serializable".format(value))
+        diagnostics.end("serialization", started)
+        return dict(value.section, stages=value.section["stages"] + diagnostics.close()["stages"])
+
+    return json.dumps(ordered_fields, default=complete, **json_options)
+
+
+class PendingDiagnostics(object):
+    """
+    The section `diagnostics` during its serialization, see `serialize`.
+    """
+
+    def __init__(self, section):
+        self.section = section
+
+
+class ProfiledSolver(object):
+    """
+    Wraps a solve function `solve(input_json)` and dumps a cProfile file `<directory>/<hash of the input>.prof`
+    for every request.
+    """
+
+    def __init__(self, solve, directory):
+        self.solve = solve
+        self.directory = directory
+
+    def __call__(self, input_json):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(self.solve, input_json)
+        finally:
+            if not isinstance(input_json, bytes):
+                input_json = input_json.encode("utf-8")
+            name = hashlib.sha1(input_json).hexdigest()[:16] + ".prof"
+            profile.dump_stats(os.path.join(self.directory, name))
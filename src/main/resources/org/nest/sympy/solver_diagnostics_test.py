@@ -0,0 +1,76 @@
+import unittest
+
+import json
+import os
+import pstats
+import shutil
+import tempfile
+
+from OdeAnalyzer import OdeAnalyzer, main, solve_request
+from ode_analyzer_test import delta_shape, psc_ode_block, with_options
+from solver_diagnostics import ProfiledSolver
+
+
+class TestSolverDiagnostics(unittest.TestCase):
+
+    def test_diagnostics_are_opt_in(self):
+        result = json.loads(OdeAnalyzer.compute_solution(psc_ode_block))
+        self.assertNotIn("diagnostics", result)
+
+    def test_stages_of_exact_solution(self):
+        result = json.loads(OdeAnalyzer.compute_solution(with_options(psc_ode_block, diagnostics=True)))
+        stages = result["diagnostics"]["stages"]
+
+        self.assertEqual(["parse", "shapes", "linearity", "propagators", "elements", "serialization"],
+                         [record["stage"] for record in stages])
+        for record in stages:
+            self.assertGreaterEqual(record["seconds"], 0)
+            self.assertTrue("peak_memory_kb" in record or "rss_delta_kb" in record or "process_max_rss_kb" in record)
+        operations = dict((record["stage"], record.get("operations")) for record in stages)
+        self.assertGreater(operations["shapes"], 0)
+        self.assertGreater(operations["propagators"], 0)
+        self.assertIsNone(operations["parse"])
+
+    def test_zero_test_decisions_per_request(self):
+        first, second = [json.loads(OdeAnalyzer.compute_solution(with_options(psc_ode_block, diagnostics=True)))
+                         for _ in range(2)]
+        self.assertGreater(sum(counts["zero"] + counts["nonzero"]
+                               for counts in first["diagnostics"]["zero_test"].values()), 0)
+        self.assertEqual(first["diagnostics"]["zero_test"], second["diagnostics"]["zero_test"])
+
+    def test_serialization_of_command_line_output(self):
+        directory = tempfile.mkdtemp()
+        try:
+            output_path = os.path.join(directory, "output.json")
+            self.assertEqual(0, main(["--diagnostics", "--output", output_path, psc_ode_block]))
+            with open(output_path) as f:
+                result = json.load(f)
+            self.assertEqual("serialization", result["diagnostics"]["stages"][-1]["stage"])
+            self.assertEqual("exact", result["solver"])
+        finally:
+            shutil.rmtree(directory)
+            OdeAnalyzer.collect_diagnostics = False
+
+    def test_stages_of_delta_solution(self):
+        result = json.loads(OdeAnalyzer.compute_solution(with_options(delta_shape, diagnostics=True)))
+        self.assertEqual(["parse", "linearity", "delta", "serialization"],
+                         [record["stage"] for record in result["diagnostics"]["stages"]])
+
+    def test_profile_per_request(self):
+        directory = tempfile.mkdtemp()
+        try:
+            solve = ProfiledSolver(solve_request, directory)
+            result = solve(psc_ode_block)
+            self.assertEqual("exact", result.solver)
+
+            profiles = os.listdir(directory)
+            self.assertEqual(1, len(profiles))
+            self.assertTrue(profiles[0].endswith(".prof"))
+            stats = pstats.Stats(os.path.join(directory, profiles[0]))
+            self.assertGreater(stats.total_calls, 0)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
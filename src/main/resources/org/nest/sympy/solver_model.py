@@ -0,0 +1,134 @@
+"""
+   Parsed representation of an ODE block. The strings of a `SolverInput` are
+   parsed exactly once into SymPy expressions, which are shared by all stages
+   of the analysis (linearity check, shape analysis, propagator computation).
+
+   The functions of the block are inlined by substitution: every function is
+   parsed on its own and the previously defined functions are substituted
+   into it. Shapes remain symbols in the right-hand side of the ODE, their
+   definitions are substituted only where the stages need them.
+
+   A shape is given either as function of `t`, `name = expression`, or as
+   system of first-order ODEs with initial values, e.g.
+
+       {"name": "I_ex",
+        "odes": ["I_ex' = I_ex__1", "I_ex__1' = -I_ex/tau**2 - 2*I_ex__1/tau"],
+        "initial_values": {"I_ex": "0", "I_ex__1": "e/tau"}}
+
+   whose definition is a `ShapeODE`.
+"""
+
+import copy
+
+from sympy import Function, Symbol, sympify
+from sympy.parsing.sympy_parser import parse_expr
+
+from shapes import ShapeODE
+
+
+def split_definition(definition):
+    """
+    Splits `lhs = rhs` into the stripped sides; the apostrophe of ODE variables is removed from the lhs.
+    """
+    lhs, rhs = definition.split('=', 1)
+    return lhs.replace("'", "").strip(), rhs.strip()
+
+
+class SolverModel(object):
+    """
+    Holds the parsed ODE block with the following fields:
+    `odes`: list of (symbol, right-hand side) tuples of all ODEs; in the right-hand sides all functions are inlined
+    and the shapes are symbols
+    `ode_var`, `ode_rhs`: symbol and right-hand side of the ODE if the block contains exactly one ODE, else None
+    `shapes`: list of (symbol, definition) tuples in the input order; the definition of a shape which is given as
+    ODEs is a `ShapeODE`
+    `functions`: list of (symbol, definition) tuples; every definition has all previous functions inlined
+    """
+
+    def __init__(self, ode, shapes, functions):
+        """
+        :param ode: ODE definition `var' = rhs`, list of such definitions for a system of ODEs, or None.
+        :param shapes: List of shape definitions `name = expression` or shape ODEs (see above).
+        :param functions: List of function definitions `name = expression`, each may use the previous ones.
+        """
+        if ode is None:
+            odes = []
+        elif isinstance(ode, list):
+            odes = ode
+        else:
+            odes = [ode]
+
+        shape_odes = [shape for shape in shapes if isinstance(shape, dict)]
+        definitions = [split_definition(definition) for definition in
+                       functions + [shape for shape in shapes if not isinstance(shape, dict)] + odes +
+                       [ode for shape in shape_odes for ode in shape["odes"]]]
+        # names which are defined in the block are always symbols, even if SymPy knows a function with this name
+        self.symbols = dict((name, Symbol(name)) for name, _ in definitions)
+        self.symbols.update((shape["name"], Symbol(shape["name"])) for shape in shape_odes)
+
+        self.functions = []
+        for name, definition in [split_definition(function) for function in functions]:
+            expr = self.parse(definition).xreplace(dict(self.functions))
+            self.functions.append((self.symbols[name], expr))
+
+        self.shapes = []
+        for shape in shapes:
+            if isinstance(shape, dict):
+                self.shapes.append((self.symbols[shape["name"]], self.parse_shape_ode(shape)))
+            else:
+                name, definition = split_definition(shape)
+                self.shapes.append((self.symbols[name], self.parse(definition)))
+
+        self.odes = [(self.symbols[name], self.parse(definition).xreplace(dict(self.functions)))
+                     for name, definition in [split_definition(ode) for ode in odes]]
+
+        if len(self.odes) == 1:
+            self.ode_var, self.ode_rhs = self.odes[0]
+        else:
+            self.ode_var = None
+            self.ode_rhs = None
+
+    @staticmethod
+    def from_solver_input(solver_input):
+        return SolverModel(solver_input.ode,
+                           solver_input.shapes,
+                           solver_input.__dict__.get("functions", []))
+
+    def parse(self, definition):
+        return parse_expr(definition, local_dict=dict(self.symbols))
+
+    def parse_shape_ode(self, shape):
+        odes = [split_definition(ode) for ode in shape["odes"]]
+        initial_values = shape.get("initial_values", {})
+        missing = [name for name, _ in odes if name not in initial_values]
+        if missing:
+            raise ValueError("Shape {}: no initial values of {}".format(shape["name"], ", ".join(missing)))
+        return ShapeODE(self.symbols[shape["name"]],
+                        [self.symbols[name] for name, _ in odes],
+                        [self.parse(rhs) for _, rhs in odes],
+                        [self.parse(str(initial_values[name])) for name, _ in odes])
+
+    def ode_rhs_with_shape_definitions(self):
+        """
+        :return: The right-hand side of the ODE as a function of `t`, i.e. with the shape definitions inlined. Shapes
+        which are given as ODEs become undefined functions of `t`.
+        """
+        return self.ode_rhs.xreplace(dict(
+            (shape, Function(str(shape))(Symbol("t")) if isinstance(definition, ShapeODE) else definition)
+            for shape, definition in self.shapes))
+
+    def is_system(self):
+        return len(self.odes) > 1
+
+    def without_shapes(self, shape_symbols):
+        """
+        :return: A copy of the model in which the shapes `shape_symbols` are removed and set to zero in the
+        right-hand side of the ODE.
+        """
+        model = copy.copy(self)
+        model.shapes = [(symbol, definition) for symbol, definition in self.shapes if symbol not in shape_symbols]
+        removed_shapes = dict((symbol, sympify(0)) for symbol in shape_symbols)
+        model.odes = [(ode_var, ode_rhs.xreplace(removed_shapes)) for ode_var, ode_rhs in self.odes]
+        if model.ode_rhs is not None:
+            model.ode_rhs = self.ode_rhs.xreplace(removed_shapes)
+        return model
@@ -0,0 +1,45 @@
+import unittest
+
+from sympy import Function, Symbol, exp
+from sympy.parsing.sympy_parser import parse_expr
+
+from shapes import ShapeODE
+from solver_model import SolverModel
+
+
+class TestSolverModel(unittest.TestCase):
+
+    def test_functions_are_inlined(self):
+        model = SolverModel("V_m' = -V_m/Tau + I_syn/C",
+                            ["g_ex = exp(-t/tau_syn)"],
+                            ["I_g = g_ex * (V_m - E_ex)", "I_syn = I_g + I_e"])
+        self.assertEqual(parse_expr("g_ex * (V_m - E_ex) + I_e"), model.functions[1][1])
+        self.assertEqual(parse_expr("-V_m/Tau + (g_ex * (V_m - E_ex) + I_e)/C"), model.ode_rhs)
+        self.assertEqual(parse_expr("-V_m/Tau + (exp(-t/tau_syn) * (V_m - E_ex) + I_e)/C"),
+                         model.ode_rhs_with_shape_definitions())
+
+    def test_defined_names_are_symbols(self):
+        # `beta` is also the name of a SymPy function
+        model = SolverModel("V_m' = -V_m/Tau + beta", ["beta = exp(-t/tau)"], [])
+        self.assertEqual(Symbol("beta"), model.shapes[0][0])
+        self.assertEqual(-Symbol("V_m") / Symbol("Tau") + exp(-Symbol("t") / Symbol("tau")),
+                         model.ode_rhs_with_shape_definitions())
+
+    def test_shapes_only(self):
+        model = SolverModel(None, ["I_shape = t * exp(-t/tau)"], [])
+        self.assertIsNone(model.ode_var)
+        self.assertEqual([(Symbol("I_shape"), parse_expr("t * exp(-t/tau)"))], model.shapes)
+
+    def test_shape_odes(self):
+        shape_ode = {"name": "beta", "odes": ["beta' = -beta/tau"], "initial_values": {"beta": 1}}
+        model = SolverModel("V_m' = -V_m/Tau + beta", [shape_ode], [])
+        shape, definition = model.shapes[0]
+        self.assertEqual(Symbol("beta"), shape)
+        self.assertIsInstance(definition, ShapeODE)
+        self.assertEqual([Symbol("beta")], definition.ode_sys_var)
+        self.assertEqual(-Symbol("V_m") / Symbol("Tau") + Function("beta")(Symbol("t")),
+                         model.ode_rhs_with_shape_definitions())
+        self.assertRaises(ValueError, SolverModel, None, [dict(shape_ode, initial_values={})], [])
+
+if __name__ == '__main__':
+    unittest.main()
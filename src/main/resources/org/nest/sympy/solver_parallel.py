@@ -0,0 +1,50 @@
+"""
+   Parallel analysis of the shapes of one ODE block. The shapes of a block
+   are independent of each other until their propagators are combined into
+   the update step: the order detection of every `ShapeFunction` and the
+   propagator `exp(A * h)` of every shape can be computed in separate
+   processes. With the option "shape_processes" of the `SolverInput` (or
+   `--shape-processes`), both stages run on a pool of worker processes.
+
+   `map` of the pool returns the results in the order of the inputs, so the
+   output is identical to the one of the sequential path. The workers are
+   forked when the first stage needs them and inherit the settings of the
+   solver at this time, e.g. the zero test and the simplification of the
+   current budget level (see `solver_budget.py`).
+"""
+
+import multiprocessing
+from contextlib import contextmanager
+
+# waiting for the results with a timeout can be interrupted by signals, e.g. by the stage timeout of
+# `solver_budget.py`; a wait without timeout cannot be interrupted in Python 2
+RESULT_TIMEOUT = 365 * 24 * 3600
+
+
+@contextmanager
+def worker_map(processes):
+    """
+    Provides a `map` function which runs on a pool of `processes` worker processes. If `processes` is at most 1 or
+    this process is itself a worker (e.g. of the batch mode, which cannot start processes), the built-in `map` is
+    provided instead. The function must be defined at the module level and the items must be picklable.
+    """
+    if processes is None or processes <= 1 or multiprocessing.current_process().daemon:
+        yield map
+        return
+
+    pools = []
+
+    def parallel_map(function, items):
+        items = list(items)
+        if len(items) <= 1:
+            return map(function, items)
+        if not pools:
+            pools.append(multiprocessing.Pool(processes))
+        return pools[0].map_async(function, items).get(RESULT_TIMEOUT)
+
+    try:
+        yield parallel_map
+    finally:
+        for pool in pools:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,30 @@
+import unittest
+
+from ode_analyzer_test import cond_alpha_ode_block, psc_ode_block, solve
+from solver_parallel import worker_map
+
+
+def square(x):
+    return x * x
+
+
+class TestSolverParallel(unittest.TestCase):
+
+    def test_worker_map(self):
+        with worker_map(1) as map_function:
+            self.assertIs(map, map_function)
+        with worker_map(2) as map_function:
+            self.assertEqual([0, 1, 4, 9], map_function(square, range(4)))
+            self.assertEqual([25], map_function(square, [5]))
+
+    def test_same_output_as_sequential(self):
+        for ode_block in [psc_ode_block, cond_alpha_ode_block]:
+            self.assertEqual(solve(ode_block), solve(ode_block, shape_processes=2))
+
+    def test_numeric_propagators(self):
+        self.assertEqual(solve(psc_ode_block, propagator="numeric"),
+                         solve(psc_ode_block, propagator="numeric", shape_processes=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+   Long running solver process. Instead of starting a new interpreter
+   (and importing SymPy again) for every ODE block, the server reads
+   newline-delimited `SolverInput` JSON requests and answers each of them
+   with one line of `SolverOutput` JSON. Requests are read either from
+   stdin or from the connections of a local (UNIX domain) socket.
+
+   The server is an entry point for external callers, e.g. build tools or
+   scripts which solve many blocks (`OdeAnalyzer.py --server`). The Java
+   `SymPySolver` does not use it: it still starts one `OdeAnalyzer.py`
+   process per equations block and only copies this script into the output
+   folder together with the other solver scripts.
+
+   Protocol:
+   =========
+
+   Every request is a single line containing a JSON object. Objects with a
+   `command` field are control requests:
+
+   {"command": "ping"}      is answered with {"status": "alive"}
+   {"command": "shutdown"}  is answered with {"status": "shutdown"} and stops the server
+
+   All other objects are treated as `SolverInput`. An optional `id` field
+   is copied into the response, so that clients can pipeline requests.
+   A failing request is answered with {"status": "failed", "error": ...}
+   and does not affect later requests.
+"""
+
+import json
+import os
+import socket
+import sys
+import traceback
+
+from solver_diagnostics import serialize
+
+
+class SolverServer(object):
+    """
+    Serves solver requests. `solve` is a callable which receives the request
+    line (the `SolverInput` JSON) and returns a `SolverOutput` object or None.
+    """
+
+    def __init__(self, solve):
+        self.solve = solve
+        self.running = True
+        self.served_requests = 0
+
+    def handle_request(self, line):
+        """
+        Processes one request line.
+        :return: The response as a compact JSON string (without newline).
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("The request must be a JSON object")
+            request_id = request.get("id")
+
+            if "command" in request:
+                response = self.handle_command(request["command"])
+            else:
+                result = self.solve(line)
+                if result is None:
+                    response = {"status": "failed", "error": "The ODE block cannot be solved"}
+                else:
+                    response = dict(result.__dict__)
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            response = {"status": "failed", "error": "{}: {}".format(type(e).__name__, e)}
+
+        if request_id is not None:
+            response["id"] = request_id
+        self.served_requests += 1
+        return serialize(response, separators=(",", ":"))
+
+    def handle_command(self, command):
+        if command == "shutdown":
+            self.running = False
+            return {"status": "shutdown"}
+        elif command == "ping":
+            return {"status": "alive"}
+        else:
+            raise ValueError("Unknown command: {}".format(command))
+
+    def serve_stream(self, in_stream, out_stream):
+        """
+        Answers requests line by line until the input is exhausted or a shutdown was requested.
+        """
+        while self.running:
+            line = in_stream.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            out_stream.write(self.handle_request(line) + "\n")
+            out_stream.flush()
+
+    def serve_stdin(self):
+        self.serve_stream(sys.stdin, sys.stdout)
+
+    def serve_socket(self, socket_path):
+        """
+        Listens on the UNIX domain socket `socket_path`. Connections are served one after
+        another; each of them can carry an arbitrary number of requests.
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server_socket.bind(socket_path)
+            server_socket.listen(1)
+            while self.running:
+                connection, _ = server_socket.accept()
+                stream = connection.makefile("rw")
+                try:
+                    self.serve_stream(stream, stream)
+                except socket.error:
+                    traceback.print_exc(file=sys.stderr)
+                finally:
+                    stream.close()
+                    connection.close()
+        finally:
+            server_socket.close()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
@@ -0,0 +1,42 @@
+import unittest
+
+import json
+from StringIO import StringIO
+
+from OdeAnalyzer import solve_request
+from solver_server import SolverServer
+
+shapes_only = '{"functions" : [ ], "shapes" : [ "I_shape = exp(-t/tau_syn)" ], "ode" : null}'
+
+
+class TestSolverServer(unittest.TestCase):
+
+    def test_requests_are_answered_in_order(self):
+        requests = '{"command": "ping", "id": 1}\n' \
+                   '{"id": 2, "functions" : [ ], "shapes" : [ "I_shape = exp(-t/tau_syn)" ], "ode" : null}\n' \
+                   '{"command": "shutdown"}\n' \
+                   '{"command": "ping", "id": 3}\n'
+        out_stream = StringIO()
+        server = SolverServer(solve_request)
+        server.serve_stream(StringIO(requests), out_stream)
+
+        responses = [json.loads(line) for line in out_stream.getvalue().splitlines()]
+        self.assertEqual(3, len(responses))
+        self.assertEqual({"status": "alive", "id": 1}, responses[0])
+        self.assertEqual("numeric", responses[1]["solver"])
+        self.assertEqual(2, responses[1]["id"])
+        self.assertEqual("shutdown", responses[2]["status"])
+        self.assertFalse(server.running)
+
+    def test_failing_request_is_isolated(self):
+        server = SolverServer(solve_request)
+        failed = json.loads(server.handle_request('{"id": 1, "shapes" : [ "I_shape = " ], "ode" : null}'))
+        self.assertEqual("failed", failed["status"])
+        self.assertEqual(1, failed["id"])
+
+        succeeded = json.loads(server.handle_request(shapes_only))
+        self.assertEqual("success", succeeded["status"])
+        self.assertTrue(server.running)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+"""
+   Reference simulator which executes a `SolverOutput` directly, without a
+   NEST build. The update scheme of the exact, the delta and the
+   numeric-propagator solvers is executed for `n_neurons` neurons at once;
+   every parameter and state variable is a NumPy array with one entry per
+   neuron, so that the neurons can differ in their parameters.
+
+   The calibration evaluates the calibration instructions of the
+   numeric-propagator solver, the propagator elements, `__ode_var_factor`,
+   `__const_input` and the initial values once. Every step then executes,
+   in the order of the generated code:
+
+   1. the `ode_var_update_instructions`
+   2. the `updates_to_shape_state_variables`
+   3. the spike input: a spike of weight `w` to a shape increments every
+      state variable `X` of the shape by `w * iv__X`, a spike to a delta
+      shape every ODE variable by `w` times its `jump_factor`
+
+   The expressions are evaluated with `eval` and must come from a trusted
+   solver.
+
+   Usage: python solver_simulator.py result.json --parameters parameters.json --neurons 10000 --steps 1000
+"""
+
+from __future__ import division
+
+import __future__
+import argparse
+import json
+import re
+import sys
+import time
+
+import numpy
+
+from numeric_propagator import expm
+
+SUPPORTED_SOLVERS = ("exact", "delta", "numeric_propagator")
+# functions and constants of the SymPy string representation
+NUMPY_NAMESPACE = {"exp": numpy.exp, "log": numpy.log, "sqrt": numpy.sqrt, "sin": numpy.sin, "cos": numpy.cos,
+                   "tan": numpy.tan, "sinh": numpy.sinh, "cosh": numpy.cosh, "tanh": numpy.tanh, "Abs": numpy.abs,
+                   "sign": numpy.sign, "pi": numpy.pi, "E": numpy.e}
+# instructions `var = expression` or `var += expression`
+INSTRUCTION = re.compile(r"^\s*(\S+)\s*(\+?=)\s*(.*)$")
+# `__P_<shape> = expm(__A_<shape> * __h)`, see `numeric_propagator.calibration_instruction`
+CALIBRATION_INSTRUCTION = re.compile(r"^\s*(\w+)\s*=\s*expm\((\w+)\s*\*\s*__h\)\s*$")
+# the state variables of a shape are `<shape>` and `<shape>__<derivative>`
+SHAPE_STATE_VARIABLE = re.compile(r"^(.*?)(?:__\d+)?$")
+
+
+def compile_expression(expression):
+    return compile(expression, "<solver output>", "eval", __future__.division.compiler_flag, True)
+
+
+class ReferenceSimulator(object):
+    """
+    Executes the `SolverOutput` `solver_output` (dictionary or JSON string) for `n_neurons` neurons with the
+    `parameters`, which map every parameter (including `__h`) to a number or to a sequence with one value per neuron.
+    All state variables start at the values of `initial_state` or at zero.
+    """
+
+    def __init__(self, solver_output, parameters, n_neurons=1, initial_state=None):
+        if not isinstance(solver_output, dict):
+            solver_output = json.loads(solver_output)
+        if solver_output["solver"] not in SUPPORTED_SOLVERS:
+            raise ValueError("Only the update schemes of the solvers {} can be executed, not '{}'".format(
+                ", ".join(SUPPORTED_SOLVERS), solver_output["solver"]))
+        self.n_neurons = n_neurons
+
+        self.namespace = dict(NUMPY_NAMESPACE)
+        for name, value in parameters.items():
+            self.namespace[name] = self.array(value)
+        self.calibrate(solver_output)
+
+        self.ode_var_updates = [self.compile_instruction(instruction)
+                                for instruction in solver_output["ode_var_update_instructions"]]
+        self.shape_state_updates = [(name, "=", compile_expression(expression))
+                                    for update in solver_output["updates_to_shape_state_variables"]
+                                    for name, expression in update.items()]
+
+        self.ode_vars = [name for name, _, _ in self.ode_var_updates if not name.startswith("__")]
+        self.state_variables = list(solver_output["shape_state_variables"]) + \
+            [ode_var for ode_var in self.ode_vars if ode_var not in solver_output["shape_state_variables"]]
+        for name in self.state_variables:
+            self.namespace[name] = self.array((initial_state or {}).get(name, 0.0))
+
+        # (state variable, increment per unit weight) of every shape
+        self.spike_increments = {}
+        for name in solver_output["shape_state_variables"]:
+            if "iv__" + name in self.namespace:
+                shape = SHAPE_STATE_VARIABLE.match(name).group(1)
+                self.spike_increments.setdefault(shape, []).append((name, self.namespace["iv__" + name]))
+        # (ODE variable, jump factor) of every delta shape, see `delta_shapes.py`
+        for jump in solver_output.get("delta_shapes", []):
+            self.spike_increments.setdefault(jump["shape"], []).append(
+                (jump["ode_var"], self.evaluate(jump["jump_factor"])))
+
+    def array(self, value):
+        """
+        :return: `value` as float array with one entry per neuron.
+        """
+        return numpy.zeros(self.n_neurons) + numpy.asarray(value, dtype=float)
+
+    @staticmethod
+    def compile_instruction(instruction):
+        name, operator, expression = INSTRUCTION.match(instruction).groups()
+        return name, operator, compile_expression(expression)
+
+    def evaluate(self, expression):
+        return self.array(eval(compile_expression(expression), self.namespace))
+
+    def calibrate(self, solver_output):
+        """
+        Evaluates all expressions which depend only on the parameters and `__h`.
+        """
+        for instruction in solver_output.get("calibration_instructions", []):
+            propagator, generator = CALIBRATION_INSTRUCTION.match(instruction).groups()
+            rows = solver_output["propagator_generators"][generator]
+            A = numpy.array([[self.evaluate(entry) for entry in row] for row in rows]) * self.namespace["__h"]
+            self.namespace[propagator] = numpy.array([expm(A[:, :, neuron].tolist())
+                                                      for neuron in range(self.n_neurons)]).transpose(1, 2, 0)
+
+        for element in solver_output.get("propagator_elements") or []:
+            for name, expression in element.items():
+                self.namespace[name] = self.evaluate(expression)
+        # may refer to the propagators
+        for field in ("ode_var_factor", "const_input"):
+            for name, expression in (solver_output.get(field) or {}).items():
+                self.namespace[name] = self.evaluate(expression)
+        for initial_value in solver_output.get("initial_values") or []:
+            for name, expression in initial_value.items():
+                self.namespace[name] = self.evaluate(expression)
+
+    def execute(self, instructions):
+        namespace = self.namespace
+        for name, operator, code in instructions:
+            value = eval(code, namespace)
+            namespace[name] = namespace[name] + value if operator == "+=" else value
+
+    def step(self, spikes=None):
+        """
+        Advances all neurons by one step.
+        :param spikes: Dictionary which maps shape names to the weights of the spikes received in this step, one
+        weight per neuron.
+        """
+        self.execute(self.ode_var_updates)
+        self.execute(self.shape_state_updates)
+        for shape, weights in (spikes or {}).items():
+            if shape not in self.spike_increments:
+                raise ValueError("The solver output has no state variables for the shape '{}'".format(shape))
+            for name, initial_value in self.spike_increments[shape]:
+                self.namespace[name] = self.namespace[name] + numpy.asarray(weights) * initial_value
+
+    def state(self, name):
+        return self.namespace[name]
+
+    def run(self, steps, spikes=None, record=None):
+        """
+        Advances all neurons by `steps` steps.
+        :param spikes: Dictionary which maps shape names to arrays of the spike weights with the shape
+        (steps, n_neurons).
+        :param record: Names of the variables to record, by default the ODE variables.
+        :return: Dictionary which maps the recorded variables to arrays with the shape (steps, n_neurons) of their
+        values after every step.
+        """
+        if record is None:
+            record = self.ode_vars
+        traces = dict((name, numpy.zeros((steps, self.n_neurons))) for name in record)
+        for step in range(steps):
+            self.step(dict((shape, weights[step]) for shape, weights in (spikes or {}).items()))
+            for name in record:
+                traces[name][step] = self.namespace[name]
+        return traces
+
+
+def throughput(solver_output, parameters, n_neurons, steps):
+    """
+    :return: The number of neuron updates per second of the update scheme of `solver_output`.
+    """
+    simulator = ReferenceSimulator(solver_output, parameters, n_neurons)
+    start = time.time()
+    simulator.run(steps, record=[])
+    return n_neurons * steps / (time.time() - start)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Executes a SolverOutput for many neurons with NumPy.")
+    parser.add_argument("solver_output", help="SolverOutput JSON file, e.g. `result.tmp`")
+    parser.add_argument("--parameters", required=True, metavar="PATH",
+                        help="JSON file with the values of all parameters, including `__h`")
+    parser.add_argument("--neurons", type=int, default=10000, help="Number of neurons (default: 10000)")
+    parser.add_argument("--steps", type=int, default=1000, help="Number of steps (default: 1000)")
+    args = parser.parse_args(argv)
+
+    with open(args.solver_output) as f:
+        solver_output = json.load(f)
+    with open(args.parameters) as f:
+        parameters = json.load(f)
+    sys.stdout.write("{:.0f} neuron updates per second\n".format(
+        throughput(solver_output, parameters, args.neurons, args.steps)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,66 @@
+import unittest
+
+import math
+
+import mpmath
+import numpy
+
+from ode_analyzer_test import cond_alpha_ode_block, psc_ode_block, solve
+from solver_simulator import ReferenceSimulator, throughput
+
+parameters = {"Tau": 10.0, "C_m": 250.0, "tau_syn_in": 2.0, "tau_syn_ex": [0.5, 1.0, 3.0], "pA": 1.0, "e": math.e,
+              "I_e": 376.0, "currents": 0.0, "__h": 0.1}
+
+
+class TestReferenceSimulator(unittest.TestCase):
+
+    def test_exact_solution(self):
+        # the excitatory shape starts with the state of a spike of weight 1
+        initial_state = {"V_abs": -5.0, "I_shape_ex__1": [math.e / tau for tau in parameters["tau_syn_ex"]]}
+        simulator = ReferenceSimulator(solve(psc_ode_block), parameters, 3, initial_state)
+        steps = 20
+        V_abs = simulator.run(steps)["V_abs"]
+
+        p = parameters
+        for neuron, tau_syn in enumerate(p["tau_syn_ex"]):
+            def rhs(_, y):
+                V, I, dI = y
+                return [-V / p["Tau"] + (I + p["I_e"]) / p["C_m"], dI, -I / tau_syn ** 2 - 2 * dI / tau_syn]
+
+            # `I_shape_ex__1 = I_shape_ex' + I_shape_ex / tau_syn_ex`, see `PropagatorCalculator.shape_matrix`
+            solution = mpmath.odefun(rhs, 0, [-5.0, 0.0, math.e / tau_syn])
+            self.assertAlmostEqual(float(solution(steps * p["__h"])[0]), V_abs[-1, neuron], places=9)
+
+    def test_spike_input(self):
+        result = solve(psc_ode_block)
+        spiking = ReferenceSimulator(result, parameters, 3)
+        spiking.step({"I_shape_ex": [2.0, 0.0, 1.0]})
+        increments = [2 * math.e / 0.5, 0.0, math.e / 3.0]
+        numpy.testing.assert_allclose(increments, spiking.state("I_shape_ex__1"))
+        numpy.testing.assert_allclose([0.0, 0.0, 0.0], spiking.state("I_shape_ex"))
+
+        started = ReferenceSimulator(result, parameters, 3, {"V_abs": spiking.state("V_abs"),
+                                                             "I_shape_ex__1": increments})
+        spiking.run(5)
+        started.run(5)
+        numpy.testing.assert_allclose(started.state("V_abs"), spiking.state("V_abs"))
+        self.assertRaises(ValueError, spiking.step, {"I_unknown": [1.0, 1.0, 1.0]})
+
+    def test_numeric_propagator(self):
+        spikes = {"I_shape_in": numpy.zeros((10, 3)), "I_shape_ex": numpy.zeros((10, 3))}
+        spikes["I_shape_in"][0] = 1.0
+        spikes["I_shape_ex"][3] = [1.0, 2.0, 3.0]
+
+        exact = ReferenceSimulator(solve(psc_ode_block), parameters, 3).run(10, spikes)
+        deferred = ReferenceSimulator(solve(psc_ode_block, propagator="numeric"), parameters, 3).run(10, spikes)
+        numpy.testing.assert_allclose(exact["V_abs"], deferred["V_abs"], rtol=1e-10)
+
+    def test_numeric_solver_is_not_executed(self):
+        self.assertRaises(ValueError, ReferenceSimulator, solve(cond_alpha_ode_block), parameters, 3)
+
+    def test_throughput(self):
+        self.assertGreater(throughput(solve(psc_ode_block), dict(parameters, tau_syn_ex=0.5), 100, 10), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+   Synthetic stress models to map the scaling limits of the solver. A
+   generated `SolverInput` has the form
+
+       shapes:    I_k = t**(order - 1) * exp(-t/tau_k)        k < shapes
+       functions: I_syn_0 = w_0*I_0 + ... + w_n*I_n
+                  I_syn_d = I_syn_(d-1) + c_d                d < depth
+       ode:       V_m' = -V_m/tau_m + (I_syn_(depth-1) + p_0 + ... + p_m)/C_m
+
+   so that the number of shapes, the order of every shape (up to
+   `MAX_ORDER`), the depth of the function inlining and the number of
+   additional parameters can be varied independently of each other.
+
+   The driver sweeps one dimension at a time, keeping the others at their
+   base values, and tabulates the median solve time and the peak memory.
+   Every case runs in a fresh process, so that the peak memory belongs to the
+   case and can also decrease along the sweep.
+   The sweep of a dimension stops after the first case which takes longer
+   than `--stop-seconds`, since the following ones take even longer.
+
+   Usage: python solver_stress.py --dimension shapes --values 1,2,4,8 --order 2
+"""
+
+import argparse
+import json
+import sys
+
+from shapes import MAX_ORDER
+from solver_benchmark import run_case_in_process
+
+DIMENSIONS = ("shapes", "order", "depth", "parameters")
+BASE_VALUES = {"shapes": 2, "order": 2, "depth": 1, "parameters": 0}
+
+
+def generate_solver_input(shapes=2, order=2, depth=1, parameters=0):
+    """
+    :return: The `SolverInput` of the stress model as dictionary.
+    """
+    if not 1 <= order <= MAX_ORDER:
+        raise ValueError("The order must be between 1 and {}".format(MAX_ORDER))
+    if shapes < 1 or depth < 1 or parameters < 0:
+        raise ValueError("At least one shape and one function are required")
+
+    shape_definitions = []
+    for k in range(shapes):
+        power = "t**{} * ".format(order - 1) if order > 1 else ""
+        shape_definitions.append("I_{k} = {power}exp(-t/tau_{k})".format(k=k, power=power))
+
+    functions = ["I_syn_0 = " + " + ".join("w_{k}*I_{k}".format(k=k) for k in range(shapes))]
+    for d in range(1, depth):
+        functions.append("I_syn_{d} = I_syn_{previous} + c_{d}".format(d=d, previous=d - 1))
+
+    inputs = ["I_syn_{}".format(depth - 1)] + ["p_{}".format(j) for j in range(parameters)]
+    ode = "V_m' = -V_m/tau_m + ({})/C_m".format(" + ".join(inputs))
+    return {"functions": functions, "shapes": shape_definitions, "ode": ode}
+
+
+def sweep(dimension, values, base_values=None, repetitions=1, stop_seconds=None, log=None):
+    """
+    Solves the stress models for all `values` of `dimension`.
+    :return: List of rows with the `values` of all dimensions and the benchmark record of `run_case_in_process`.
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError("Unknown dimension: {}".format(dimension))
+    rows = []
+    for value in values:
+        dimensions = dict(BASE_VALUES, **(base_values or {}))
+        dimensions[dimension] = value
+        result = run_case_in_process(json.dumps(generate_solver_input(**dimensions)), repetitions)
+        rows.append(dict(dimensions, result=result))
+        if log is not None:
+            log.write(format_row(dimension, rows[-1]) + "\n")
+        if "error" in result or (stop_seconds is not None and result["seconds"]["median"] > stop_seconds):
+            break
+    return rows
+
+
+def format_row(dimension, row):
+    result = row["result"]
+    if "error" in result:
+        return "{}\t{}".format(row[dimension], result["error"])
+    return "{}\t{:.3f}\t{}\t{}".format(row[dimension], result["seconds"]["median"], result["peak_memory_kb"],
+                                        result["solver"])
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Sweeps synthetic stress models through the solver.")
+    parser.add_argument("--dimension", choices=DIMENSIONS, required=True, help="Dimension to sweep")
+    parser.add_argument("--values", required=True, help="Comma separated values of the dimension")
+    for dimension in DIMENSIONS:
+        parser.add_argument("--" + dimension, type=int, default=BASE_VALUES[dimension],
+                            help="Value of the dimension if it is not swept (default: {})".format(
+                                BASE_VALUES[dimension]))
+    parser.add_argument("--repetitions", type=int, default=1, help="Number of solver runs per case (default: 1)")
+    parser.add_argument("--stop-seconds", type=float, help="Stop the sweep after a case which takes longer")
+    parser.add_argument("--output", metavar="PATH", help="JSON file for all rows of the sweep")
+    args = parser.parse_args(argv)
+
+    base_values = dict((dimension, getattr(args, dimension)) for dimension in DIMENSIONS)
+    sys.stdout.write("{}\tseconds\tpeak_memory_kb\tsolver\n".format(args.dimension))
+    rows = sweep(args.dimension, [int(value) for value in args.values.split(",")], base_values,
+                 args.repetitions, args.stop_seconds, sys.stdout)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,25 @@
+import unittest
+
+from shapes import MAX_ORDER
+from solver_stress import generate_solver_input, sweep
+
+
+class TestSolverStress(unittest.TestCase):
+
+    def test_generate_solver_input(self):
+        self.assertEqual({"functions": ["I_syn_0 = w_0*I_0 + w_1*I_1", "I_syn_1 = I_syn_0 + c_1"],
+                          "shapes": ["I_0 = t**2 * exp(-t/tau_0)", "I_1 = t**2 * exp(-t/tau_1)"],
+                          "ode": "V_m' = -V_m/tau_m + (I_syn_1 + p_0)/C_m"},
+                         generate_solver_input(shapes=2, order=3, depth=2, parameters=1))
+        self.assertEqual(["I_0 = exp(-t/tau_0)"], generate_solver_input(shapes=1, order=1)["shapes"])
+        self.assertRaises(ValueError, generate_solver_input, order=MAX_ORDER + 1)
+
+    def test_sweep_stops_after_slow_case(self):
+        rows = sweep("shapes", [1, 2], {"order": 1}, stop_seconds=0)
+        self.assertEqual(1, len(rows))
+        self.assertEqual((1, 1, 1, 0), (rows[0]["shapes"], rows[0]["order"], rows[0]["depth"], rows[0]["parameters"]))
+        self.assertEqual("exact", rows[0]["result"]["solver"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+   Tiered test if an expression is identically zero. `simplify(expr) == 0`
+   is by far the most expensive operation of the solver, although most
+   expressions are decided by much cheaper means. The tiers are tried in
+   order until one of them decides:
+
+   "structural": the expression is the number zero, or a nonzero number or
+                 symbol
+   "expand":     `expand` or `cancel` reduce the expression to zero (only for
+                 expressions up to `EXPAND_MAX_OPERATIONS` operations)
+   "numeric":    all free symbols are replaced by random rational values of
+                 both signs and the expression is evaluated with high
+                 precision at several samples; a value which is clearly
+                 nonzero relative to the values of the terms of the
+                 expression proves that it is nonzero (not for expressions
+                 with undefined functions). Tiny values do not prove that the
+                 expression is zero, the next tier decides.
+   "simplify":   `simplify(expr) == 0`
+
+   An expression which none of the configured tiers decides is treated as
+   nonzero, which is the safe answer for all callers: the ODE is solved
+   numerically, a candidate shape ODE is rejected, a propagator element is
+   kept.
+
+   The decisions of the `default_tester` are counted per request and
+   reported in the diagnostics of the `SolverOutput` (section `zero_test`).
+"""
+
+import random
+
+from sympy import Derivative, S, Rational, cancel, count_ops, expand, oo, simplify, sympify, zoo
+from sympy.core.function import AppliedUndef
+
+TIERS = ("structural", "expand", "numeric", "simplify")
+# tiers used by `is_zero`, can be changed e.g. to leave out the (probabilistic) numeric tier
+ZERO_TEST_TIERS = TIERS
+
+# Larger expressions are not expanded, the expansion can take much longer than the other tiers
+EXPAND_MAX_OPERATIONS = 200
+# Decimal digits used for the numeric evaluation
+NUMERIC_PRECISION = 50
+# A numeric value below this bound relative to the largest value of a term of the expression may be zero
+NUMERIC_TOLERANCE = Rational(1, 10 ** (NUMERIC_PRECISION // 2))
+# Number of random samples which must all vanish in the numeric tier
+NUMERIC_SAMPLES = 3
+# The samples are deterministic, so that repeated builds produce identical results
+RANDOM_SEED = 4242
+
+
+class ZeroTester(object):
+    """
+    Decides if expressions are identically zero with the configured `tiers` and counts which tier decided
+    how many cases.
+    """
+
+    def __init__(self, tiers=None, decisions=None):
+        """
+        :param decisions: The counters of another tester which are continued, e.g. of the tester which is replaced
+        temporarily.
+        """
+        if tiers is None:
+            tiers = ZERO_TEST_TIERS
+        unknown_tiers = [tier for tier in tiers if tier not in TIERS]
+        if unknown_tiers:
+            raise ValueError("Unknown zero test tiers: {}".format(", ".join(unknown_tiers)))
+        self.tiers = tuple(tiers)
+        self.decisions = decisions
+        if decisions is None:
+            self.decisions = {}
+            self.reset()
+
+    def decide(self, expr):
+        """
+        :return: Tuple (is_zero, tier) with the tier which decided the case or "undecided".
+        """
+        expr = sympify(expr)
+        for tier in self.tiers:
+            result = getattr(self, "_" + tier)(expr)
+            if result is not None:
+                break
+        else:
+            tier, result = "undecided", False
+
+        self.decisions[tier]["zero" if result else "nonzero"] += 1
+        return result, tier
+
+    def is_zero(self, expr):
+        return self.decide(expr)[0]
+
+    def reset(self):
+        for tier in TIERS + ("undecided",):
+            self.decisions[tier] = {"zero": 0, "nonzero": 0}
+
+    def report(self):
+        """
+        :return: The number of zero and nonzero decisions of every tier which decided at least one case.
+        """
+        return dict((tier, counts) for tier, counts in self.decisions.items() if counts["zero"] + counts["nonzero"] > 0)
+
+    @staticmethod
+    def _structural(expr):
+        if expr == 0:
+            return True
+        if expr.is_Number or expr.is_NumberSymbol or expr.is_Symbol:
+            return False
+        return None
+
+    @staticmethod
+    def _expand(expr):
+        if count_ops(expr) > EXPAND_MAX_OPERATIONS:
+            return None
+        if expand(expr) == 0 or cancel(expr) == 0:
+            return True
+        return None
+
+    @staticmethod
+    def _numeric(expr):
+        # undefined functions cannot be evaluated, and their derivatives do not allow to substitute the variable
+        if expr.has(Derivative) or expr.atoms(AppliedUndef):
+            return None
+        symbols = sorted(expr.free_symbols, key=str)
+        terms = expr.args if expr.is_Add else (expr,)
+        rng = random.Random(RANDOM_SEED)
+        for _ in range(NUMERIC_SAMPLES):
+            # random signs, so that identities which only hold for positive symbols are not accepted
+            values = dict((symbol, Rational(rng.choice((-1, 1)) * rng.randint(50, 200), 100)) for symbol in symbols)
+            # substituting before the evaluation is much faster than `evalf(subs=...)` for large expressions
+            term_values = [ZeroTester._evaluate(term.xreplace(values)) for term in terms]
+            if None in term_values:
+                return None
+            value = ZeroTester._evaluate(sum(term_values, S.Zero))
+            if value is None:
+                return None
+            scale = max(abs(term_value) for term_value in term_values)
+            if abs(value) > NUMERIC_TOLERANCE * scale:
+                return False
+        return None
+
+    @staticmethod
+    def _evaluate(expr):
+        """
+        :return: The value of the numeric expression `expr`, or None if it is not a finite number.
+        """
+        value = expr.evalf(NUMERIC_PRECISION)
+        if not value.is_number or value.has(S.NaN, zoo, oo, -oo):
+            return None
+        real, imag = value.as_real_imag()
+        if not (real.is_Number and imag.is_Number):
+            return None
+        return real + S.ImaginaryUnit * imag
+
+    @staticmethod
+    def _simplify(expr):
+        return simplify(expr) == 0
+
+
+default_tester = ZeroTester()
+
+
+def is_zero(expr):
+    """
+    Tests `expr` with the `default_tester`.
+    """
+    return default_tester.is_zero(expr)
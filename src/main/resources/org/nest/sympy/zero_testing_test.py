@@ -0,0 +1,40 @@
+import unittest
+
+from sympy import Function, cos, exp, sin, sqrt, symbols
+
+from zero_testing import ZeroTester
+
+x, t, tau = symbols("x, t, tau")
+
+
+class TestZeroTester(unittest.TestCase):
+
+    def test_tiers(self):
+        tester = ZeroTester()
+        self.assertEqual((True, "structural"), tester.decide(x - x))
+        self.assertEqual((False, "structural"), tester.decide(x))
+        self.assertEqual((True, "expand"), tester.decide((x ** 2 - 1) / (x - 1) - x - 1))
+        # tiny values do not prove that an expression is zero
+        self.assertEqual((True, "simplify"), tester.decide(sin(x) ** 2 + cos(x) ** 2 - 1))
+        self.assertEqual((False, "numeric"), tester.decide(exp(-t / tau) - 1))
+        # only holds for positive `x`
+        self.assertEqual((False, "numeric"), tester.decide(sqrt(x ** 2) - x))
+        # cannot be evaluated numerically
+        self.assertEqual((False, "simplify"), tester.decide(Function("delta")(t, tau)))
+        # the variable of the derivative cannot be substituted
+        self.assertEqual((False, "simplify"), tester.decide(Function("f")(x, tau).diff(x)))
+        self.assertEqual({"zero": 0, "nonzero": 2}, tester.report()["numeric"])
+
+    def test_numeric_tolerance_is_relative(self):
+        tester = ZeroTester()
+        self.assertEqual((False, "numeric"), tester.decide(1e-30 * t))
+        self.assertEqual((False, "numeric"), tester.decide(1e-30 * t - 1e-30 * tau))
+        self.assertEqual((False, "numeric"), tester.decide(exp(-60 * t) - exp(-60 * tau)))
+
+    def test_configured_tiers(self):
+        tester = ZeroTester(["structural", "expand"])
+        self.assertEqual((False, "undecided"), tester.decide(sin(x) ** 2 + cos(x) ** 2 - 1))
+        self.assertRaises(ValueError, ZeroTester, ["structural", "guess"])
+
+if __name__ == '__main__':
+    unittest.main()